@@ -1,42 +1,110 @@
 import csv
 import random
+import sys
+import numpy as np
+from samplers import AliasSampler
+from input_cache import cached_parse
 
-def load_location_data(csv_path):
-    data = []
-
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        reader.fieldnames = [h.strip() for h in reader.fieldnames]
-        for row in reader:
-            data.append({
-                "district": row["District"].strip(),
-                "municipality": row["Name of Municipalities"].strip(),
-                "wards": int(row["Numbers of Wards"]),
-                "province": row["Province"].strip()
-            })
-    return data
-
-def load_location_data_by_province(csv_path):
-    data = {}
-
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        reader.fieldnames = [h.strip() for h in reader.fieldnames]
-        for row in reader:
-            province = row["Province"].strip()
-            if province not in data:
-                data[province] = []
-            data[province].append({
-                "district": row["District"].strip(),
-                "municipality": row["Name of Municipalities"].strip(),
-                "wards": int(row["Numbers of Wards"]),
-                "province": province
-            })
-    return data
-
-def generate_address(location_data):
-    loc = random.choice(location_data)
-    ward_no = random.randint(1, loc["wards"])
-
-    return f"Ward No.{ward_no}-{loc['municipality']} {loc['district']}, {loc['province']}"
 
+# The municipalities of new_location.csv as parallel columns. Province and
+# district names are stored once and referenced by code, and every
+# municipality's address tail ("-<municipality> <district>, <province>") is
+# built once, so an address is just a ward number plus a shared string.
+#
+# Parsing happens once per version of the CSV: the columns are pickled to
+# .cache/gazetteer-<sha256>.pkl next to it and loaded from there while the
+# CSV stays the same.
+class Gazetteer:
+    def __init__(self, csv_path="data/new_location.csv"):
+        columns = cached_parse(csv_path, "gazetteer", self._parse)
+
+        self.provinces = columns["provinces"]
+        self.districts = columns["districts"]
+        self.district_province = columns["district_province"]
+        self.municipalities = columns["municipalities"]
+        self.municipality_district = columns["municipality_district"]
+        self.wards = columns["wards"]
+        self.tails = [
+            sys.intern(f"-{name} {self.districts[d]}, {self.provinces[self.district_province[d]]}")
+            for name, d in zip(self.municipalities, self.municipality_district.tolist())
+        ]
+
+        municipality_province = self.district_province[self.municipality_district]
+        self.by_province = {
+            province: np.flatnonzero(municipality_province == code)
+            for code, province in enumerate(self.provinces)
+        }
+        self.by_district = {
+            district: np.flatnonzero(self.municipality_district == code)
+            for code, district in enumerate(self.districts)
+        }
+        self._all = np.arange(len(self.municipalities))
+        self._samplers = {}
+
+    @staticmethod
+    def _parse(csv_path):
+        provinces, districts, district_province = {}, {}, []
+        municipalities, municipality_district, wards = [], [], []
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            reader.fieldnames = [h.strip() for h in reader.fieldnames]
+            for row in reader:
+                province = provinces.setdefault(sys.intern(row["Province"].strip()), len(provinces))
+                district_name = sys.intern(row["District"].strip())
+                if district_name not in districts:
+                    districts[district_name] = len(districts)
+                    district_province.append(province)
+                municipalities.append(sys.intern(row["Name of Municipalities"].strip()))
+                municipality_district.append(districts[district_name])
+                wards.append(int(row["Numbers of Wards"]))
+        return {
+            "provinces": list(provinces),
+            "districts": list(districts),
+            "district_province": np.array(district_province, dtype=np.int16),
+            "municipalities": municipalities,
+            "municipality_district": np.array(municipality_district, dtype=np.int32),
+            "wards": np.array(wards, dtype=np.int16),
+        }
+
+    def _pool(self, province=None, district=None):
+        if district is not None:
+            return self.by_district[district]
+        if province is not None:
+            return self.by_province[province]
+        return self._all
+
+    # Uniform over the municipalities of the pool, compiled once per pool.
+    def sampler(self, province=None, district=None):
+        key = (province, district)
+        if key not in self._samplers:
+            self._samplers[key] = AliasSampler(self._pool(province, district).tolist())
+        return self._samplers[key]
+
+    # One address from a uniformly chosen municipality, optionally within a
+    # province or district.
+    def address(self, province=None, district=None, rng=random):
+        m = self.sampler(province, district).draw(rng)
+        return f"Ward No.{rng.randint(1, int(self.wards[m]))}{self.tails[m]}"
+
+    # k addresses at once, drawn with a NumPy generator.
+    def addresses(self, k, province=None, district=None, rng=None):
+        rng = rng if rng is not None else np.random.default_rng()
+        pool = self._pool(province, district)
+        chosen = pool[self.sampler(province, district).draw_codes(k, rng)]
+        wards = rng.integers(1, self.wards[chosen].astype(np.int64) + 1)
+        tails = self.tails
+        return [f"Ward No.{w}{tails[m]}" for w, m in zip(wards.tolist(), chosen.tolist())]
+
+
+_default_gazetteer = None
+
+
+def get_gazetteer():
+    global _default_gazetteer
+    if _default_gazetteer is None:
+        _default_gazetteer = Gazetteer()
+    return _default_gazetteer
+
+
+def generate_address(province=None):
+    return get_gazetteer().address(province)
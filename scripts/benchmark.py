@@ -0,0 +1,253 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from instrumentation import peak_rss_mb
+
+# Scaling benchmarks for the synthetic data pipeline:
+#
+#   python3 scripts/benchmark.py --sizes 1000 100000 --output data/benchmark.json
+#   python3 scripts/benchmark.py --save-baseline data/benchmark_baseline.json
+#   python3 scripts/benchmark.py --baseline data/benchmark_baseline.json
+#
+# Every case runs in a fresh process, so its peak RSS is its own. Cases are
+# measured at each size (citizens for end_to_end, rows otherwise) and report
+# rows/sec, peak RSS and output bytes as JSON. With --baseline, a case that
+# got slower or bigger than the baseline by more than --tolerance is
+# printed as a regression and the script exits with status 1. Runs that
+# take a few milliseconds are noisy; compare at 100k and up.
+#
+# The generators read their inputs from data/, so each process runs in a
+# scratch directory whose data/ links to names.json, new_location.csv and
+# institute.json from --data.
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+INPUT_FILES = ["names.json", "new_location.csv", "institute.json"]
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+TOLERANCE = 0.2
+
+
+#-------------- Cases ------------
+# Each case prepares its inputs and returns a function that does the timed
+# work and returns (rows, output bytes).
+def case_names(size):
+    from name_generator import NameSampler
+    from data_generator import SEX_SAMPLER
+    import numpy as np
+    sampler = NameSampler("data/names.json")
+    sexes = SEX_SAMPLER.sample(size, np.random.default_rng(0))
+    return lambda: (len(sampler.sample(sexes)), 0)
+
+
+def case_addresses(size):
+    from address_generator import Gazetteer
+    import numpy as np
+    gazetteer = Gazetteer("data/new_location.csv")
+    rng = np.random.default_rng(0)
+    return lambda: (len(gazetteer.addresses(size, rng=rng)), 0)
+
+
+def case_diagnoses(size):
+    from diagnosis_generator import generate_diagnoses, PROVINCES
+    import numpy as np
+    rng = np.random.default_rng(0)
+    ages = rng.integers(18, 91, size)
+    sexes = rng.choice(["Male", "Female", "Other"], size)
+    months = rng.integers(1, 13, size)
+    years = rng.integers(2000, 2026, size)
+    provinces = rng.choice(PROVINCES, size)
+
+    def run():
+        codes = generate_diagnoses(ages, sexes, months, years, provinces, start_year=2000, rng=rng)
+        return len(codes), 0
+    return run
+
+
+def case_prescriptions(size):
+    from diagnosis_generator import DIAGNOSIS_LIST
+    from prescription_generator import generate_prescription, generate_description
+    import numpy as np
+    diagnoses = [DIAGNOSIS_LIST[i] for i in np.random.default_rng(0).integers(0, len(DIAGNOSIS_LIST), size).tolist()]
+
+    def run():
+        for diagnosis in diagnoses:
+            generate_prescription(diagnosis)
+            generate_description(diagnosis)
+        return size, 0
+    return run
+
+
+def case_entitlements(size):
+    from citizen_table import CitizenTable
+    from data_generator import SEX_SAMPLER, generate_entitlements, make_entitlement_rules
+    import numpy as np
+    rng = np.random.default_rng(0)
+    rules = make_entitlement_rules(0)
+    ages = rng.integers(18, 91, size)
+    sexes = SEX_SAMPLER.sample(size, rng)
+
+    def run():
+        table = CitizenTable()
+        bits = rules.evaluate(np.arange(size), {"age": ages, "sex": np.array(sexes)}).tolist()
+        for i in range(size):
+            table.append(str(i), sexes[i], int(ages[i]), 0, 0, entitlements=bits[i])
+        for _ in generate_entitlements(table, rules, rng):
+            pass
+        return size, 0
+    return run
+
+
+def case_end_to_end(size, workers=1):
+    import data_generator
+    before = set(os.listdir("data"))
+
+    def run():
+        sys.argv = ["data_generator.py", "--citizens", str(size), "--workers", str(workers)]
+        data_generator.main()
+        output_bytes = sum(
+            os.path.getsize(os.path.join("data", name))
+            for name in os.listdir("data")
+            if name not in before and os.path.isfile(os.path.join("data", name))
+        )
+        return size, output_bytes
+    return run
+
+
+CASES = {
+    "names": case_names,
+    "addresses": case_addresses,
+    "diagnoses": case_diagnoses,
+    "prescriptions": case_prescriptions,
+    "entitlements": case_entitlements,
+    "end_to_end": case_end_to_end,
+}
+
+
+def run_case(name, size, workers):
+    setup = CASES[name]
+    run = setup(size, workers) if name == "end_to_end" else setup(size)
+    started = time.perf_counter()
+    rows, output_bytes = run()
+    seconds = time.perf_counter() - started
+    return {
+        "case": name,
+        "size": size,
+        "rows": rows,
+        "seconds": round(seconds, 4),
+        "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "output_bytes": output_bytes,
+    }
+
+
+#-------------- Runner ------------
+def make_workdir(data_dir):
+    workdir = tempfile.mkdtemp(prefix="benchmark-")
+    os.makedirs(os.path.join(workdir, "data"))
+    for name in INPUT_FILES:
+        os.symlink(os.path.abspath(os.path.join(data_dir, name)), os.path.join(workdir, "data", name))
+    return workdir
+
+
+def measure(name, size, data_dir, workers):
+    workdir = make_workdir(data_dir)
+    try:
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-case", name, str(size), "--workers", str(workers)],
+            cwd=workdir, capture_output=True, text=True,
+            env={**os.environ, "PYTHONPATH": SCRIPTS_DIR + os.pathsep + os.environ.get("PYTHONPATH", "")},
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if child.returncode != 0:
+        raise RuntimeError(f"{name} at {size} failed:\n{child.stderr}")
+    return json.loads(child.stdout.strip().splitlines()[-1])
+
+
+# A case regresses when its throughput drops, or its memory or output grows,
+# by more than the tolerance. A metric missing (None) on either side, e.g.
+# rows_per_sec of a run too short to time or peak_rss_mb where the platform
+# doesn't report it, is not compared.
+def compare(results, baseline, tolerance):
+    previous = {(r["case"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get((result["case"], result["size"]))
+        if old is None:
+            continue
+        for metric, higher_is_better in [("rows_per_sec", True), ("peak_rss_mb", False), ("output_bytes", False)]:
+            if result.get(metric) is None or old.get(metric) is None:
+                continue
+            limit = old[metric] * (1 - tolerance if higher_is_better else 1 + tolerance)
+            if result[metric] < limit if higher_is_better else result[metric] > limit:
+                regressions.append(
+                    f"{result['case']} @ {result['size']}: {metric} {result[metric]} vs baseline {old[metric]} (limit {limit:.1f})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the synthetic data generators")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--data", default="data", help="directory holding names.json, new_location.csv and institute.json")
+    parser.add_argument("--workers", type=int, default=1, help="--workers passed to the end_to_end run")
+    parser.add_argument("--output", help="write the results here as well as to stdout")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--save-baseline", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed relative change (default 0.2)")
+    parser.add_argument("--run-case", nargs=2, metavar=("CASE", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case[0], int(args.run_case[1]), args.workers)))
+        return
+
+    results = []
+    for size in args.sizes:
+        for name in args.cases:
+            result = measure(name, size, args.data, args.workers)
+            results.append(result)
+            rate = "-" if result["rows_per_sec"] is None else f"{result['rows_per_sec']:,.0f}"
+            print(
+                f"{name:>14} {size:>9}: {rate:>14} rows/s "
+                f"{result['peak_rss_mb']:>8.1f} MB {result['output_bytes']:>12,} bytes",
+                file=sys.stderr,
+            )
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "workers": args.workers,
+        "results": results,
+    }
+    # Files and the baseline check come before stdout, so a reader that
+    # closes the pipe early (| head) can't lose them.
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+
+    try:
+        print(json.dumps(report, indent=2), flush=True)
+    except BrokenPipeError:
+        # Keep the interpreter from failing again when it flushes stdout at exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+from collections import Counter
+from datetime import date, timedelta
+from cubes import AGE_BANDS, CounterCube, age_band
+from json_stream import iter_rows
+
+# Rolls the exported tables up into the small files GovDashboard renders, so
+# the browser downloads aggregates whose size depends on the number of
+# dimension combinations instead of on the number of records:
+#
+#   cubes/diagnoses.json        diagnosis x province x year x month x sex x age band
+#   cubes/record_types.json     diagnosis x record type
+#   cubes/institutes.json       records and record-type mix per institute
+#   cubes/citizens.json         registry totals and demographics
+#
+# pull.py runs this after every export; it can also be run on its own:
+#   python3 scripts/build_cubes.py --data data
+
+
+def parse_date(value):
+    return date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+
+
+def age_on(dob, day):
+    return day.year - dob.year - ((day.month, day.day) < (dob.month, dob.day))
+
+
+# Addresses look like "Ward No.3-Itahari Sub-Metropolitan City Sunsari, Koshi".
+# The district is the word before the comma, as the dashboard always read it.
+def address_parts(address):
+    place, _, province = (address or "").rpartition(", ")
+    district = place.split(" ")[-1] if place else ""
+    return district, province
+
+
+def build(data_dir, out_dir=None, today=None):
+    out_dir = out_dir or os.path.join(data_dir, "cubes")
+    today = today or date.today()
+    os.makedirs(out_dir, exist_ok=True)
+
+    institute_provinces = {}
+    institute_volumes = {}
+    for institute in iter_rows(os.path.join(data_dir, "health_institutes.json")):
+        institute_provinces[institute["institute_id"]] = address_parts(institute["address"])[1]
+        institute_volumes[institute["institute_id"]] = Counter()
+
+    # Per citizen only what the record pass needs: sex, date of birth and
+    # district code.
+    citizens = {}
+    districts = {}
+    sex_counts = Counter()
+    blood_group_counts = Counter()
+    age_counts = Counter()
+    district_citizens = Counter()
+    for citizen in iter_rows(os.path.join(data_dir, "citizens.json")):
+        dob = parse_date(citizen["date_of_birth"])
+        district = address_parts(citizen["address"])[0]
+        district_code = districts.setdefault(district, len(districts))
+        citizens[citizen["nid_number"]] = (citizen["sex"], dob, district_code)
+        sex_counts[citizen["sex"]] += 1
+        blood_group_counts[citizen["blood_group"]] += 1
+        age_counts[age_on(dob, today)] += 1
+        district_citizens[district] += 1
+    district_names = list(districts)
+
+    diagnoses = CounterCube({
+        "diagnosis": None,
+        "province": None,
+        "year": None,
+        "month": list(range(1, 13)),
+        "sex": None,
+        "age_band": AGE_BANDS,
+    })
+    record_types = CounterCube({"diagnosis": None, "record_type": None})
+    district_records = Counter()
+    recent_diagnoses = Counter()
+    citizens_with_records = set()
+    citizens_with_recent_records = set()
+    last_30_days = today - timedelta(days=30)
+    last_6_months = today - timedelta(days=182)
+
+    for record in iter_rows(os.path.join(data_dir, "health_records.json")):
+        issued = parse_date(record["issued_date"])
+        citizen = citizens.get(record["nid_number"])
+        province = institute_provinces.get(record["institute_id"], "")
+        if citizen is not None:
+            sex, dob, district_code = citizen
+            band = AGE_BANDS[age_band(age_on(dob, issued))]
+            district_records[district_names[district_code]] += 1
+        else:
+            sex, band = "Unknown", AGE_BANDS[0]
+
+        diagnoses.add(record["diagnosis"], province, issued.year, issued.month, sex, band)
+        record_types.add(record["diagnosis"], record["record_type"])
+        if record["institute_id"] in institute_volumes:
+            institute_volumes[record["institute_id"]][record["record_type"]] += 1
+        citizens_with_records.add(record["nid_number"])
+        if issued >= last_6_months:
+            citizens_with_recent_records.add(record["nid_number"])
+        if issued >= last_30_days:
+            recent_diagnoses[record["diagnosis"]] += 1
+
+    diagnoses.write(os.path.join(out_dir, "diagnoses.json"))
+    record_types.write(os.path.join(out_dir, "record_types.json"))
+    write_json(os.path.join(out_dir, "institutes.json"), [
+        {"institute_id": institute_id, "records": sum(mix.values()), "record_types": dict(mix)}
+        for institute_id, mix in institute_volumes.items()
+    ])
+    write_json(os.path.join(out_dir, "citizens.json"), {
+        "generated_at": today.isoformat(),
+        "citizens": len(citizens),
+        "records": diagnoses.total(),
+        "citizens_with_records": len(citizens_with_records),
+        "citizens_with_recent_records": len(citizens_with_recent_records),
+        "sex": dict(sex_counts),
+        "blood_group": dict(blood_group_counts),
+        "age": {str(age): n for age, n in sorted(age_counts.items())},
+        "district_citizens": dict(district_citizens),
+        "district_records": dict(district_records),
+        "recent_diagnoses": dict(recent_diagnoses),
+    })
+    print(f"Saved cubes for {diagnoses.total()} records to {out_dir}/")
+
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"), ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build dashboard rollups from exported tables")
+    parser.add_argument("--data", default="data", help="directory holding the exported <table>.json files")
+    parser.add_argument("--out", default=None, help="output directory (default: <data>/cubes)")
+    args = parser.parse_args()
+    build(args.data, args.out)
@@ -0,0 +1,54 @@
+import numpy as np
+
+
+# Struct-of-arrays view of the generated citizens. A citizen's position in
+# the table is its dense integer id, so every stage can look up sex, age,
+# date of birth and issue date by index instead of searching by NID.
+# visits and entitlements hold the number of health records and the
+# entitlements (a bitmask over the rules in entitlement_rules.py) decided for
+# the citizen up front, which lets later stages know how many ids each
+# citizen will take. first_id is the global citizen id of position 0. dob and issued_date are stored
+# as days since 1970-01-01 so whole ranges convert to datetime64 at once.
+class CitizenTable:
+    def __init__(self, first_id=0):
+        self.first_id = first_id
+        self.nid = []
+        self.sex = []
+        self.age = []
+        self.dob = []
+        self.issued_date = []
+        self.visits = []
+        self.entitlements = []
+
+    def append(self, nid, sex, age, dob, issued_date, visits=0, entitlements=0):
+        self.nid.append(nid)
+        self.sex.append(sex)
+        self.age.append(age)
+        self.dob.append(dob)
+        self.issued_date.append(issued_date)
+        self.visits.append(visits)
+        self.entitlements.append(entitlements)
+        return len(self.nid) - 1
+
+    def __len__(self):
+        return len(self.nid)
+
+    def dates(self, column, start=0, stop=None):
+        return np.array(getattr(self, column)[start:stop], dtype=np.int64).astype("datetime64[D]")
+
+    # Sets new column values for the citizens at `positions` and re-evaluates
+    # the entitlement rules that read those columns for those citizens only.
+    # Returns the positions whose entitlements changed.
+    def update(self, positions, rules, **changes):
+        positions = np.asarray(positions, dtype=np.int64)
+        for column, values in changes.items():
+            target = getattr(self, column)
+            for position, value in zip(positions.tolist(), values):
+                target[position] = value
+        needed = set().union(*rules.columns)
+        columns = {column: [getattr(self, column)[p] for p in positions.tolist()] for column in needed}
+        before = np.array([self.entitlements[p] for p in positions.tolist()], dtype=np.int64)
+        after = rules.reevaluate(positions + self.first_id, columns, before, changes)
+        for position, bits in zip(positions.tolist(), after.tolist()):
+            self.entitlements[position] = bits
+        return positions[after != before]
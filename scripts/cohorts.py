@@ -0,0 +1,328 @@
+import argparse
+import os
+import pickle
+import sys
+import time
+import numpy as np
+from pyroaring import BitMap
+from build_cubes import address_parts
+from cubes import AGE_BANDS, age_bands
+from date_engine import ages_on, as_days, components, today
+from json_stream import iter_rows, table_file
+from validate_data import SortedIndex, chunks, days, nid_keys, to_bitmap
+
+# Roaring-bitmap index for cohort questions over the generated or pulled
+# tables:
+#
+#   python3 scripts/cohorts.py build --data data
+#   python3 scripts/cohorts.py query --records diagnosis=Anemia province=Karnali "year>=2020" \
+#       --citizens sex=Female "entitlement=Low Income"
+#
+# For every value of every dimension there is a bitmap of the record_ids
+# that have it and one of the citizen ids that have it (citizen ids are row
+# positions in citizens.json). A question is an expression of terms joined
+# with & | ~, evaluated by intersecting, uniting and subtracting bitmaps, so
+# an exact count costs a few compressed set operations however many records
+# there are.
+#
+# Record dimensions: diagnosis, province, year, month, sex, age_band (age at
+# the visit), institute, record_type. Citizen dimensions: sex, age_band (age
+# today), entitlement, plus the record dimensions other than sex and
+# age_band meaning "has a record with this value". Because those citizen
+# bitmaps look at each dimension separately, Visits(expr) is the exact form
+# of "has one record matching all of expr". A single record term is
+# answered from the citizen bitmaps; anything else is evaluated over records
+# and mapped to citizens, which costs time in proportion to the matching
+# records. On 1.3M records the example below takes under 1ms, but a broad
+# one such as lab reports since 2018 (155k records) takes about 3ms, so
+# compound visit questions are not sub-millisecond once they match more than
+# a few tens of thousands of records.
+#
+#   index = CohortIndex.load("data/cohorts.pkl")
+#   cohort = Visits(Q("diagnosis", "Anemia") & Q("province", "Karnali") & Q("year", at_least=2020)) \
+#       & Q("sex", "Female") & Q("entitlement", "Low Income")
+#   index.citizens(cohort)  # BitMap of citizen ids; index.nids(...) for NIDs
+
+INDEX_FILE = "cohorts.pkl"
+RECORD_DIMENSIONS = ["diagnosis", "province", "year", "month", "sex", "age_band", "institute", "record_type"]
+CITIZEN_DIMENSIONS = ["sex", "age_band", "entitlement"]
+BAND_LABELS = np.array(AGE_BANDS, dtype=object)
+UNKNOWN = "Unknown"
+NO_CITIZEN = np.iinfo(np.uint32).max
+
+
+#-------------- Queries ------------
+class Expr:
+    def __and__(self, other):
+        return Op("and", self, other)
+
+    def __or__(self, other):
+        return Op("or", self, other)
+
+    def __invert__(self):
+        return Op("not", self)
+
+
+# One dimension matching any of `values`, or for ordered dimensions (year,
+# month, institute) anything in [at_least, at_most].
+class Q(Expr):
+    def __init__(self, dimension, *values, at_least=None, at_most=None):
+        self.dimension = dimension
+        self.values = values
+        self.at_least = at_least
+        self.at_most = at_most
+
+    def evaluate(self, index, level):
+        bitmaps = index.bitmaps[level].get(self.dimension)
+        if bitmaps is None:
+            raise KeyError(f"No {level} dimension {self.dimension!r}; have {sorted(index.bitmaps[level])}")
+        if self.at_least is not None or self.at_most is not None:
+            keys = [
+                key for key in bitmaps
+                if (self.at_least is None or key >= self.at_least) and (self.at_most is None or key <= self.at_most)
+            ]
+        else:
+            keys = self.values
+        return BitMap.union(BitMap(), *(bitmaps[key] for key in keys if key in bitmaps))
+
+
+class Op(Expr):
+    def __init__(self, op, *args):
+        self.op = op
+        self.args = args
+
+    def evaluate(self, index, level):
+        if self.op == "not":
+            return index.universe[level] - self.args[0].evaluate(index, level)
+        left, right = (arg.evaluate(index, level) for arg in self.args)
+        return left & right if self.op == "and" else left | right
+
+
+# Every record, or every citizen.
+class All(Expr):
+    def evaluate(self, index, level):
+        return index.universe[level].copy()
+
+
+# Citizens with at least one record matching expr.
+class Visits(Expr):
+    def __init__(self, expr):
+        self.expr = expr
+
+    def evaluate(self, index, level):
+        if level == "records":
+            return self.expr.evaluate(index, "records")
+        if isinstance(self.expr, Q) and self.expr.dimension not in CITIZEN_DIMENSIONS:
+            return self.expr.evaluate(index, "citizens")
+        records = self.expr.evaluate(index, "records") - index.orphans
+        seen = np.zeros(len(index.universe["citizens"]), dtype=bool)
+        seen[index.record_citizen[np.frombuffer(records.to_array(), dtype=np.uint32)]] = True
+        return to_bitmap(np.flatnonzero(seen))
+
+
+#-------------- Index ------------
+# Records whose NID is not in citizens stay in the record universe and in
+# every record dimension, with sex and age_band "Unknown", so the values of
+# any record dimension still add up to the record total. They are also kept
+# in `orphans`, and have no citizen for Visits to map them to.
+class CohortIndex:
+    def __init__(self, bitmaps, universe, record_citizen, nid_numbers, orphans, orphan_entitlements=0):
+        self.bitmaps = bitmaps
+        self.universe = universe
+        self.record_citizen = record_citizen
+        self.nid_numbers = nid_numbers
+        self.orphans = orphans
+        self.orphan_entitlements = orphan_entitlements
+
+    def records(self, expr):
+        return expr.evaluate(self, "records")
+
+    def citizens(self, expr):
+        return expr.evaluate(self, "citizens")
+
+    def nids(self, citizens):
+        return [self.nid_numbers[i] for i in citizens]
+
+    def save(self, path):
+        for level in self.bitmaps.values():
+            for values in level.values():
+                for bitmap in values.values():
+                    bitmap.run_optimize()
+        tmp_path = f"{path}.part"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    # Streams the four tables once each. Record ids must fit in 32 bits.
+    @classmethod
+    def build(cls, data_dir):
+        bitmaps = {
+            "records": {d: {} for d in RECORD_DIMENSIONS},
+            "citizens": {d: {} for d in RECORD_DIMENSIONS + CITIZEN_DIMENSIONS},
+        }
+        now = today()
+
+        nid_numbers, keys, births, sexes = [], [], [], []
+        for chunk in chunks(iter_rows(table_file(data_dir, "citizens"))):
+            nids = [row["nid_number"] for row in chunk]
+            nid_numbers.extend(nids)
+            keys.append(nid_keys(nids))
+            births.append(days([row.get("date_of_birth") for row in chunk]))
+            sexes.extend(row.get("sex") for row in chunk)
+        citizens = SortedIndex(
+            np.concatenate(keys) if keys else np.zeros(0, np.int64), np.arange(len(nid_numbers), dtype=np.int64)
+        )
+        births = np.concatenate(births) if births else as_days([])
+        sexes = np.array(sexes, dtype=object)
+        citizen_ids = np.arange(len(nid_numbers), dtype=np.uint32)
+        add_groups(bitmaps["citizens"]["sex"], sexes, citizen_ids)
+        add_groups(bitmaps["citizens"]["age_band"], BAND_LABELS[age_bands(ages_on(births, now))], citizen_ids)
+
+        institute_provinces = {
+            institute["institute_id"]: address_parts(institute["address"])[1] or UNKNOWN
+            for institute in iter_rows(table_file(data_dir, "health_institutes"))
+        }
+
+        record_citizen = np.zeros(0, dtype=np.uint32)
+        all_records, orphans = BitMap(), BitMap()
+        for chunk in chunks(iter_rows(table_file(data_dir, "health_records"))):
+            found, owners = citizens.lookup(nid_keys([row["nid_number"] for row in chunk]))
+            owners = np.where(found, owners, NO_CITIZEN).astype(np.uint32)
+            ids = np.array([row["record_id"] for row in chunk], dtype=np.uint32)
+            if len(ids) and ids.max() >= len(record_citizen):
+                record_citizen = np.concatenate([record_citizen, np.full(ids.max() + 1 - len(record_citizen), NO_CITIZEN, np.uint32)])
+            record_citizen[ids] = owners
+            all_records |= to_bitmap(ids)
+            orphans |= to_bitmap(ids[~found])
+
+            issued = days([row["issued_date"] for row in chunk])
+            years, months, _ = components(issued)
+            institutes = np.array([row["institute_id"] for row in chunk], dtype=object)
+            columns = {
+                "diagnosis": np.array([row["diagnosis"] for row in chunk], dtype=object),
+                "province": np.array([institute_provinces.get(i, UNKNOWN) for i in institutes], dtype=object),
+                "year": years,
+                "month": months,
+                "sex": per_citizen(found, sexes[owners[found]]),
+                "age_band": per_citizen(found, BAND_LABELS[age_bands(ages_on(births[owners[found]], issued[found]))]),
+                "institute": institutes,
+                "record_type": np.array([row["record_type"] for row in chunk], dtype=object),
+            }
+            for dimension, values in columns.items():
+                add_groups(bitmaps["records"][dimension], values, ids)
+                # sex and age_band already hold the citizen's own values.
+                if dimension not in CITIZEN_DIMENSIONS:
+                    add_groups(bitmaps["citizens"][dimension], values[found], owners[found])
+
+        orphan_entitlements = 0
+        for chunk in chunks(iter_rows(table_file(data_dir, "entitlements"))):
+            found, owners = citizens.lookup(nid_keys([row["nid_number"] for row in chunk]))
+            types = np.array([row["entitlement_type"] for row in chunk], dtype=object)
+            add_groups(bitmaps["citizens"]["entitlement"], types[found], owners[found].astype(np.uint32))
+            orphan_entitlements += int((~found).sum())
+
+        universe = {"records": all_records, "citizens": to_bitmap(citizen_ids)}
+        return cls(bitmaps, universe, record_citizen, nid_numbers, orphans, orphan_entitlements)
+
+
+# A citizen column for a chunk of records: values where the record's
+# citizen was found, "Unknown" for orphans.
+def per_citizen(found, values):
+    column = np.full(len(found), UNKNOWN, dtype=object)
+    column[found] = values
+    return column
+
+
+# bitmaps[value] |= the ids whose row has that value, one sort per column.
+def add_groups(bitmaps, values, ids):
+    if not len(ids):
+        return
+    values = np.asarray(values)
+    order = np.argsort(values, kind="stable")
+    values, ids = values[order], ids[order]
+    starts = np.concatenate([[0], np.flatnonzero(values[1:] != values[:-1]) + 1])
+    for start, stop in zip(starts, np.append(starts[1:], len(values))):
+        key = values[start]
+        key = key.item() if isinstance(key, np.generic) else key
+        bitmap = bitmaps.get(key)
+        if bitmap is None:
+            bitmap = bitmaps[key] = BitMap()
+        bitmap |= to_bitmap(ids[start:stop])
+
+
+#-------------- Command line ------------
+# "dim=a,b", "dim>=x" or "dim<=x"; numeric values are compared as numbers.
+def parse_term(text):
+    for op in (">=", "<=", "="):
+        dimension, found, value = text.partition(op)
+        if found:
+            break
+    else:
+        raise ValueError(f"Cannot parse {text!r}; use dim=value[,value], dim>=value or dim<=value")
+    convert = lambda v: int(v) if v.lstrip("-").isdigit() else v
+    if op == ">=":
+        return Q(dimension, at_least=convert(value))
+    if op == "<=":
+        return Q(dimension, at_most=convert(value))
+    return Q(dimension, *(convert(v) for v in value.split(",")))
+
+
+def all_of(terms):
+    expr = None
+    for term in terms:
+        expr = term if expr is None else expr & term
+    return expr
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the roaring-bitmap cohort index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="index the tables in --data")
+    build.add_argument("--data", default="data")
+    build.add_argument("--output", help=f"index file (default <data>/{INDEX_FILE})")
+    query = commands.add_parser("query", help="count a cohort")
+    query.add_argument("--index", default=os.path.join("data", INDEX_FILE))
+    query.add_argument("--records", nargs="+", default=[], help="terms one record must match together")
+    query.add_argument("--citizens", nargs="+", default=[], help="terms on the citizen")
+    query.add_argument("--exclude", nargs="+", default=[], help="citizens matching any of these are left out")
+    query.add_argument("--show", type=int, default=0, help="print this many NIDs")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        started = time.perf_counter()
+        index = CohortIndex.build(args.data)
+        path = args.output or os.path.join(args.data, INDEX_FILE)
+        index.save(path)
+        print(f"Indexed {len(index.universe['records'])} records and {len(index.universe['citizens'])} citizens "
+              f"in {time.perf_counter() - started:.1f}s to {path} ({os.path.getsize(path):,} bytes)")
+        if index.orphans or index.orphan_entitlements:
+            print(f"Warning: {len(index.orphans)} records and {index.orphan_entitlements} entitlements have a NID "
+                  f"that is not in citizens; the records are indexed with sex and age_band {UNKNOWN!r}", file=sys.stderr)
+        return
+
+    index = CohortIndex.load(args.index)
+    records = all_of(parse_term(t) for t in args.records)
+    citizens = all_of(parse_term(t) for t in args.citizens)
+    expr = all_of(e for e in [Visits(records) if records else None, citizens] if e is not None) or All()
+    for term in args.exclude:
+        expr = expr & ~parse_term(term)
+
+    index.citizens(expr)  # the first evaluation pays NumPy's one-off setup
+    started = time.perf_counter()
+    matched_records = index.records(records) if records and not args.citizens and not args.exclude else None
+    cohort = index.citizens(expr)
+    elapsed = (time.perf_counter() - started) * 1000
+    if matched_records is not None:
+        print(f"{len(matched_records)} records")
+    print(f"{len(cohort)} citizens ({elapsed:.3f}ms)")
+    for nid in index.nids(list(cohort)[:args.show]):
+        print(f"  {nid}")
+
+
+if __name__ == "__main__":
+    main()
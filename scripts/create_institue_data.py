@@ -1,18 +1,20 @@
-import json
-import pandas
+import argparse
+from institutes import InstituteTable
 
+# Converts the institute registry CSV to the institute.json the generator
+# reads. Missing descriptions become "".
 
-data = pandas.read_csv("data/institute.csv")
 
-institutes = []
-for _, row in data.iterrows():
-    institutes.append({
-        "name": row["Hospital"],
-        "location": row["City"],
-        "province": row["Province"],
-        "description": row["Description"] if not pandas.isna(row["Description"]) else ""
-    })
+def main():
+    parser = argparse.ArgumentParser(description="Convert institute.csv to institute.json")
+    parser.add_argument("--input", default="data/institute.csv")
+    parser.add_argument("--output", default="data/institute.json")
+    args = parser.parse_args()
 
-with open("data/institute.json", "w", encoding="utf-8") as f:
-    json.dump(institutes, f, ensure_ascii=False, indent=4)
+    institutes = InstituteTable(args.input)
+    institutes.write_json(args.output)
+    print(f"Wrote {len(institutes)} institutes to {args.output}")
 
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import json
+import numpy as np
+
+# Age bands used by every analytics cube.
+AGE_BANDS = ["0-14", "15-24", "25-34", "35-44", "45-54", "55-64", "65+"]
+AGE_BAND_EDGES = np.array([15, 25, 35, 45, 55, 65])
+
+
+def age_band(age):
+    return int(np.searchsorted(AGE_BAND_EDGES, age, side="right"))
+
+
+def age_bands(ages):
+    return np.searchsorted(AGE_BAND_EDGES, np.asarray(ages), side="right")
+
+
+# A dense counter over named dimensions, e.g. diagnosis x province x year.
+# Each dimension either has a fixed list of labels or starts empty and grows
+# as new labels are seen. Memory is bounded by the number of label
+# combinations, not by how many rows were counted, and the serialized form
+# only lists the non-empty cells.
+class CounterCube:
+    def __init__(self, dimensions):
+        self.names = list(dimensions)
+        self.fixed = [labels is not None for labels in dimensions.values()]
+        self.labels = [list(labels or []) for labels in dimensions.values()]
+        self.index = [{label: i for i, label in enumerate(labels)} for labels in self.labels]
+        self.counts = np.zeros([max(len(labels), 1) for labels in self.labels], dtype=np.int64)
+
+    def code(self, axis, label):
+        i = self.index[axis].get(label)
+        if i is None:
+            if self.fixed[axis]:
+                raise KeyError(f"{label!r} is not a {self.names[axis]} label")
+            i = len(self.labels[axis])
+            self.labels[axis].append(label)
+            self.index[axis][label] = i
+            if i >= self.counts.shape[axis]:
+                self._grow(axis, i + 1)
+        return i
+
+    def _grow(self, axis, size):
+        pad = [(0, 0)] * self.counts.ndim
+        pad[axis] = (0, max(size, 2 * self.counts.shape[axis]) - self.counts.shape[axis])
+        self.counts = np.pad(self.counts, pad)
+
+    def add(self, *labels, count=1):
+        # Resolve the codes first: a new label may replace self.counts.
+        idx = tuple(self.code(axis, label) for axis, label in enumerate(labels))
+        self.counts[idx] += count
+
+    # Label codes for a whole column of one dimension.
+    def encode(self, name, labels):
+        axis = self.names.index(name)
+        return np.fromiter((self.code(axis, label) for label in labels), dtype=np.intp)
+
+    # Adds many rows at once from per-dimension arrays of label codes.
+    def add_codes(self, *codes, counts=None):
+        flat = np.ravel_multi_index(tuple(np.asarray(c) for c in codes), self.counts.shape)
+        self.counts.reshape(-1)[:] += np.bincount(flat, weights=counts, minlength=self.counts.size).astype(np.int64)
+
+    # The counts without the spare capacity of growable dimensions.
+    def dense(self):
+        return self.counts[tuple(slice(len(labels)) for labels in self.labels)]
+
+    def total(self):
+        return int(self.counts.sum())
+
+    # Sums out every dimension except the named ones.
+    def rollup(self, *names):
+        keep = [self.names.index(name) for name in names]
+        drop = tuple(axis for axis in range(len(self.names)) if axis not in keep)
+        return self.dense().sum(axis=drop)
+
+    def merge(self, other):
+        for axis, name in enumerate(other.names):
+            if name != self.names[axis]:
+                raise ValueError(f"Cannot merge cube over {other.names} into {self.names}")
+        codes = [
+            np.array([self.code(axis, label) for label in labels], dtype=np.intp)
+            for axis, labels in enumerate(other.labels)
+        ]
+        cells = np.nonzero(other.counts)
+        np.add.at(self.counts, tuple(codes[axis][idx] for axis, idx in enumerate(cells)), other.counts[cells])
+
+    # Sparse cubes are written as [code, code, ..., count] cells. Once a
+    # fifth of the cells are filled, a flat row-major list of every count is
+    # smaller, so that is written instead.
+    def to_json(self):
+        data = {"dimensions": [{"name": name, "labels": labels} for name, labels in zip(self.names, self.labels)]}
+        dense = self.dense()
+        cells = np.nonzero(dense)
+        if len(cells[0]) * len(self.names) > dense.size:
+            data["counts"] = dense.reshape(-1).tolist()
+        else:
+            data["cells"] = np.column_stack(cells + (dense[cells],)).tolist()
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        cube = cls({d["name"]: None for d in data["dimensions"]})
+        for axis, d in enumerate(data["dimensions"]):
+            for label in d["labels"]:
+                cube.code(axis, label)
+        if "counts" in data:
+            cube.dense()[...] += np.array(data["counts"], dtype=np.int64).reshape(cube.dense().shape)
+        for *coords, count in data.get("cells", []):
+            cube.counts[tuple(coords)] += count
+        return cube
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, separators=(",", ":"))
@@ -1,212 +1,570 @@
+import argparse
 import json
+import os
+import pickle
 import random
-import pandas
+import shutil
+import sys
+import tempfile
+import numpy as np
 from faker import Faker
-from datetime import timedelta, date
-from address_generator import load_location_data, generate_address, load_location_data_by_province
-from diagnosis_generator import generate_diagnosis
+from functools import lru_cache
+from itertools import accumulate
+from multiprocessing import Pool
+from address_generator import Gazetteer
+from build_cubes import address_parts
+from institutes import InstituteTable
+from diagnosis_generator import generate_diagnoses, encode_provinces, encode_sexes, DIAGNOSIS_LIST
 from prescription_generator import generate_prescription , generate_description
-from name_generator import generate_name
-from itertools import count
+from name_generator import NameSampler
+from citizen_table import CitizenTable
+from datetime import datetime, timezone
+from json_stream import NDJSONWriter, iter_rows, open_writer, table_file
+from cubes import AGE_BANDS, CounterCube, age_bands
+from id_allocator import IdSpace
+from samplers import AliasSampler
+from entitlement_rules import EntitlementRules
+from instrumentation import Instruments, RunReport
+from validate_data import validate
+from date_engine import DAY, ages_on, as_days, birth_dates, components, dates_between, iso, shift_years, today
 
 fake = Faker()
-Faker.seed(100)
 
+NUM_CITIZEN = 1000
+DEFAULT_SEED = 100
 
-location_data = load_location_data("data/new_location.csv")
-location_data_by_province = load_location_data_by_province("data/new_location.csv")
-institutes_json = pandas.read_json("data/institute.json")
+# Citizens are generated, named and diagnosed a block at a time, which keeps
+# the batch calls large without holding more than one block of rows.
+CITIZEN_BLOCK = 10_000
 
+# The citizen id space is split into shards of this many citizens. Shard
+# boundaries and seeds depend only on the seed and the shard size, never on
+# the number of workers, so the merged output is the same for any --workers.
+SHARD_SIZE = 50_000
 
-#-------------- Generate Citizens ------------
-NUM_CITIZEN = 1000
-citizens = []
-citizen_nids = []
-citizens_ages = []
-citizens_sex = []
-citizen_issued_dates = []
-citizen_dob = []
-start_year = 9999
-
-for _ in range(NUM_CITIZEN):
-
-    nid = fake.unique.numerify("###-###-###-#")
-    citizen_nids.append(nid)
-    sex = random.choices(["Male", "Female", "Other"], weights=[49, 47, 4])[0]
-    dob= fake.date_of_birth(minimum_age=18, maximum_age=90)
-    today = date.today()
-    age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
-
-    start_date = dob + timedelta(days=6570) 
-    issued_date = fake.date_between(start_date=start_date, end_date="today")  # after 18 years
-    start_year = min(start_year, issued_date.year)
-
-    citizens_sex.append(sex)
-    citizens_ages.append(age)
-    citizen_issued_dates.append(issued_date)
-    citizen_dob.append(dob)
-
-    citizens.append({
-        "nid_number": nid,
-        "full_name": generate_name(sex),
-        "citizenship_number": fake.unique.numerify("##-##-##-#####"),
-        "date_of_birth": dob.isoformat(),
-        "sex": sex,
-        "blood_group": random.choice(["A+","A-","B+","B-","O+","O-","AB+","AB-"]),
-        "father_name": generate_name("Male"),
-        "mother_name": generate_name("Female"),
-        "address": generate_address(location_data),
-        "phone": fake.unique.numerify(random.choice(["+977 98########", "+977 97########"])),
-        "email": fake.email(),
-        "created_at": issued_date.isoformat()
-    })
+SEXES = ["Male", "Female", "Other"]
 
+RECORD_TYPES = ["clinical_note", "lab_report", "imaging_report", "prescription", "discharge_summary"]
 
+# Fixed distributions, compiled once into alias tables (see samplers.py).
+SEX_SAMPLER = AliasSampler(SEXES, [49, 47, 4])
+BLOOD_GROUP_SAMPLER = AliasSampler(["A+", "A-", "B+", "B-", "O+", "O-", "AB+", "AB-"])
+RECORD_TYPE_SAMPLER = AliasSampler(RECORD_TYPES, [35, 15, 20, 20, 10])
+INSTITUTE_TYPE_SAMPLER = AliasSampler(["hospital", "clinic", "health_post"])
+OWNERSHIP_SAMPLER = AliasSampler(["government", "private"])
 
-#-------------- Generate Health Institutes ------------
-NUM_INSTITUTES = len(institutes_json)
-health_institutes = []
-institute_provinces = []
-institute_established_dates = []
-
-for i in range(1, NUM_INSTITUTES + 1):
-    institute_type = random.choice(["hospital", "clinic", "health_post"])
-    province = institutes_json.iloc[i % len(institutes_json)]["province"]
-    institute_provinces.append(province)
-    established_date = fake.date_between(start_date="-30y", end_date="-5y")
-    institute_established_dates.append(established_date)
-
-    health_institutes.append({
-        "institute_id": i,
-        "name": institutes_json.iloc[i % len(institutes_json)]["name"],
-        "type": institute_type,
-        "ownership": random.choice(["government", "private"]),
-        "address": generate_address(location_data_by_province[province]),
-        "phone": fake.unique.numerify("01-#######"),
-        "is_active": True,
-        "created_at": established_date.isoformat(),
-        "license_number": fake.unique.numerify(random.choice(["LIC-########", "HLT-########", "MED-########"]))
-    })
 
 
+#-------------- Seeding ------------
+def derive_seed(seed, *key):
+    return int(np.random.SeedSequence([seed, *key]).generate_state(1)[0])
 
-#-------------- Generate Health Records ------------
-health_records = []
-record_id = 1
-institute_ids = [i["institute_id"] for i in health_institutes]
-record_types = ["clinical_note", "lab_report", "imaging_report", "prescription", "discharge_summary"]
-
-diagnosis_list = ["No Significant Health Issue", "Hypertension", "Type 2 Diabetes", "High Cholesterol", "Obesity", "Upper Respiratory Infection", "Seasonal Allergies", "Asthma", "Sinusitis", "Gastroenteritis", "Anemia", "Arthritis", "Chronic Back Pain", "Depression", "Migraine", "Undifferentiated Fever"]
-diagnoses_record = {
-    diagnosis: [] for diagnosis in diagnosis_list
+
+# Seeds Faker and the stdlib random module and returns a NumPy generator on
+# the same seed, so a shard's output depends only on its derived seed.
+def reseed(seed):
+    random.seed(seed)
+    fake.seed_instance(seed)
+    return np.random.default_rng(seed)
+
+
+# Identifier spaces for unique columns. Ids are taken by counter: a citizen's
+# global dense id for citizen columns and institute_id - 1 for institutes, so
+# shards never overlap and nothing has to remember the ids already used.
+ID_PATTERNS = {
+    "nid_number": "###-###-###-#",
+    "citizenship_number": "##-##-##-#####",
+    "citizen_phone": ["+977 98########", "+977 97########"],
+    "institute_phone": "01-#######",
+    "license_number": ["LIC-########", "HLT-########", "MED-########"],
 }
-def add_diagnosis_record(diagnosis_, age_, sex_, province_, visit_date_):
-    diagnoses_record[diagnosis_].append({
-        "age": age_,                    
-        "sex": sex_,                    
-        "province": province_,    
-        "year": visit_date_.year,
-        "month": visit_date_.month
-    })
 
 
+# Entitlements are decided by the rule table in entitlement_rules.py, keyed
+# on the run seed and the global citizen id.
+def make_entitlement_rules(seed):
+    return EntitlementRules(derive_seed(seed, 4))
 
-for nid in citizen_nids:
-    for _ in range(random.randint(3, 10)):
 
-        institute_id = random.choice(institute_ids)
-        province = institute_provinces[institute_id - 1]
-        sex = citizens_sex[citizen_nids.index(nid)]
-        issued_date = citizen_issued_dates[citizen_nids.index(nid)]
-        established_date = institute_established_dates[institute_id - 1]
-        start_date = max(issued_date, established_date)
-        date = fake.date_between(start_date=start_date, end_date="today")
-        age = date.year - citizen_dob[citizen_nids.index(nid)].year - ((date.month, date.day) < (citizen_dob[citizen_nids.index(nid)].month, citizen_dob[citizen_nids.index(nid)].day))
+def make_id_spaces(seed):
+    return {
+        name: IdSpace(patterns, derive_seed(seed, 3, i))
+        for i, (name, patterns) in enumerate(ID_PATTERNS.items())
+    }
 
-        diagnosis = generate_diagnosis(
-            age=age,
-            sex=sex,
-            visit_date=date,
-            province=province,
-            start_year=start_year
-        )
-        health_records.append({
-            "record_id": record_id,
-            "nid_number": nid,
-            "institute_id": institute_id,
-            "record_type": random.choices(record_types, weights=[35, 15, 20, 20, 10])[0],
-            "title": diagnosis + " Report",
-            "description": generate_description(diagnosis),
-            "diagnosis": diagnosis,
-            "prescription": generate_prescription(diagnosis),
-            "issued_date": date.isoformat()
+
+@lru_cache(maxsize=None)
+def load_inputs():
+    return {
+        "gazetteer": Gazetteer("data/new_location.csv"),
+        "institutes": InstituteTable("data/institute.json"),
+        "name_sampler": NameSampler("data/names.json"),
+    }
+
+
+#-------------- Generate Citizens ------------
+def generate_citizens(first_citizen_id, num_citizens, citizen_table, id_spaces, entitlement_rules, name_sampler, gazetteer, rng):
+    now = today()
+    for block_start in range(0, num_citizens, CITIZEN_BLOCK):
+        block_size = min(CITIZEN_BLOCK, num_citizens - block_start)
+        sexes = SEX_SAMPLER.sample(block_size, rng)
+        blood_groups = BLOOD_GROUP_SAMPLER.sample(block_size, rng)
+        full_names = name_sampler.sample(sexes)
+        father_names = name_sampler.sample("Male", block_size)
+        mother_names = name_sampler.sample("Female", block_size)
+        addresses = gazetteer.addresses(block_size, rng=rng)
+        dobs = birth_dates(block_size, 18, 90, rng, now)
+        ages = ages_on(dobs, now)
+        entitlements = entitlement_rules.evaluate(
+            np.arange(first_citizen_id + block_start, first_citizen_id + block_start + block_size),
+            {"age": ages, "sex": np.array(sexes)},
+        ).tolist()
+        ages = ages.tolist()
+        issued_dates = dates_between(dobs + 6570 * DAY, now, rng)  # after 18 years
+        dob_strings, issued_strings = iso(dobs), iso(issued_dates)
+        dob_days, issued_days = dobs.astype(np.int64).tolist(), issued_dates.astype(np.int64).tolist()
+
+        for i in range(block_size):
+            citizen_id = first_citizen_id + block_start + i
+            nid = id_spaces["nid_number"].format(citizen_id)
+            sex = sexes[i]
+            citizen_table.append(
+                nid, sex, ages[i], dob_days[i], issued_days[i],
+                visits=random.randint(3, 10),
+                entitlements=entitlements[i]
+            )
+
+            yield {
+                "nid_number": nid,
+                "full_name": full_names[i],
+                "citizenship_number": id_spaces["citizenship_number"].format(citizen_id),
+                "date_of_birth": dob_strings[i],
+                "sex": sex,
+                "blood_group": blood_groups[i],
+                "father_name": father_names[i],
+                "mother_name": mother_names[i],
+                "address": addresses[i],
+                "phone": id_spaces["citizen_phone"].format(citizen_id),
+                "email": fake.email(),
+                "created_at": issued_strings[i]
+            }
+
+
+#-------------- Generate Health Institutes ------------
+# Institutes are few enough to keep in memory; the record stage needs their
+# provinces and establishment dates anyway. Institutes were established
+# between 30 and 5 years ago.
+def generate_health_institutes(institutes, gazetteer, id_spaces, rng):
+    health_institutes = []
+    now = today()
+    institute_established_dates = dates_between(
+        as_days(shift_years(now, -30)), as_days(shift_years(now, -5)), rng, len(institutes)
+    )
+    established_strings = iso(institute_established_dates)
+    # Institute i takes the registry entry at i % len, as it always has.
+    names = institutes.names[1:] + institutes.names[:1]
+    institute_provinces = institutes.provinces[1:] + institutes.provinces[:1]
+    for i, (name, province) in enumerate(zip(names, institute_provinces), 1):
+        institute_type = INSTITUTE_TYPE_SAMPLER.draw()
+
+        health_institutes.append({
+            "institute_id": i,
+            "name": name,
+            "type": institute_type,
+            "ownership": OWNERSHIP_SAMPLER.draw(),
+            "address": gazetteer.address(province),
+            "phone": id_spaces["institute_phone"].format(i - 1),
+            "is_active": True,
+            "created_at": established_strings[i - 1],
+            "license_number": id_spaces["license_number"].format(i - 1)
         })
+    return health_institutes, institute_provinces, institute_established_dates
+
+
+#-------------- Diagnosis Cube ------------
+# diagnoses_record.json is a count of visits over these dimensions rather
+# than one row per visit, so its size depends only on the number of
+# combinations. Every shard builds the same dimensions, and the parent adds
+# the shard cubes together. Visits never predate the oldest institute.
+def make_diagnosis_cube(institute_provinces, institute_established_dates):
+    first_year = int(components(institute_established_dates.min())[0])
+    return CounterCube({
+        "diagnosis": DIAGNOSIS_LIST,
+        "age_band": AGE_BANDS,
+        "sex": SEXES,
+        "province": sorted(set(institute_provinces)),
+        "year": list(range(first_year, int(components(today())[0]) + 1)),
+        "month": list(range(1, 13)),
+    })
 
-        add_diagnosis_record(
-            diagnosis_=diagnosis,
-            age_=age,
-            sex_=sex,
-            province_=province,
-            visit_date_= date
+
+#-------------- Generate Health Records ------------
+# Visits are generated a block of citizens at a time as columns: institutes,
+# visit dates, ages and diagnoses are each drawn for the whole block in one
+# call and counted into diagnosis_cube in one add_codes call. Sexes and
+# provinces are encoded per citizen and per institute, not per visit. A
+# visit falls between the later of the citizen's issue date and the
+# institute's establishment date, and today.
+def generate_health_records(citizen_table, institute_provinces, institute_established_dates, start_year,
+                            rng, diagnosis_cube, first_record_id=1):
+    record_id = first_record_id
+    now = today()
+    established = as_days(institute_established_dates)
+    provinces_by_institute = encode_provinces(institute_provinces)
+    cube_provinces_by_institute = diagnosis_cube.encode("province", institute_provinces)
+
+    for block_start in range(0, len(citizen_table), CITIZEN_BLOCK):
+        block_stop = min(block_start + CITIZEN_BLOCK, len(citizen_table))
+        citizen_ids = np.repeat(
+            np.arange(block_start, block_stop), citizen_table.visits[block_start:block_stop]
+        )
+        if not len(citizen_ids):
+            continue
+        rows = citizen_ids - block_start
+        institute_ids = rng.integers(1, len(institute_provinces) + 1, size=len(citizen_ids))
+        lower = np.maximum(citizen_table.dates("issued_date", block_start, block_stop)[rows], established[institute_ids - 1])
+        visit_dates = dates_between(lower, now, rng)
+        ages = ages_on(citizen_table.dates("dob", block_start, block_stop)[rows], visit_dates)
+        years, months, _ = components(visit_dates)
+        block_sexes = citizen_table.sex[block_start:block_stop]
+
+        diagnosis_codes = generate_diagnoses(
+            ages=ages, sexes=encode_sexes(block_sexes)[rows], months=months, years=years,
+            provinces=provinces_by_institute[institute_ids - 1], start_year=start_year, rng=rng
+        )
+        diagnosis_cube.add_codes(
+            diagnosis_codes,
+            age_bands(ages),
+            diagnosis_cube.encode("sex", block_sexes)[rows],
+            cube_provinces_by_institute[institute_ids - 1],
+            years - diagnosis_cube.labels[diagnosis_cube.names.index("year")][0],
+            months - 1,
         )
-        record_id += 1
 
+        record_types = RECORD_TYPE_SAMPLER.sample(len(citizen_ids), rng)
+        nids = citizen_table.nid
+        for citizen_id, institute_id, issued_date, code, record_type in zip(
+            citizen_ids.tolist(), institute_ids.tolist(), iso(visit_dates), diagnosis_codes.tolist(), record_types
+        ):
+            diagnosis = DIAGNOSIS_LIST[code]
+            yield {
+                "record_id": record_id,
+                "nid_number": nids[citizen_id],
+                "institute_id": institute_id,
+                "record_type": record_type,
+                "title": diagnosis + " Report",
+                "description": generate_description(diagnosis),
+                "diagnosis": diagnosis,
+                "prescription": generate_prescription(diagnosis),
+                "issued_date": issued_date
+            }
+            record_id += 1
 
-#-------------- Generate Entitlements ------------
-entitlements = []
-entitlement_mapping = {
-    "Senior": ["Age-based subsidy (Over 65)", "Retirement Benefit Scheme"],
-    "Disability": ["Physical Impairment Support", "Permanent Disability Grant"],
-    "Maternity": ["Prenatal Care Package", "Post-delivery Support"],
-    "Veteran": ["Military Service Benefit", "Ex-Servicemen Health Scheme"],
-    "Low Income": ["Below Poverty Line (BPL) Card", "Social Welfare Subsidy"]
-}
 
-entitlement_id = count(1)
-
-def apply_for_entitlement(nid_number, e_type):
-    if e_type not in entitlement_mapping:
-        return
-    
-    entitlement_id_value = next(entitlement_id)
-    valid_from = fake.date_between(start_date="-5y", end_date="today")
-    valid_until = valid_from + timedelta(days=random.randint(180, 1460))
-    reason = random.choice(entitlement_mapping[e_type])
-
-    entitlements.append({
-        "entitlement_id": entitlement_id_value,
-        "nid_number": nid_number,
-        "entitlement_type": e_type,
-        "eligibility_reason": reason,
-        "valid_from": valid_from.isoformat(),
-        "valid_until": valid_until.isoformat()
-    })
+#-------------- Generate Entitlements ------------
+# One row per bit set in the citizens' entitlement bitmasks, with reasons
+# and validity windows drawn for a whole block at a time (see
+# EntitlementRules.grants).
+def generate_entitlements(citizen_table, entitlement_rules, rng, first_entitlement_id=1):
+    entitlement_id = first_entitlement_id
+    now = today()
+    names = entitlement_rules.names
+    for block_start in range(0, len(citizen_table), CITIZEN_BLOCK):
+        block_stop = min(block_start + CITIZEN_BLOCK, len(citizen_table))
+        rows, rules, reasons, valid_from, valid_until = entitlement_rules.grants(
+            citizen_table.entitlements[block_start:block_stop], rng, now
+        )
+        for citizen_id, r, reason, start, end in zip(
+            (rows + block_start).tolist(), rules.tolist(), reasons.tolist(), iso(valid_from), iso(valid_until)
+        ):
+            yield {
+                "entitlement_id": entitlement_id,
+                "nid_number": citizen_table.nid[citizen_id],
+                "entitlement_type": names[r],
+                "eligibility_reason": entitlement_rules.reason(r, reason),
+                "valid_from": start,
+                "valid_until": end
+            }
+            entitlement_id += 1
+
+
+#-------------- Shards ------------
+# A shard runs in two phases. The citizen phase writes the shard's citizens
+# and pickles its CitizenTable, reporting the earliest issue year and how many
+# records and entitlements the shard will produce. Once every shard has
+# reported, the parent knows the global start year and each shard's first
+# record_id and entitlement_id, and the record phase can write final rows
+# that are merged by plain concatenation.
+def part_path(workdir, table, shard):
+    return os.path.join(workdir, f"{table}-{shard:05d}.ndjson")
+
+
+def table_path(workdir, shard):
+    return os.path.join(workdir, f"citizen_table-{shard:05d}.pkl")
+
+
+# Both phases also return their stage records (empty unless instrumented).
+def generate_citizen_shard(job):
+    seed, shard, first_citizen_id, num_citizens, workdir, options = job
+    instruments = Instruments.from_options(options, f"-{shard:05d}")
+    inputs = load_inputs()
+    rng = reseed(derive_seed(seed, 1, shard))
+
+    entitlement_rules = make_entitlement_rules(seed)
+    citizen_table = CitizenTable(first_citizen_id)
+    with instruments.stage("citizens") as stage, NDJSONWriter(part_path(workdir, "citizens", shard)) as writer:
+        stage.write_rows(writer, generate_citizens(
+            first_citizen_id, num_citizens, citizen_table, make_id_spaces(seed), entitlement_rules,
+            inputs["name_sampler"], inputs["gazetteer"], rng
+        ))
+    with open(table_path(workdir, shard), "wb") as f:
+        pickle.dump(citizen_table, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return (
+        int(components(citizen_table.dates("issued_date").min())[0]),
+        sum(citizen_table.visits),
+        int(entitlement_rules.counts(citizen_table.entitlements).sum()),
+        instruments.stages,
+    )
+
+
+def generate_record_shard(job):
+    (seed, shard, workdir, start_year, first_record_id, first_entitlement_id,
+     institute_provinces, institute_established_dates, options) = job
+    instruments = Instruments.from_options(options, f"-{shard:05d}")
+    rng = reseed(derive_seed(seed, 2, shard))
+    with open(table_path(workdir, shard), "rb") as f:
+        citizen_table = pickle.load(f)
+
+    diagnosis_cube = make_diagnosis_cube(institute_provinces, institute_established_dates)
+    with instruments.stage("health_records") as stage, \
+            NDJSONWriter(part_path(workdir, "health_records", shard)) as writer:
+        stage.write_rows(writer, generate_health_records(
+            citizen_table, institute_provinces, institute_established_dates, start_year,
+            rng, diagnosis_cube, first_record_id
+        ))
+
+    with instruments.stage("entitlements") as stage, \
+            NDJSONWriter(part_path(workdir, "entitlements", shard)) as writer:
+        stage.write_rows(writer, generate_entitlements(citizen_table, make_entitlement_rules(seed), rng, first_entitlement_id))
+    return diagnosis_cube, instruments.stages
+
+
+def merge_parts(workdir, table, shards, fmt, append=False):
+    with open_writer(f"data/{table}", fmt, append=append) as writer:
+        for shard in shards:
+            with open(part_path(workdir, table, shard), encoding="utf-8") as f:
+                for line in f:
+                    writer.write_raw(line.rstrip("\n"))
+    return writer.rows
+
+
+#-------------- Append State ------------
+# Every run leaves a small state file next to its output: the counters the
+# next run continues from, plus what records need to know about the
+# existing data. --append reads it instead of the generated tables, so
+# growing a dataset costs about as much as generating the new rows. Without
+# one (data generated before it existed), the tables are scanned once,
+# streaming, to rebuild it.
+STATE_FILE = "data/.generator_state.json"
+
+
+def load_state(seed):
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    return scan_state(seed)
+
+
+def save_state(state):
+    tmp_path = STATE_FILE + ".part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_FILE)
+
+
+def scan_state(seed):
+    fmt = next((f for f in ["json", "ndjson"] if os.path.exists(table_file("data", "citizens", f))), None)
+    if fmt is None:
+        raise FileNotFoundError(f"Nothing to append to: no {STATE_FILE} and no data/citizens.json or .ndjson")
+
+    citizens, start_year = 0, None
+    expected_nid = make_id_spaces(seed)["nid_number"].format(0)
+    for row in iter_rows(table_file("data", "citizens", fmt)):
+        if citizens == 0 and row["nid_number"] != expected_nid:
+            raise ValueError(f"data/citizens was not generated with --seed {seed}; pass the seed it was made with")
+        citizens += 1
+        year = int(row["created_at"][:4])
+        start_year = year if start_year is None else min(start_year, year)
+    records = max((row["record_id"] for row in iter_rows(table_file("data", "health_records", fmt))), default=0)
+    entitlements = max((row["entitlement_id"] for row in iter_rows(table_file("data", "entitlements", fmt))), default=0)
+    return {
+        "seed": seed,
+        "format": fmt,
+        "citizens": citizens,
+        # Shard numbers seed the shards' generators. A run never has more
+        # shards than citizens, so numbering from here reuses none of them.
+        "next_shard": citizens,
+        "next_record_id": records + 1,
+        "next_entitlement_id": entitlements + 1,
+        "start_year": start_year,
+        "runs": [],
+    }
+
+
+# Provinces and establishment dates of the institutes already written, the
+# two things the record phase needs from them.
+def read_institutes(fmt):
+    provinces, established = [], []
+    for row in iter_rows(table_file("data", "health_institutes", fmt)):
+        provinces.append(address_parts(row["address"])[1])
+        established.append(row["created_at"])
+    return provinces, as_days(established)
 
-for i, nid in enumerate(citizen_nids):
-    age = citizens_ages[i]
-    sex = citizens_sex[i]
-    if age >= 65:
-        apply_for_entitlement(nid, "Senior")
-
-    if sex == "Female" and random.random() < 0.3 and age < 50 and age > 18:
-        apply_for_entitlement(nid, "Maternity")
-    
-    if random.random() < 0.1:
-        apply_for_entitlement(nid, "Disability")
-    
-    if age > 40 and random.random() < 0.2:
-        apply_for_entitlement(nid, "Veteran")
-    
-    if random.random() < 0.25:
-        apply_for_entitlement(nid, "Low Income")
 
 #-------------- Write to JSON files ------------
-def write_json(filename, data):
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-
-write_json("data/citizens.json", citizens)
-write_json("data/health_institutes.json", health_institutes)
-write_json("data/health_records.json", health_records)
-write_json("data/entitlements.json", entitlements)
-write_json("data/diagnoses_record.json", diagnoses_record)
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic e-health data into data/")
+    parser.add_argument("--citizens", type=int, default=NUM_CITIZEN, help="citizens to generate, or to add with --append")
+    parser.add_argument("--append", action="store_true",
+                        help=f"add the citizens, their records and entitlements to the dataset in data/ (continues {STATE_FILE})")
+    parser.add_argument("--format", choices=["json", "ndjson"], default="json",
+                        help="compact JSON arrays (default) or newline-delimited JSON")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--workers", type=int, default=1, help="processes used to generate shards")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="citizens per shard")
+    parser.add_argument("--instrument", action="store_true",
+                        help="report progress and per-stage time, rows/sec and allocation peaks to data/run_report.json")
+    parser.add_argument("--profile", metavar="DIR", help="also write a cProfile dump per stage and shard to DIR")
+    parser.add_argument("--warehouse", metavar="DIR",
+                        help="also write the tables to the Iceberg warehouse in DIR (appended as a new snapshot with --append)")
+    parser.add_argument("--validate", action="store_true",
+                        help="check foreign keys and dates of the output afterwards and exit 1 on violations")
+    args = parser.parse_args()
+    if args.citizens < 0:
+        parser.error("--citizens must be 0 or more")
+    if args.shard_size < 1:
+        parser.error("--shard-size must be at least 1")
+
+    options = {"enabled": args.instrument, "profile_dir": os.path.abspath(args.profile) if args.profile else None}
+    report = RunReport(options, vars(args))
+
+    if args.append:
+        with report.stage("state"):
+            state = load_state(args.seed)
+            institute_provinces, institute_established_dates = read_institutes(state["format"])
+        seed, fmt = state["seed"], state["format"]
+    else:
+        seed, fmt = args.seed, args.format
+        state = {
+            "seed": seed, "format": fmt, "citizens": 0, "next_shard": 0,
+            "next_record_id": 1, "next_entitlement_id": 1, "start_year": None, "runs": [],
+        }
+
+    first_citizen_id = state["citizens"]
+    shard_sizes = [
+        min(args.shard_size, args.citizens - start)
+        for start in range(0, args.citizens, args.shard_size)
+    ]
+    shards = list(range(state["next_shard"], state["next_shard"] + len(shard_sizes)))
+    num_shards = len(shards)
+
+    id_spaces = make_id_spaces(seed)
+    for name in ["nid_number", "citizenship_number", "citizen_phone"]:
+        if first_citizen_id + args.citizens > id_spaces[name].capacity:
+            parser.error(f"{first_citizen_id + args.citizens} citizens exceeds the {id_spaces[name].capacity} ids available for {name}")
+
+    with report.stage("inputs"):
+        inputs = load_inputs()
+    if not args.append:
+        rng = reseed(derive_seed(seed, 0))
+        with report.stage("health_institutes") as stage, open_writer("data/health_institutes", fmt) as writer:
+            health_institutes, institute_provinces, institute_established_dates = generate_health_institutes(
+                inputs["institutes"], inputs["gazetteer"], id_spaces, rng
+            )
+            stage.write_rows(writer, health_institutes)
+
+    workdir = tempfile.mkdtemp(prefix=".shards-", dir="data")
+    pool = Pool(args.workers) if args.workers > 1 else None
+    run = pool.imap if pool else map
+    try:
+        citizen_jobs = [
+            (seed, shard, first_citizen_id + i * args.shard_size, size, workdir, options)
+            for i, (shard, size) in enumerate(zip(shards, shard_sizes))
+        ]
+        shard_stats = []
+        with report.stage("citizen_phase"):
+            report.phase("citizens", num_shards)
+            for done, (*stats, stages) in enumerate(run(generate_citizen_shard, citizen_jobs), 1):
+                shard_stats.append(stats)
+                report.shard_done("citizens", done, num_shards, stages)
+
+        # Appended records keep the diagnosis trends of the existing data. A
+        # run without citizens has no records to date, and leaves it unset.
+        start_year = state["start_year"] or min((year for year, _, _ in shard_stats), default=None)
+        first_record_ids = list(accumulate((records for _, records, _ in shard_stats), initial=state["next_record_id"]))
+        first_entitlement_ids = list(accumulate((grants for _, _, grants in shard_stats), initial=state["next_entitlement_id"]))
+        record_jobs = [
+            (seed, shard, workdir, start_year, first_record_id, first_entitlement_id,
+             institute_provinces, institute_established_dates, options)
+            for shard, first_record_id, first_entitlement_id in zip(shards, first_record_ids, first_entitlement_ids)
+        ]
+        diagnosis_cube = make_diagnosis_cube(institute_provinces, institute_established_dates)
+        with report.stage("record_phase"):
+            report.phase("records", num_shards)
+            for done, (shard_cube, stages) in enumerate(run(generate_record_shard, record_jobs), 1):
+                diagnosis_cube.merge(shard_cube)
+                report.shard_done("records", done, num_shards, stages)
+
+        for table in ["citizens", "health_records", "entitlements"]:
+            with report.stage(f"merge_{table}") as stage:
+                stage.rows = merge_parts(workdir, table, shards, fmt, append=args.append)
+        with report.stage("diagnoses_record") as stage:
+            if args.append:
+                with open("data/diagnoses_record.json", encoding="utf-8") as f:
+                    existing_cube = CounterCube.from_json(json.load(f))
+                existing_cube.merge(diagnosis_cube)
+                diagnosis_cube = existing_cube
+            diagnosis_cube.write("data/diagnoses_record.json")
+            stage.rows = diagnosis_cube.total()
+
+        # The shard parts hold exactly this run's rows, so an append only
+        # sends the new ones.
+        if args.warehouse:
+            from warehouse import export_warehouse
+            sources = {table: [part_path(workdir, table, shard) for shard in shards]
+                       for table in ["citizens", "health_records", "entitlements"]}
+            if not args.append:
+                sources = {"health_institutes": [table_file("data", "health_institutes", fmt)], **sources}
+            with report.stage("warehouse"):
+                export_warehouse("data", args.warehouse, "append" if args.append else "overwrite", sources)
+
+        state.update({
+            "citizens": first_citizen_id + args.citizens,
+            "next_shard": shards[-1] + 1 if shards else state["next_shard"],
+            "next_record_id": first_record_ids[-1],
+            "next_entitlement_id": first_entitlement_ids[-1],
+            "start_year": start_year,
+        })
+        state["runs"].append({
+            "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "append": args.append,
+            "citizens": args.citizens,
+        })
+        save_state(state)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        shutil.rmtree(workdir)
+    if args.validate:
+        with report.stage("validate"):
+            validation = validate("data")
+        validation.print()
+    report.write("data/run_report.json")
+    if args.validate and not validation.ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
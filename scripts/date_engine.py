@@ -0,0 +1,71 @@
+from datetime import date
+import numpy as np
+
+# Column-at-a-time dates. Dates are datetime64[D] arrays (days since
+# 1970-01-01), so drawing a date between per-row bounds, comparing dates or
+# taking ages is one NumPy operation per column instead of a Faker call or a
+# tuple comparison per row.
+
+DAY = np.timedelta64(1, "D")
+
+
+def today():
+    return np.datetime64(date.today(), "D")
+
+
+# The same calendar day `years` years earlier or later; 29 February becomes
+# 28 February in other years.
+def shift_years(day, years):
+    day = day if isinstance(day, date) else day.astype(date)
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:
+        return day.replace(year=day.year + years, day=28)
+
+
+def as_days(values):
+    return np.asarray(values, dtype="datetime64[D]")
+
+
+# One uniformly drawn day in [lower, upper] (both inclusive) per row. Either
+# bound may be a scalar or a per-row array; rows whose lower bound is past
+# the upper bound get the upper bound.
+def dates_between(lower, upper, rng, size=None):
+    lower, upper = as_days(lower), as_days(upper)
+    if size is None:
+        size = np.broadcast(lower, upper).shape
+    span = np.maximum((upper - lower) // DAY, 0) + 1
+    offsets = (rng.random(size) * span).astype(np.int64)
+    return np.minimum(lower + offsets * DAY, upper)
+
+
+# Birth dates of people aged min_age to max_age on `on`, uniform over days,
+# like Faker's date_of_birth.
+def birth_dates(size, min_age, max_age, rng, on=None):
+    on = on if on is not None else today()
+    earliest = as_days(shift_years(on, -(max_age + 1))) + DAY
+    latest = as_days(shift_years(on, -min_age))
+    return dates_between(earliest, latest, rng, size)
+
+
+def components(dates):
+    dates = as_days(dates)
+    years = dates.astype("datetime64[Y]")
+    months = dates.astype("datetime64[M]")
+    return (
+        years.astype(np.int64) + 1970,
+        (months - years).astype(np.int64) + 1,
+        ((dates - months) // DAY).astype(np.int64) + 1,
+    )
+
+
+# Completed years between birth and `on`, row by row.
+def ages_on(births, on):
+    birth_year, birth_month, birth_day = components(births)
+    year, month, day = components(on)
+    return year - birth_year - ((month * 32 + day) < (birth_month * 32 + birth_day))
+
+
+def iso(dates):
+    return np.datetime_as_string(as_days(dates), unit="D").tolist()
+
@@ -1,4 +1,5 @@
 import random
+import numpy as np
 # from datetime import date
 
 
@@ -181,6 +182,119 @@ def generate_diagnosis(age, sex, visit_date, province, start_year = 2010):
 
     return random.choices(diagnoses, weights=probs, k=1)[0]
 
+#-------------- Batch engine ------------
+# generate_diagnosis rebuilds the weights for every visit. The batch engine
+# evaluates the same multiplier functions once per (age band, sex, month,
+# province) cell, so a visit's weights are a single lookup plus the trend and
+# noise terms.
+
+DIAGNOSIS_LIST = list(DIAGNOSES)
+SEXES = ["Male", "Female"]
+PROVINCES = list(PROVINCE_MULTIPLIERS)
+
+# Every age at which some age_multiplier branch changes; ages are whole years.
+AGE_BAND_EDGES = np.array([15, 25, 30, 35, 40, 45, 50, 55, 60, 61])
+_AGE_BAND_REPRESENTATIVES = [0] + AGE_BAND_EDGES.tolist()
+
+# The extra sex and province slots hold values the multipliers don't know
+# about, which the scalar function treats as neutral.
+_UNKNOWN_SEX = len(SEXES)
+_UNKNOWN_PROVINCE = len(PROVINCES)
+# The code encode_sexes gives "Other", which generate_diagnoses draws as
+# Male or Female visit by visit, as generate_diagnosis does.
+OTHER_SEX = _UNKNOWN_SEX + 1
+
+_TREND_SLOPES = np.array([TREND_UP.get(d, TREND_DOWN.get(d, 0.0)) for d in DIAGNOSIS_LIST], dtype=np.float32)
+
+
+def _build_weight_tensor():
+    sexes = SEXES + [None]
+    provinces = PROVINCES + [None]
+    tensor = np.empty((len(_AGE_BAND_REPRESENTATIVES), len(sexes), 12, len(provinces), len(DIAGNOSIS_LIST)), dtype=np.float32)
+    for b, age in enumerate(_AGE_BAND_REPRESENTATIVES):
+        for s, sex in enumerate(sexes):
+            for month in range(1, 13):
+                for p, province in enumerate(provinces):
+                    tensor[b, s, month - 1, p] = [
+                        base_prob
+                        * age_multiplier(diagnosis, age)
+                        * month_multiplier(diagnosis, month)
+                        * province_multiplier(diagnosis, province)
+                        * sex_multiplier(diagnosis, sex)
+                        for diagnosis, base_prob in DIAGNOSES.items()
+                    ]
+    return tensor
+
+
+WEIGHT_TENSOR = _build_weight_tensor()
+_WEIGHT_ROWS = WEIGHT_TENSOR.reshape(-1, len(DIAGNOSIS_LIST))
+
+
+def _encode(values, labels, unknown):
+    # Integer arrays are taken as codes into labels; anything else is mapped
+    # label by label through its unique values.
+    values = np.asarray(values)
+    if values.dtype.kind in "iu":
+        return values
+    uniques, inverse = np.unique(values, return_inverse=True)
+    lookup = {label: i for i, label in enumerate(labels)}
+    codes = np.array([lookup.get(u, unknown) for u in uniques.tolist()], dtype=np.intp)
+    return codes[inverse.reshape(values.shape)]
+
+
+# Codes for generate_diagnoses. Encoding is a sort of the column, so callers
+# with many visits per citizen or institute encode those once and index the
+# codes per visit.
+def encode_sexes(sexes):
+    return _encode(sexes, SEXES + [None, "Other"], _UNKNOWN_SEX)
+
+
+def encode_provinces(provinces):
+    return _encode(provinces, PROVINCES, _UNKNOWN_PROVINCE)
+
+
+def _resolve_other(codes, rng):
+    codes = np.array(codes)
+    other = codes == OTHER_SEX
+    codes[other] = rng.integers(0, len(SEXES), size=int(other.sum()))
+    return codes
+
+
+# Vectorized generate_diagnosis over whole columns of visits. Returns indexes
+# into DIAGNOSIS_LIST; sexes and provinces may be strings or the codes
+# encode_sexes and encode_provinces give for them.
+def generate_diagnoses(ages, sexes, months, years, provinces, start_year=2010, rng=None, chunk_size=4096):
+    if rng is None:
+        rng = np.random.default_rng()
+
+    bands = np.searchsorted(AGE_BAND_EDGES, np.asarray(ages), side="right")
+    sex_codes = _resolve_other(encode_sexes(sexes), rng)
+    province_codes = encode_provinces(provinces)
+    cells = np.ravel_multi_index(
+        (bands, sex_codes, np.asarray(months) - 1, province_codes),
+        WEIGHT_TENSOR.shape[:-1],
+    )
+    year_index = (np.asarray(years) - start_year).astype(np.float32)
+
+    # Small chunks keep the per-chunk weight matrix in cache.
+    n = len(cells)
+    result = np.empty(n, dtype=np.uint8)
+    for lo in range(0, n, chunk_size):
+        hi = min(lo + chunk_size, n)
+        weights = _WEIGHT_ROWS[cells[lo:hi]]
+        weights *= 1.0 + year_index[lo:hi, None] * _TREND_SLOPES
+        noise = rng.random(weights.shape, dtype=np.float32)  # uniform(0.85, 1.15)
+        noise *= np.float32(0.3)
+        noise += np.float32(0.85)
+        weights *= noise
+        np.maximum(weights, np.float32(0.0001), out=weights)
+
+        np.cumsum(weights, axis=1, out=weights)
+        draws = rng.random(hi - lo, dtype=np.float32) * weights[:, -1]
+        picks = (weights < draws[:, None]).sum(axis=1)
+        result[lo:hi] = np.minimum(picks, len(DIAGNOSIS_LIST) - 1)
+    return result
+
 # Example usage:
 # dx = generate_diagnosis(
 #     age=45,
@@ -0,0 +1,151 @@
+import operator
+import numpy as np
+from date_engine import DAY, as_days, dates_between, shift_years, today
+
+# Who gets which entitlement, as data. A citizen gets an entitlement when
+# every condition in "when" holds for their columns and their draw for the
+# rule falls under "probability". "reasons" are the eligibility reasons a
+# grant picks from uniformly, and "valid_days" bounds how long a grant lasts
+# (inclusive). Adding an entitlement means adding a row here.
+ENTITLEMENT_RULES = [
+    {
+        "name": "Senior",
+        "when": [("age", ">=", 65)],
+        "probability": 1.0,
+        "reasons": ["Age-based subsidy (Over 65)", "Retirement Benefit Scheme"],
+        "valid_days": (180, 1460),
+    },
+    {
+        "name": "Maternity",
+        "when": [("sex", "==", "Female"), ("age", ">", 18), ("age", "<", 50)],
+        "probability": 0.3,
+        "reasons": ["Prenatal Care Package", "Post-delivery Support"],
+        "valid_days": (180, 1460),
+    },
+    {
+        "name": "Disability",
+        "when": [],
+        "probability": 0.1,
+        "reasons": ["Physical Impairment Support", "Permanent Disability Grant"],
+        "valid_days": (180, 1460),
+    },
+    {
+        "name": "Veteran",
+        "when": [("age", ">", 40)],
+        "probability": 0.2,
+        "reasons": ["Military Service Benefit", "Ex-Servicemen Health Scheme"],
+        "valid_days": (180, 1460),
+    },
+    {
+        "name": "Low Income",
+        "when": [],
+        "probability": 0.25,
+        "reasons": ["Below Poverty Line (BPL) Card", "Social Welfare Subsidy"],
+        "valid_days": (180, 1460),
+    },
+]
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "in": lambda column, values: np.isin(column, list(values)),
+}
+
+# Grant windows start in the last five years.
+WINDOW_YEARS = 5
+
+
+def _mix(values):
+    # splitmix64 over a uint64 array, as in id_allocator.
+    values = values * np.uint64(0x9E3779B97F4A7C15)
+    values ^= values >> np.uint64(31)
+    values *= np.uint64(0xBF58476D1CE4E5B9)
+    values ^= values >> np.uint64(29)
+    values *= np.uint64(0x94D049BB133111EB)
+    values ^= values >> np.uint64(32)
+    return values
+
+
+# The rule table compiled for column-at-a-time evaluation. A citizen's
+# entitlements are kept as a bitmask with bit i set for rule i.
+#
+# Each citizen's draw for a rule is a hash of the seed, the rule and their
+# global citizen id rather than a value taken from a stream, so evaluating
+# a citizen gives the same answer in any batch, in any shard and any
+# number of times. That is what lets reevaluate() redo only the citizens
+# and rules touched by a change.
+class EntitlementRules:
+    def __init__(self, seed, rules=ENTITLEMENT_RULES):
+        if len(rules) > 63:
+            raise ValueError("At most 63 entitlement rules fit in a bitmask")
+        self.rules = rules
+        self.names = [rule["name"] for rule in rules]
+        key = np.full(len(rules), seed & ((1 << 64) - 1), dtype=np.uint64)
+        self.rule_keys = _mix(key ^ _mix(np.arange(1, len(rules) + 1, dtype=np.uint64)))
+        self.columns = [{column for column, _, _ in rule["when"]} for rule in rules]
+        self.reason_counts = np.array([len(rule["reasons"]) for rule in rules])
+        self.min_days = np.array([rule["valid_days"][0] for rule in rules])
+        self.max_days = np.array([rule["valid_days"][1] for rule in rules])
+
+    def __len__(self):
+        return len(self.rules)
+
+    # Uniform [0, 1) draws, one per citizen id for rule r.
+    def draws(self, citizen_ids, r):
+        ids = np.asarray(citizen_ids, dtype=np.uint64)
+        return (_mix(ids ^ self.rule_keys[r]) >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+    def mask(self, r, citizen_ids, columns):
+        rule = self.rules[r]
+        eligible = self.draws(citizen_ids, r) < rule["probability"]
+        for column, op, value in rule["when"]:
+            eligible &= OPERATORS[op](np.asarray(columns[column]), value)
+        return eligible
+
+    # Entitlement bitmasks for a batch of citizens. columns maps column names
+    # ("age", "sex", ...) to one value per citizen.
+    def evaluate(self, citizen_ids, columns):
+        bits = np.zeros(len(citizen_ids), dtype=np.int64)
+        for r in range(len(self.rules)):
+            bits |= self.mask(r, citizen_ids, columns).astype(np.int64) << r
+        return bits
+
+    # New bitmasks for citizens whose `changed` columns were updated, given
+    # their previous bitmasks. Rules that read none of the changed columns
+    # keep their previous bits and are not evaluated.
+    def reevaluate(self, citizen_ids, columns, bits, changed):
+        bits = np.array(bits, dtype=np.int64)
+        changed = set(changed)
+        for r, rule_columns in enumerate(self.columns):
+            if rule_columns & changed:
+                bit = np.int64(1) << r
+                bits = np.where(self.mask(r, citizen_ids, columns), bits | bit, bits & ~bit)
+        return bits
+
+    def counts(self, bits):
+        bits = np.asarray(bits, dtype=np.int64)
+        return sum(((bits >> r) & 1) for r in range(len(self.rules)))
+
+    def names_of(self, bits):
+        return tuple(name for r, name in enumerate(self.names) if bits >> r & 1)
+
+    # Every grant in a batch of bitmasks, citizen by citizen and in rule
+    # order within a citizen, with its reason and validity window drawn in
+    # one go. Returns (rows, rules, reasons, valid_from, valid_until).
+    def grants(self, bits, rng, now=None):
+        now = now if now is not None else today()
+        bits = np.asarray(bits, dtype=np.int64)
+        held = ((bits[:, None] >> np.arange(len(self.rules))) & 1).astype(bool)
+        rows, rules = np.nonzero(held)
+        reasons = (rng.random(len(rules)) * self.reason_counts[rules]).astype(np.int64)
+        valid_from = dates_between(as_days(shift_years(now, -WINDOW_YEARS)), now, rng, len(rules))
+        valid_until = valid_from + rng.integers(self.min_days[rules], self.max_days[rules] + 1) * DAY
+        return rows, rules, reasons, valid_from, valid_until
+
+    def reason(self, r, i):
+        return self.rules[r]["reasons"][i]
+
@@ -1,54 +1,166 @@
 import os
-import dotenv
-import requests
 import json
 import time
+import asyncio
+import argparse
+import httpx
+from dotenv import load_dotenv
+from http_client import send_with_retry
 
-dotenv.load_dotenv()
+# Harvests Nepali first and last names from the MMO contact API into
+# data/names.json:
+#
+#   python3 scripts/fetch_names.py --count 500 --concurrency 8 --rate 5
+#
+# Requests run concurrently, but a token bucket keeps them under --rate per
+# second. 429s, server errors and dropped connections are retried with
+# exponential backoff (honouring Retry-After). Only new (first, last) pairs
+# are kept, and the file is rewritten every --checkpoint-every names, so an
+# interrupted harvest resumes from what is already in it. It can be pointed
+# at scripts/mmo_stub.py with --url to try it locally.
+
+load_dotenv()
 
 MMO_API_URL = os.getenv("MMO_API_URL")
 MMO_API_TOKEN = os.getenv("MMO_API_TOKEN")
 
-
 COUNT = 500
 OUTPUT_FILE = "data/names.json"
+GENDERS = {"Male": "male", "Female": "female"}
 
-data = {
-    "Male": {
-        "first_names": [],
-        "last_names": []
-    },
-    "Female": {
-        "first_names": [],
-        "last_names": []
-    }
-}
-
-def fetch_contact(gender):
-    params = {
-        "gender": gender,
-        "localization": "ne_NP",
-        "token": MMO_API_TOKEN
-    }
-    r = requests.get(MMO_API_URL, params=params, timeout=10)
-    r.raise_for_status()
-    return r.json()
-
-for gender in ["male", "female"]:
-    print(f"Fetching {COUNT} {gender} names...")
-    while len(data[gender]["first_names"]) < COUNT:
-        try:
-            contact = fetch_contact(gender)
+CONCURRENCY = 8
+RATE = 5.0
+CHECKPOINT_EVERY = 50
+RETRIES = 6
+# Requests per gender allowed per wanted name, so a source that has run out
+# of new names ends the harvest instead of looping forever.
+MAX_REQUESTS_PER_NAME = 5
+
+
+# Hands out `rate` tokens per second with bursts of up to `burst`.
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# The names fetched so far, as names.json stores them: per gender, parallel
+# first_names/last_names lists with one entry per contact.
+class NameStore:
+    def __init__(self, path):
+        self.path = path
+        self.data = {gender: {"first_names": [], "last_names": []} for gender in GENDERS}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            for gender in GENDERS:
+                pool = saved.get(gender, {})
+                self.data[gender]["first_names"] = list(pool.get("first_names", []))
+                self.data[gender]["last_names"] = list(pool.get("last_names", []))
+        self.seen = {
+            gender: set(zip(pool["first_names"], pool["last_names"]))
+            for gender, pool in self.data.items()
+        }
+        self.unsaved = 0
+
+    def count(self, gender):
+        return len(self.data[gender]["first_names"])
+
+    def add(self, gender, first, last):
+        if (first, last) in self.seen[gender]:
+            return False
+        self.seen[gender].add((first, last))
+        self.data[gender]["first_names"].append(first)
+        self.data[gender]["last_names"].append(last)
+        self.unsaved += 1
+        return True
+
+    # Written to a temporary file and renamed over names.json, so a crash
+    # mid-write leaves the previous checkpoint intact.
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.unsaved = 0
 
-            data[gender]["first_names"].append(contact["firstname"])
-            data[gender]["last_names"].append(contact["lastname"])
-            print(f"  Fetched {len(data[gender]['first_names'])}/{COUNT}")
 
-            time.sleep(0.2)  # avoid rate limit
-        except Exception as e:
-            print(f"Error: {e}")
+async def fetch_contact(client, bucket, url, gender):
+    params = {"gender": gender, "localization": "ne_NP", "token": MMO_API_TOKEN}
+    response = await send_with_retry(lambda: client.get(url, params=params), url, RETRIES, bucket.acquire)
+    return response.json()
+
+
+async def harvest_gender(client, bucket, store, url, gender, count, concurrency, checkpoint_every):
+    budget = count * MAX_REQUESTS_PER_NAME
+    requests = duplicates = 0
+
+    async def worker():
+        nonlocal requests, duplicates
+        while store.count(gender) < count and requests < budget:
+            requests += 1
+            contact = await fetch_contact(client, bucket, url, GENDERS[gender])
+            if store.count(gender) >= count:
+                return
+            if not store.add(gender, contact["firstname"], contact["lastname"]):
+                duplicates += 1
+            elif store.unsaved >= checkpoint_every:
+                store.save()
+                print(f"  {gender}: {store.count(gender)}/{count}")
+
+    tasks = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    if store.count(gender) < count:
+        print(f"  {gender}: stopped at {store.count(gender)}/{count} after {requests} requests, the source is repeating itself")
+    print(f"  {gender}: {store.count(gender)} names, {duplicates} duplicates skipped")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Harvest names from the MMO contact API into names.json")
+    parser.add_argument("--url", default=MMO_API_URL, help="contact API endpoint (MMO_API_URL)")
+    parser.add_argument("--count", type=int, default=COUNT, help="unique names wanted per gender")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="requests in flight")
+    parser.add_argument("--rate", type=float, default=RATE, help="requests per second")
+    parser.add_argument("--burst", type=int, default=1, help="requests allowed at once after an idle spell")
+    parser.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_EVERY, help="save after this many new names")
+    args = parser.parse_args()
+
+    if not args.url:
+        raise ValueError("Missing MMO_API_URL in .env (or pass --url)")
+
+    store = NameStore(args.output)
+    bucket = TokenBucket(args.rate, args.burst)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(timeout=httpx.Timeout(10.0), limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        try:
+            for gender in GENDERS:
+                print(f"Fetching {args.count} {gender.lower()} names ({store.count(gender)} already saved)...")
+                await harvest_gender(client, bucket, store, args.url, gender, args.count, args.concurrency, args.checkpoint_every)
+        finally:
+            store.save()
+
+    total = sum(store.count(gender) for gender in GENDERS)
+    print(f"Saved {total} names to {args.output} in {time.perf_counter() - started:.1f}s")
 
-with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-    json.dump(data, f, indent=2, ensure_ascii=False)
 
-print(f"Saved {COUNT * 2} names to {OUTPUT_FILE}")
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+import asyncio
+import random
+import httpx
+
+# HTTP plumbing shared by the scripts that talk to Supabase (pull.py,
+# seed_supabase.py, load_generator.py) and to the MMO API (fetch_names.py).
+
+RETRIES = 5
+
+
+# An async client for Supabase's PostgREST API (or postgrest_stub.py) at
+# url. headers are added to the key headers every request carries.
+def make_client(url, key, max_connections, timeout, headers=None):
+    return httpx.AsyncClient(
+        base_url=f"{url.rstrip('/')}/rest/v1",
+        headers={"apikey": key, "Authorization": f"Bearer {key}", **(headers or {})},
+        limits=httpx.Limits(max_connections=max_connections),
+        timeout=httpx.Timeout(timeout),
+    )
+
+
+# Sends a request, retrying 429s, server errors and dropped connections with
+# jittered exponential backoff that honours Retry-After. send() makes one
+# attempt and returns its response; before_attempt, if given, is awaited
+# first each time (e.g. to take a rate-limit token). Other error statuses
+# raise at once.
+async def send_with_retry(send, label, retries=RETRIES, before_attempt=None):
+    for attempt in range(retries):
+        if before_attempt:
+            await before_attempt()
+        delay = 0.5 * 2 ** attempt
+        try:
+            response = await send()
+            if response.status_code < 500 and response.status_code != 429:
+                response.raise_for_status()
+                return response
+            error = httpx.HTTPStatusError(
+                f"{response.status_code} from {label}: {response.text[:200]}",
+                request=response.request, response=response
+            )
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.replace(".", "", 1).isdigit():
+                delay = max(delay, float(retry_after))
+        except httpx.TransportError as e:
+            error = e
+        if attempt + 1 < retries:
+            await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+    raise error
@@ -0,0 +1,90 @@
+MASK64 = (1 << 64) - 1
+ROUNDS = 6
+
+
+def _mix(value, key):
+    # splitmix64 finalizer; cheap and well spread enough for a round function.
+    value = ((value ^ key) * 0x9E3779B97F4A7C15) & MASK64
+    value ^= value >> 31
+    value = (value * 0xBF58476D1CE4E5B9) & MASK64
+    value ^= value >> 29
+    return value
+
+
+def _compile(pattern):
+    # "###-###-#" -> [("", 3), ("-", 3), ("-", 1)]: literal prefix + digit run
+    parts = []
+    literal = ""
+    run = 0
+    for c in pattern:
+        if c == "#":
+            run += 1
+        else:
+            if run:
+                parts.append((literal, run))
+                literal, run = "", 0
+            literal += c
+    parts.append((literal, run))
+    return parts
+
+
+# Maps a counter onto a formatted identifier space such as "###-###-###-#" or
+# ["LIC-########", "HLT-########"] through a keyed Feistel permutation. The
+# counter alone decides the id, so ids are unique without keeping a set of
+# the ones already handed out, and shards or later runs can allocate from
+# disjoint counter ranges. Every pattern must have the same number of digits.
+class IdSpace:
+    def __init__(self, patterns, key, next_counter=0):
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        digits = {p.count("#") for p in patterns}
+        if len(digits) != 1:
+            raise ValueError(f"Patterns must have the same number of digits: {patterns}")
+        digits = digits.pop()
+
+        self.patterns = [_compile(p) for p in patterns]
+        self.digits = digits
+        self.block = 10 ** digits
+        self.capacity = len(patterns) * self.block
+        self.key = key & MASK64
+        self.next_counter = next_counter
+
+        # Split the space into Z_left x Z_right with both sides as close as
+        # possible, so the permutation is a bijection on exactly capacity ids.
+        half = digits // 2
+        self.left = len(patterns) * 10 ** half
+        self.right = 10 ** (digits - half)
+
+    def _permute(self, value):
+        a, b = divmod(value, self.right)
+        a_size, b_size = self.left, self.right
+        for r in range(ROUNDS):
+            a, b = b, (a + _mix(b, self.key + r)) % a_size
+            a_size, b_size = b_size, a_size
+        return a * b_size + b
+
+    def format(self, counter):
+        if not 0 <= counter < self.capacity:
+            raise OverflowError(
+                f"Id space {self.describe()} holds {self.capacity} ids; counter {counter} is out of range"
+            )
+        pattern_index, number = divmod(self._permute(counter), self.block)
+        digits = str(number).zfill(self.digits)
+        out = []
+        pos = 0
+        for literal, run in self.patterns[pattern_index]:
+            out.append(literal)
+            out.append(digits[pos:pos + run])
+            pos += run
+        return "".join(out)
+
+    def allocate(self):
+        value = self.format(self.next_counter)
+        self.next_counter += 1
+        return value
+
+    def remaining(self):
+        return self.capacity - self.next_counter
+
+    def describe(self):
+        return "|".join("".join(literal + "#" * run for literal, run in p) for p in self.patterns)
@@ -0,0 +1,25 @@
+import hashlib
+import os
+import pickle
+
+
+# Parsed input files, pickled to .cache/<name>-<sha256>.pkl next to the
+# source. parse(path) only runs the first time a given version of the file
+# is read; after that the pickle is loaded instead. Writes go through a
+# per-process temporary file, so pool workers can race to fill the cache.
+def cached_parse(path, name, parse):
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    cache_path = os.path.join(os.path.dirname(path), ".cache", f"{name}-{digest[:16]}.pkl")
+
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+
+    parsed = parse(path)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(parsed, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return parsed
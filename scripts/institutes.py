@@ -0,0 +1,52 @@
+import csv
+import json
+import sys
+from input_cache import cached_parse
+
+FIELDS = ["name", "location", "province", "description"]
+CSV_COLUMNS = {"name": "Hospital", "location": "City", "province": "Province", "description": "Description"}
+
+
+# The institute registry as parallel columns (name, location, province,
+# description), read from either institute.csv or the institute.json that
+# create_institue_data.py writes from it. Both are parsed in one pass with
+# the csv/json modules and cached like the gazetteer, so the generator
+# never imports pandas and looking up institute i is a list index.
+class InstituteTable:
+    def __init__(self, path="data/institute.json"):
+        parse = self._parse_csv if path.endswith(".csv") else self._parse_json
+        self.columns = cached_parse(path, "institutes", parse)
+        for field in FIELDS:
+            setattr(self, f"{field}s", self.columns[field])
+
+    def __len__(self):
+        return len(self.columns["name"])
+
+    @staticmethod
+    def _parse_csv(path):
+        columns = {field: [] for field in FIELDS}
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = [h.strip() for h in next(reader)]
+            positions = [(columns[field], header.index(column)) for field, column in CSV_COLUMNS.items()]
+            for row in reader:
+                for column, i in positions:
+                    column.append(row[i] if i < len(row) else "")
+        columns["province"] = [sys.intern(p) for p in columns["province"]]
+        return columns
+
+    @staticmethod
+    def _parse_json(path):
+        with open(path, encoding="utf-8") as f:
+            institutes = json.load(f)
+        columns = {field: [institute.get(field, "") for institute in institutes] for field in FIELDS}
+        columns["province"] = [sys.intern(p) for p in columns["province"]]
+        return columns
+
+    def rows(self):
+        for values in zip(*(self.columns[field] for field in FIELDS)):
+            yield dict(zip(FIELDS, values))
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(list(self.rows()), f, ensure_ascii=False, indent=4)
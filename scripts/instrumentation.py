@@ -0,0 +1,184 @@
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Opt-in stage measurements for data_generator runs. Disabled instruments
+# cost nothing beyond a context manager per stage.
+#
+# Stages run wherever the work happens, including pool workers. Each one
+# records wall and CPU time, rows and rows/sec, and the time spent handing
+# rows to the JSON writers. It also records the tracemalloc allocation peak
+# and, with a profile directory, dumps a cProfile file per stage. Workers
+# send their stage records back with their results, and the parent's
+# RunReport prints progress as shards finish and writes everything to one
+# JSON report.
+
+
+class Stage:
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.rows = 0
+        self.write_seconds = 0.0
+
+    # writer.write_rows(rows), also timing the writer when enabled. The
+    # rest of the stage's time is spent producing rows.
+    def write_rows(self, writer, rows):
+        if not self.enabled:
+            writer.write_rows(rows)
+        else:
+            clock = time.perf_counter
+            write = writer.write
+            spent = 0.0
+            for row in rows:
+                started = clock()
+                write(row)
+                spent += clock() - started
+            self.write_seconds += spent
+        self.rows += writer.rows
+        return writer
+
+
+class Instruments:
+    def __init__(self, enabled=False, profile_dir=None, tag=""):
+        self.enabled = enabled or profile_dir is not None
+        self.profile_dir = profile_dir
+        self.tag = tag
+        self.stages = []
+
+    @classmethod
+    def from_options(cls, options, tag=""):
+        return cls(options.get("enabled", False), options.get("profile_dir"), tag)
+
+    @contextmanager
+    def stage(self, name):
+        stage = Stage(self.enabled)
+        if not self.enabled:
+            yield stage
+            return
+
+        # Tracing slows every allocation down, so a stage that turns it on
+        # turns it off again when it ends.
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+        profiler = cProfile.Profile() if self.profile_dir else None
+        started, cpu_started = time.perf_counter(), time.process_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield stage
+        finally:
+            if profiler:
+                profiler.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(self.profile_dir, f"{name}{self.tag}.prof"))
+            seconds = time.perf_counter() - started
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+            self.stages.append({
+                "stage": name,
+                "tag": self.tag,
+                "seconds": round(seconds, 4),
+                "cpu_seconds": round(time.process_time() - cpu_started, 4),
+                "rows": stage.rows,
+                "rows_per_sec": round(stage.rows / seconds, 1) if seconds else None,
+                "write_seconds": round(stage.write_seconds, 4),
+                "tracemalloc_peak_mb": round(traced_peak / 2 ** 20, 2),
+            })
+
+
+def peak_rss_mb():
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return round(peak * scale / 2 ** 20, 1)
+
+
+# Collects the parent's stages and the workers' stage records, prints
+# progress to stderr and writes the run report.
+class RunReport:
+    def __init__(self, options, settings):
+        self.instruments = Instruments.from_options(options)
+        self.enabled = self.instruments.enabled
+        self.settings = settings
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.worker_stages = []
+        self.phase_started = {}
+
+    def stage(self, name):
+        return self.instruments.stage(name)
+
+    def phase(self, name, total):
+        self.phase_started[name] = (time.perf_counter(), 0)
+        if self.enabled:
+            print(f"[{name}] 0/{total} shards", file=sys.stderr, flush=True)
+
+    # Called as each shard of a phase comes back.
+    def shard_done(self, name, done, total, stages):
+        self.worker_stages.extend(stages)
+        if not self.enabled:
+            return
+        started, rows = self.phase_started[name]
+        rows += sum(s["rows"] for s in stages)
+        self.phase_started[name] = (started, rows)
+        elapsed = time.perf_counter() - started
+        print(
+            f"[{name}] {done}/{total} shards, {rows:,} rows, "
+            f"{rows / elapsed if elapsed else 0:,.0f} rows/s, {elapsed:.1f}s",
+            file=sys.stderr, flush=True,
+        )
+
+    def summary(self):
+        by_stage = {}
+        for record in self.worker_stages:
+            total = by_stage.setdefault(record["stage"], {
+                "stage": record["stage"], "shards": 0, "rows": 0, "seconds": 0.0,
+                "cpu_seconds": 0.0, "write_seconds": 0.0, "tracemalloc_peak_mb": 0.0,
+            })
+            total["shards"] += 1
+            total["rows"] += record["rows"]
+            for key in ("seconds", "cpu_seconds", "write_seconds"):
+                total[key] = round(total[key] + record[key], 4)
+            total["tracemalloc_peak_mb"] = max(total["tracemalloc_peak_mb"], record["tracemalloc_peak_mb"])
+        for total in by_stage.values():
+            total["rows_per_sec"] = round(total["rows"] / total["seconds"], 1) if total["seconds"] else None
+        return list(by_stage.values())
+
+    def write(self, path):
+        if not self.enabled:
+            return
+        seconds = time.perf_counter() - self.started
+        report = {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "seconds": round(seconds, 3),
+            "peak_rss_mb": peak_rss_mb(),
+            "settings": self.settings,
+            # Stages run in the parent, timed end to end.
+            "parent_stages": self.instruments.stages,
+            # Worker stages summed over shards: seconds is busy time, which
+            # exceeds wall time when shards run in parallel.
+            "shard_stages": self.summary(),
+            "shards": self.worker_stages,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        for stage in self.instruments.stages + report["shard_stages"]:
+            print(
+                f"  {stage['stage']:>20}: {stage['seconds']:>9.2f}s {stage['rows']:>11,} rows "
+                f"{stage['rows_per_sec'] or 0:>12,.0f} rows/s  write {stage['write_seconds']:.2f}s  "
+                f"peak {stage['tracemalloc_peak_mb']:.1f} MB",
+                file=sys.stderr,
+            )
+        print(f"Run report written to {path} ({seconds:.1f}s, peak RSS {report['peak_rss_mb']} MB)", file=sys.stderr)
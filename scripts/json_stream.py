@@ -0,0 +1,160 @@
+import json
+import os
+
+BUFFER_ROWS = 10_000
+
+
+# Writes one compact JSON object per line. Rows are serialized as they come
+# in and flushed every buffer_rows, so memory stays bounded however many rows
+# are written. With append=True rows are added after an existing file's rows.
+class NDJSONWriter:
+    extension = ".ndjson"
+
+    def __init__(self, path, buffer_rows=BUFFER_ROWS, append=False):
+        self.path = path
+        self.buffer_rows = buffer_rows
+        self.rows = 0
+        self._buffer = []
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def _encode(self, row):
+        return json.dumps(row, separators=(",", ":"))
+
+    def write(self, row):
+        self.write_raw(self._encode(row))
+
+    # Appends a row that is already serialized, e.g. a line copied from
+    # another NDJSON file.
+    def write_raw(self, line):
+        self._buffer.append(line)
+        self.rows += 1
+        if len(self._buffer) >= self.buffer_rows:
+            self.flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write(row)
+        return self
+
+    def flush(self):
+        if self._buffer:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._buffer.clear()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Same streaming behaviour, but the output is a single compact JSON array
+# (one row per line) for consumers that expect a plain .json file.
+class JSONArrayWriter(NDJSONWriter):
+    extension = ".json"
+
+    def __init__(self, path, buffer_rows=BUFFER_ROWS, append=False):
+        if append and os.path.exists(path):
+            has_rows = _open_array_for_append(path)
+            super().__init__(path, buffer_rows, append=True)
+            self._flushed = int(has_rows)
+        else:
+            super().__init__(path, buffer_rows)
+            self._flushed = 0
+            self._file.write("[")
+
+    def flush(self):
+        if self._buffer:
+            separator = ",\n" if self._flushed else "\n"
+            self._file.write(separator + ",\n".join(self._buffer))
+            self._flushed += len(self._buffer)
+            self._buffer.clear()
+
+    def close(self):
+        self.flush()
+        self._file.write("\n]\n" if self._flushed else "]\n")
+        self._file.close()
+
+
+# Cuts an existing JSON array file just before its closing bracket so more
+# rows can be appended without reading the rows already in it. Returns whether
+# the array already had rows.
+def _open_array_for_append(path, tail_size=1 << 16):
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        offset = max(0, size - tail_size)
+        f.seek(offset)
+        tail = f.read().rstrip()
+    if not tail.endswith(b"]"):
+        raise ValueError(f"{path} is not a complete JSON array")
+    os.truncate(path, offset + len(tail) - 1)
+    return not tail[:-1].rstrip().endswith(b"[")
+
+
+WRITERS = {
+    "json": JSONArrayWriter,
+    "ndjson": NDJSONWriter,
+}
+
+
+def open_writer(path_stem, fmt="json", buffer_rows=BUFFER_ROWS, append=False):
+    writer_class = WRITERS[fmt]
+    return writer_class(path_stem + writer_class.extension, buffer_rows, append=append)
+
+
+# The file of a table in data_dir: <table>.json or <table>.ndjson for fmt,
+# or without fmt whichever of the two exists.
+def table_file(data_dir, table, fmt=None):
+    if fmt is not None:
+        return os.path.join(data_dir, table + WRITERS[fmt].extension)
+    for extension in (".json", ".ndjson"):
+        path = os.path.join(data_dir, table + extension)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No {table}.json or {table}.ndjson in {data_dir}/")
+
+
+# Reads rows back from either format without loading the whole file. JSON
+# arrays are decoded element by element from a sliding buffer, so this also
+# works on pretty-printed exports.
+def iter_rows(path, chunk_size=1 << 20):
+    if path.endswith(".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} is not a JSON array")
+        pos = 1
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                if pos >= len(buffer):
+                    raise ValueError("buffer exhausted")
+                row, end = decoder.raw_decode(buffer, pos)
+                if end == len(buffer) and not eof:
+                    raise ValueError("row may continue past the buffer")
+            except ValueError:
+                if eof:
+                    raise ValueError(f"{path} ends in the middle of a row")
+                more = f.read(chunk_size)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+            yield row
+            pos = end
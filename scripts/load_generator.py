@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from datetime import date, datetime, timedelta
+import httpx
+import numpy as np
+from dotenv import load_dotenv
+from http_client import make_client
+from build_cubes import address_parts
+from data_generator import RECORD_TYPE_SAMPLER, STATE_FILE
+from diagnosis_generator import DIAGNOSES, generate_diagnosis, month_multiplier
+from prescription_generator import generate_prescription, generate_description
+
+# Load-tests the hospital insert path: a stream of new health records, each
+# inserted and then re-read the way HospitalDashboard.jsx does it
+# (insert(...).select(), then the patient's records newest first):
+#
+#   python3 scripts/load_generator.py --rate 20 --duration 60
+#   python3 scripts/load_generator.py --url http://localhost:54321 --rate 50 --duration 30
+#   python3 scripts/load_generator.py --dry-run --events 100 > events.ndjson
+#
+# Arrivals are open-loop: each event is sent at its scheduled time whether
+# or not earlier requests have come back, so a slow server shows up as
+# latency instead of quietly lowering the offered load. Gaps between events
+# are exponential (a Poisson process) at --rate per second, scaled by the
+# season of the simulated visit date. Patients and institutes are read from
+# the endpoint first, and diagnoses come from generate_diagnosis for the
+# patient's age and sex, the institute's province and the visit month, with
+# the year trends counted from --start-year (by default the first year of
+# the data data_generator.py produced). Record types follow the generator's
+# mix.
+#
+# Works against scripts/postgrest_stub.py (run it with --data data, or with
+# --table health_records if the records table isn't there).
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("VITE_SUPABASE_PUBLISHABLE_DEFAULT_KEY")
+
+PAGE_SIZE = 1000
+PERCENTILES = [50, 90, 95, 99]
+
+
+# Relative visit volume per month: the diagnosis mix's base rates with the
+# month multipliers applied, normalised to average 1 over the year, so
+# winter respiratory and monsoon gastro/fever peaks raise traffic as well
+# as shifting the diagnoses.
+def seasonal_factors():
+    volume = np.array([
+        sum(p * month_multiplier(diagnosis, month) for diagnosis, p in DIAGNOSES.items())
+        for month in range(1, 13)
+    ])
+    return volume / volume.mean()
+
+
+SEASONAL_FACTORS = seasonal_factors()
+
+
+# The start_year data_generator.py recorded for the dataset in data/, if any.
+def generated_start_year():
+    if not os.path.exists(STATE_FILE):
+        return None
+    with open(STATE_FILE, encoding="utf-8") as f:
+        return json.load(f).get("start_year")
+
+
+#-------------- Fixtures ------------
+async def fetch_all(client, table, key, limit):
+    rows = []
+    while len(rows) < limit:
+        params = {"select": "*", "order": f"{key}.asc", "limit": str(min(PAGE_SIZE, limit - len(rows)))}
+        if rows:
+            params[key] = f"gt.{rows[-1][key]}"
+        response = await client.get(f"/{table}", params=params)
+        response.raise_for_status()
+        page = response.json()
+        rows.extend(page)
+        if not page:
+            break
+    return rows
+
+
+async def load_fixtures(client, patients):
+    citizens = await fetch_all(client, "citizens", "nid_number", patients)
+    institutes = await fetch_all(client, "health_institutes", "institute_id", 100_000)
+    if not citizens or not institutes:
+        raise ValueError("The endpoint has no citizens or health_institutes to generate records for")
+    return (
+        [(c["nid_number"], date.fromisoformat(c["date_of_birth"]), c["sex"]) for c in citizens],
+        [(i["institute_id"], address_parts(i["address"])[1]) for i in institutes],
+    )
+
+
+#-------------- Event stream ------------
+# (offset in seconds, record) pairs. The simulated clock starts at `start`
+# and runs `speedup` times faster than real time, so a long run at a high
+# speedup sweeps through the seasons. Arrivals are a Poisson process whose
+# rate follows SEASONAL_FACTORS, drawn by thinning a process at the peak
+# rate.
+def events(citizens, institutes, rate, start, speedup, start_year, rng):
+    peak = rate * SEASONAL_FACTORS.max()
+    offset = 0.0
+    while True:
+        offset += rng.expovariate(peak)
+        visit_date = (start + timedelta(seconds=offset * speedup)).date()
+        if rng.random() * SEASONAL_FACTORS.max() > SEASONAL_FACTORS[visit_date.month - 1]:
+            continue
+        nid, dob, sex = rng.choice(citizens)
+        institute_id, province = rng.choice(institutes)
+        age = visit_date.year - dob.year - ((visit_date.month, visit_date.day) < (dob.month, dob.day))
+        diagnosis = generate_diagnosis(age, sex, visit_date, province, start_year)
+        yield offset, {
+            "nid_number": nid,
+            "institute_id": institute_id,
+            "record_type": RECORD_TYPE_SAMPLER.draw(rng),
+            "title": diagnosis + " Report",
+            "description": generate_description(diagnosis, rng),
+            "diagnosis": diagnosis,
+            "prescription": generate_prescription(diagnosis, rng),
+            "issued_date": visit_date.isoformat(),
+        }
+
+
+#-------------- Load ------------
+class Stats:
+    def __init__(self):
+        self.latencies = {"insert": [], "reread": [], "total": []}
+        self.errors = {}
+        self.sent = 0
+        self.skipped = 0
+
+    def error(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def summary(self, elapsed):
+        operations = {}
+        for name, values in self.latencies.items():
+            values = np.array(values) * 1000
+            operations[name] = {
+                "count": len(values),
+                **({f"p{p}_ms": round(float(np.percentile(values, p)), 2) for p in PERCENTILES} if len(values) else {}),
+                "max_ms": round(float(values.max()), 2) if len(values) else None,
+            }
+        return {
+            "seconds": round(elapsed, 2),
+            "sent": self.sent,
+            "completed": len(self.latencies["total"]),
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "offered_per_sec": round(self.sent / elapsed, 2) if elapsed else None,
+            "completed_per_sec": round(len(self.latencies["total"]) / elapsed, 2) if elapsed else None,
+            "operations": operations,
+        }
+
+
+async def insert_and_reread(client, record, stats):
+    started = time.perf_counter()
+    try:
+        response = await client.post("/health_records", content=json.dumps(record))
+        inserted = time.perf_counter()
+        if response.status_code >= 300:
+            stats.error(f"insert {response.status_code}")
+            return
+        response = await client.get("/health_records", params={
+            "select": "*", "nid_number": f"eq.{record['nid_number']}", "order": "issued_date.desc",
+        })
+        finished = time.perf_counter()
+        if response.status_code >= 300:
+            stats.error(f"reread {response.status_code}")
+            return
+    except httpx.TransportError as e:
+        stats.error(type(e).__name__)
+        return
+    stats.latencies["insert"].append(inserted - started)
+    stats.latencies["reread"].append(finished - inserted)
+    stats.latencies["total"].append(finished - started)
+
+
+# Sends every event at its scheduled offset. Requests beyond --max-in-flight
+# are counted as skipped rather than queued, which would turn the test back
+# into a closed loop.
+async def run_load(client, stream, duration, max_events, max_in_flight, stats):
+    pending = set()
+    started = time.perf_counter()
+    for offset, record in stream:
+        if offset > duration or stats.sent + stats.skipped >= max_events:
+            break
+        delay = started + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(pending) >= max_in_flight:
+            stats.skipped += 1
+            continue
+        stats.sent += 1
+        task = asyncio.create_task(insert_and_reread(client, record, stats))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.wait(pending)
+    return time.perf_counter() - started
+
+
+def print_summary(summary):
+    print(
+        f"Sent {summary['sent']} records in {summary['seconds']}s "
+        f"({summary['offered_per_sec']}/s offered, {summary['completed_per_sec']}/s completed, "
+        f"{summary['skipped']} skipped, {sum(summary['errors'].values())} errors)",
+        file=sys.stderr,
+    )
+    for kind, count in summary["errors"].items():
+        print(f"  error {kind}: {count}", file=sys.stderr)
+    for name, op in summary["operations"].items():
+        if op["count"]:
+            percentiles = "  ".join(f"p{p} {op[f'p{p}_ms']:.1f}ms" for p in PERCENTILES)
+            print(f"  {name:>7}: {percentiles}  max {op['max_ms']:.1f}ms", file=sys.stderr)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test of the health record insert path")
+    parser.add_argument("--url", default=SUPABASE_URL, help="Supabase or PostgREST stub URL (VITE_SUPABASE_URL)")
+    parser.add_argument("--rate", type=float, default=10.0, help="mean new records per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--events", type=int, default=sys.maxsize, help="stop after this many events")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="skip events beyond this many open requests")
+    parser.add_argument("--patients", type=int, default=10_000, help="citizens to draw patients from")
+    parser.add_argument("--start-date", type=date.fromisoformat, default=date.today(), help="simulated date of the first event")
+    parser.add_argument("--start-year", type=int, default=generated_start_year() or 2010,
+                        help="year the diagnosis trends count from (default: the generated data's first year, else 2010)")
+    parser.add_argument("--speedup", type=float, default=1.0,
+                        help="simulated seconds per real second, e.g. 86400 for a day per second")
+    parser.add_argument("--seed", type=int, help="seed for a repeatable event stream")
+    parser.add_argument("--dry-run", action="store_true", help="print the events as NDJSON instead of sending them")
+    parser.add_argument("--output", help="also write the summary as JSON here")
+    args = parser.parse_args()
+
+    if not args.url:
+        raise ValueError("Missing VITE_SUPABASE_URL in .env (or pass --url)")
+
+    rng = random.Random(args.seed)
+    random.seed(args.seed)  # generate_diagnosis draws from the random module
+    # The stub accepts any key.
+    key = SUPABASE_KEY or "local"
+    async with make_client(args.url, key, args.max_in_flight, 30.0, {
+        "Content-Type": "application/json",
+        "Prefer": "return=representation",
+    }) as client:
+        citizens, institutes = await load_fixtures(client, args.patients)
+        start = datetime.combine(args.start_date, datetime.min.time())
+        stream = events(citizens, institutes, args.rate, start, args.speedup, args.start_year, rng)
+
+        if args.dry_run:
+            for _, (offset, record) in zip(range(min(args.events, 1_000_000)), stream):
+                if offset > args.duration:
+                    break
+                print(json.dumps({"offset": round(offset, 4), **record}))
+            return
+
+        print(f"Offering {args.rate}/s for {args.duration}s to {args.url} "
+              f"({len(citizens)} patients, {len(institutes)} institutes)", file=sys.stderr)
+        stats = Stats()
+        elapsed = await run_load(client, stream, args.duration, args.events, args.max_in_flight, stats)
+
+    summary = stats.summary(elapsed)
+    print_summary(summary)
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
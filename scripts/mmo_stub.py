@@ -0,0 +1,88 @@
+import argparse
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from stub_http import JSONRequestHandler
+
+# A local stand-in for the MMO contact API that fetch_names.py harvests:
+#
+#   python3 scripts/mmo_stub.py --port 8765 --rate 20 --error-rate 0.1
+#   python3 scripts/fetch_names.py --url http://localhost:8765/ --count 50
+#
+# GET /?gender=male|female returns one random {"firstname", "lastname"}
+# drawn from small pools, so duplicates show up quickly. Requests over
+# --rate per second get a 429 with Retry-After, and --error-rate of the rest
+# fail with a 503.
+
+FIRST_NAMES = {
+    "male": ["Aarav", "Bikash", "Dipesh", "Hari", "Kiran", "Manish", "Nabin", "Prakash", "Rajesh", "Suman"],
+    "female": ["Anita", "Bina", "Gita", "Kabita", "Laxmi", "Manisha", "Puja", "Rita", "Sabina", "Sita"],
+}
+LAST_NAMES = ["Adhikari", "Bhattarai", "Gurung", "Karki", "Magar", "Poudel", "Rai", "Shrestha", "Tamang", "Thapa"]
+
+
+class MMOHandler(JSONRequestHandler):
+    server_version = "mmo-stub"
+
+    # Requests started in the last second, for the --rate limit.
+    def over_rate(self):
+        if not self.server.rate:
+            return False
+        with self.server.lock:
+            now = time.monotonic()
+            recent = [t for t in self.server.recent if now - t < 1.0]
+            limited = len(recent) >= self.server.rate
+            if not limited:
+                recent.append(now)
+            self.server.recent = recent
+            return limited
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.over_rate():
+            self.server.limited += 1
+            self.send_json(429, {"error": "rate limited"}, {"Retry-After": "1"})
+            return
+        if random.random() < self.server.error_rate:
+            self.send_json(503, {"error": "try again"})
+            return
+        gender = parse_qs(urlsplit(self.path).query).get("gender", ["male"])[0]
+        if gender not in FIRST_NAMES:
+            self.send_json(400, {"error": f"unknown gender {gender}"})
+            return
+        self.send_json(200, {
+            "firstname": random.choice(FIRST_NAMES[gender]),
+            "lastname": random.choice(LAST_NAMES),
+            "gender": gender,
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake MMO contact API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rate", type=float, default=0, help="requests per second before answering 429 (0: no limit)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), MMOHandler)
+    server.rate = args.rate
+    server.error_rate = args.error_rate
+    server.verbose = args.verbose
+    server.lock = threading.Lock()
+    server.recent = []
+    server.requests = server.limited = 0
+    print(f"Serving on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"{server.requests} requests, {server.limited} rate limited")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,53 @@ import json
 import random
 
 
+class NameSampler:
+    # Loads the name pools once and keeps them in memory. Anyone who isn't
+    # "Male" draws from the female pool, same as generate_name always did.
+    def __init__(self, path="data/names.json", rng=random):
+        with open(path, "r", encoding="utf-8") as f:
+            names_data = json.load(f)
+        self.pools = {
+            gender: (names_data[gender]["first_names"], names_data[gender]["last_names"])
+            for gender in ["Male", "Female"]
+        }
+        self.rng = rng
+
+    def _pool(self, gender):
+        return self.pools["Male" if gender == "Male" else "Female"]
+
+    def _draw(self, gender, k):
+        first_names, last_names = self._pool(gender)
+        firsts = self.rng.choices(first_names, k=k)
+        lasts = self.rng.choices(last_names, k=k)
+        return [f"{first} {last}" for first, last in zip(firsts, lasts)]
+
+    def sample(self, genders, k=1):
+        # A single gender returns k names; a sequence of genders returns one
+        # name per entry, in order, drawing each gender's names in one batch.
+        if isinstance(genders, str):
+            return self._draw(genders, k)
+
+        positions = {"Male": [], "Female": []}
+        for i, gender in enumerate(genders):
+            positions["Male" if gender == "Male" else "Female"].append(i)
+
+        names = [None] * len(genders)
+        for gender, idx in positions.items():
+            for i, name in zip(idx, self._draw(gender, len(idx))):
+                names[i] = name
+        return names
+
+
+_default_sampler = None
+
+
+def get_sampler():
+    global _default_sampler
+    if _default_sampler is None:
+        _default_sampler = NameSampler()
+    return _default_sampler
+
+
 def generate_name(gender):
-    with open("data/names.json", "r", encoding="utf-8") as f:
-        names_data = json.load(f)
-    if gender == "Male":
-        first_name = random.choice(names_data["Male"]["first_names"])
-        last_name = random.choice(names_data["Male"]["last_names"])
-    else:
-        first_name = random.choice(names_data["Female"]["first_names"])
-        last_name = random.choice(names_data["Female"]["last_names"])
-    return f"{first_name} {last_name}"
+    return get_sampler().sample(gender)[0]
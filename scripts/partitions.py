@@ -0,0 +1,125 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from build_cubes import address_parts
+from json_stream import JSONArrayWriter, iter_rows
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Splits health_records.json into one file per year and province, so a
+# dashboard showing one province and one year downloads only that slice:
+#
+#   partitions/manifest.json
+#   partitions/health_records/<year>/<province>.<hash>.json.gz
+#   partitions/health_records/<year>/<province>.<hash>.json.br   (with brotli)
+#
+# The hash in each file name is taken from the partition's content, so a
+# file never changes once written and can be cached forever. The manifest
+# is the only file clients have to revalidate. A record's province is the
+# province of the institute it was issued at.
+#
+# Nothing in the dashboard reads the partitions yet; it only loads
+# data/cubes/. The client that does should also add a Netlify header rule
+# serving /data/partitions/health_records/* with
+# "Cache-Control: public, max-age=31536000, immutable".
+#
+# pull.py runs this with --partitioned; it can also be run on its own:
+#   python3 scripts/partitions.py --data data
+
+HASH_LENGTH = 16
+
+# Partitions are filled side by side, so each writer only buffers a few rows.
+PARTITION_BUFFER_ROWS = 500
+
+
+def compress(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    encodings = {"gzip": (".gz", gzip.compress(data, compresslevel=9, mtime=0))}
+    if brotli is not None:
+        encodings["br"] = (".br", brotli.compress(data, quality=11))
+
+    files = {}
+    for encoding, (suffix, payload) in encodings.items():
+        with open(path + suffix, "wb") as f:
+            f.write(payload)
+        files[encoding] = {"path": suffix, "bytes": len(payload)}
+    return hashlib.sha256(data).hexdigest(), len(data), files
+
+
+def write_partitions(data_dir, out_dir=None):
+    out_dir = out_dir or os.path.join(data_dir, "partitions")
+    tmp_dir = out_dir + ".part"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    institute_provinces = {
+        institute["institute_id"]: address_parts(institute["address"])[1] or "Unknown"
+        for institute in iter_rows(os.path.join(data_dir, "health_institutes.json"))
+    }
+
+    writers = {}
+    try:
+        for record in iter_rows(os.path.join(data_dir, "health_records.json")):
+            key = (int(record["issued_date"][:4]), institute_provinces.get(record["institute_id"], "Unknown"))
+            writer = writers.get(key)
+            if writer is None:
+                directory = os.path.join(tmp_dir, "health_records", str(key[0]))
+                os.makedirs(directory, exist_ok=True)
+                writer = writers[key] = JSONArrayWriter(
+                    os.path.join(directory, f"{key[1]}.json"), PARTITION_BUFFER_ROWS
+                )
+            writer.write(record)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    partitions = []
+    for (year, province), writer in sorted(writers.items()):
+        sha256, size, files = compress(writer.path)
+        os.remove(writer.path)
+        name = f"health_records/{year}/{province}.{sha256[:HASH_LENGTH]}.json"
+        for file in files.values():
+            os.replace(writer.path + file["path"], os.path.join(tmp_dir, name + file["path"]))
+            file["path"] = name + file["path"]
+        partitions.append({
+            "year": year,
+            "province": province,
+            "rows": writer.rows,
+            "sha256": sha256,
+            "bytes": size,
+            "files": files,
+        })
+
+    manifest = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "tables": {
+            "health_records": {
+                "partition_by": ["year", "province"],
+                "rows": sum(p["rows"] for p in partitions),
+                "partitions": partitions,
+            }
+        },
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    # Swap the whole layout in at once so the manifest never points at
+    # files from a different run.
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    print(f"Saved {len(partitions)} health_records partitions to {out_dir}/")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Partition health_records by year and province")
+    parser.add_argument("--data", default="data", help="directory holding the exported <table>.json files")
+    parser.add_argument("--out", default=None, help="output directory (default: <data>/partitions)")
+    args = parser.parse_args()
+    write_partitions(args.data, args.out)
@@ -0,0 +1,259 @@
+import argparse
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+from json_stream import iter_rows
+from stub_http import JSONRequestHandler
+
+# A small in-memory stand-in for the PostgREST API Supabase exposes under
+# /rest/v1, for exercising the scripts locally without a real project:
+#
+#   python3 scripts/postgrest_stub.py --data data --port 54321
+#   VITE_SUPABASE_URL=http://localhost:54321 VITE_SUPABASE_PUBLISHABLE_DEFAULT_KEY=local python3 scripts/pull.py
+#
+# It implements the subset of the query language the scripts use: select=*,
+# order=<column>.asc|desc, limit, offset and <column>=<op>.<value> filters
+# with eq, neq, gt, gte, lt and lte. Like Supabase it caps every response at
+# --max-rows rows.
+#
+# POST inserts a JSON object or array of objects. on_conflict=<column> makes
+# that column unique: with Prefer: resolution=merge-duplicates (or
+# ignore-duplicates) the request upserts, without it a duplicate fails the
+# whole request with 409. Prefer: return=representation echoes the rows.
+# Tables that start out empty can be declared with --table NAME.
+
+OPERATORS = {
+    "eq": lambda a, b: a == b,
+    "neq": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+}
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+class Table:
+    def __init__(self, rows):
+        self.rows = rows
+        self.lock = threading.Lock()
+        self._sorted = {}
+        self._indexes = {}
+
+    # Rows sorted by column, cached until the table changes, so keyset pages
+    # (order=col.asc&col=gt.X) are answered with a bisect instead of a scan.
+    def sorted_by(self, column):
+        if column not in self._sorted:
+            rows = sorted((r for r in self.rows if r.get(column) is not None), key=lambda r: r[column])
+            self._sorted[column] = ([r[column] for r in rows], rows)
+        return self._sorted[column]
+
+    def invalidate(self):
+        self._sorted.clear()
+        self._indexes.clear()
+
+    # column value -> row, for the on_conflict column of upserts.
+    def index_by(self, column):
+        if column not in self._indexes:
+            self._indexes[column] = {r[column]: r for r in self.rows if r.get(column) is not None}
+        return self._indexes[column]
+
+    # Applies the whole batch or nothing, like PostgREST's single statement.
+    def upsert(self, rows, column, resolution):
+        index = self.index_by(column) if column else {}
+        seen = set()
+        for row in rows:
+            key = row.get(column) if column else None
+            if key is not None and (key in index or key in seen) and resolution is None:
+                return None, key
+            seen.add(key)
+
+        written = []
+        for row in rows:
+            key = row.get(column) if column else None
+            existing = index.get(key) if key is not None else None
+            if existing is None:
+                self.rows.append(row)
+                if key is not None:
+                    index[key] = row
+                written.append(row)
+            elif resolution == "merge-duplicates":
+                existing.update(row)
+                written.append(existing)
+        self._sorted.clear()
+        self._indexes = {column: index} if column else {}
+        return written, None
+
+
+def coerce(value, sample):
+    if isinstance(sample, bool):
+        return value == "true"
+    if isinstance(sample, int):
+        return int(value)
+    if isinstance(sample, float):
+        return float(value)
+    return value
+
+
+def load_tables(data_dir):
+    tables = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, "*.json")) + glob.glob(os.path.join(data_dir, "*.ndjson"))):
+        name = os.path.basename(path).rsplit(".", 1)[0]
+        if name in tables:
+            continue
+        try:
+            tables[name] = Table(list(iter_rows(path)))
+        except ValueError:
+            continue  # not a table export
+    return tables
+
+
+class StubHandler(JSONRequestHandler):
+    server_version = "postgrest-stub"
+
+    def parse_request_path(self):
+        url = urlsplit(self.path)
+        prefix = "/rest/v1/"
+        if not url.path.startswith(prefix):
+            self.send_json(404, {"message": f"Unknown path {url.path}"})
+            return None, None
+        name = url.path[len(prefix):].strip("/")
+        table = self.server.tables.get(name)
+        if table is None:
+            self.send_json(404, {"code": "42P01", "message": f'relation "{name}" does not exist'})
+            return None, None
+        return table, parse_qsl(url.query, keep_blank_values=True)
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        table, params = self.parse_request_path()
+        if table is None:
+            return
+
+        order_column, descending = None, False
+        limit, offset = None, 0
+        filters = []
+        for key, value in params:
+            if key == "order":
+                order_column, _, direction = value.partition(".")
+                descending = direction.startswith("desc")
+            elif key == "limit":
+                limit = int(value)
+            elif key == "offset":
+                offset = int(value)
+            elif key not in RESERVED_PARAMS:
+                op, _, operand = value.partition(".")
+                if op not in OPERATORS:
+                    self.send_json(400, {"message": f"Unsupported operator {op}"})
+                    return
+                filters.append((key, op, operand))
+
+        with table.lock:
+            if order_column:
+                keys, rows = table.sorted_by(order_column)
+                # Use the sort order to skip straight to the keyset boundary.
+                for column, op, operand in filters:
+                    if column == order_column and op in ("gt", "gte") and keys and not descending:
+                        bound = coerce(operand, keys[0])
+                        start = bisect.bisect_right(keys, bound) if op == "gt" else bisect.bisect_left(keys, bound)
+                        rows = rows[start:]
+                        break
+                if descending:
+                    rows = rows[::-1]
+            else:
+                rows = table.rows
+
+        def matches(row):
+            for column, op, operand in filters:
+                value = row.get(column)
+                if value is None or not OPERATORS[op](value, coerce(operand, value)):
+                    return False
+            return True
+
+        cap = min(limit, self.server.max_rows) if limit is not None else self.server.max_rows
+        page = []
+        skipped = 0
+        for row in rows:
+            if not matches(row):
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            if len(page) >= cap:
+                break
+            page.append(row)
+        self.send_json(200, page)
+
+    def do_POST(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        table, params = self.parse_request_path()
+        if table is None:
+            return
+
+        try:
+            rows = json.loads(body or b"[]")
+        except ValueError as e:
+            self.send_json(400, {"code": "PGRST102", "message": f"Invalid JSON body: {e}"})
+            return
+        if isinstance(rows, dict):
+            rows = [rows]
+
+        prefer = {}
+        for item in self.headers.get("Prefer", "").split(","):
+            name, _, value = item.strip().partition("=")
+            if name:
+                prefer[name] = value
+        column = dict(params).get("on_conflict")
+        resolution = prefer.get("resolution") if column else None
+
+        with table.lock:
+            written, duplicate = table.upsert(rows, column, resolution)
+        if written is None:
+            self.send_json(409, {
+                "code": "23505",
+                "message": "duplicate key value violates unique constraint",
+                "details": f"Key ({column})=({duplicate}) already exists.",
+            })
+            return
+        if prefer.get("return") == "representation":
+            self.send_json(201, written)
+        else:
+            self.send_response(201)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve data/*.json through a minimal PostgREST-compatible API")
+    parser.add_argument("--data", default="data", help="directory of <table>.json / <table>.ndjson files")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--max-rows", type=int, default=1000, help="rows per response cap, like Supabase")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--table", action="append", default=[], help="serve an empty table with this name (repeatable)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.tables = load_tables(args.data)
+    for name in args.table:
+        server.tables.setdefault(name, Table([]))
+    server.max_rows = args.max_rows
+    server.latency = args.latency
+    server.verbose = args.verbose
+    for name, table in server.tables.items():
+        print(f"  {name}: {len(table.rows)} rows")
+    print(f"Serving on http://{args.host}:{args.port}/rest/v1/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import random
+from samplers import AliasSampler
 
 # Predefined prescriptions and descriptions
 _prescriptions = {
@@ -135,14 +136,18 @@ _descriptions = {
     ]
 }
 
-def generate_prescription(diagnosis: str) -> str:
-    options = _prescriptions.get(diagnosis)
-    if not options:
+# Each diagnosis' options, compiled once into a uniform sampler.
+_prescription_samplers = {diagnosis: AliasSampler(options) for diagnosis, options in _prescriptions.items() if options}
+_description_samplers = {diagnosis: AliasSampler(options) for diagnosis, options in _descriptions.items() if options}
+
+def generate_prescription(diagnosis: str, rng=random) -> str:
+    sampler = _prescription_samplers.get(diagnosis)
+    if sampler is None:
         return "No prescription available"
-    return random.choice(options)
+    return sampler.draw(rng)
 
-def generate_description(diagnosis: str) -> str:
-    options = _descriptions.get(diagnosis)
-    if not options:
+def generate_description(diagnosis: str, rng=random) -> str:
+    sampler = _description_samplers.get(diagnosis)
+    if sampler is None:
         return "No description available"
-    return random.choice(options)
+    return sampler.draw(rng)
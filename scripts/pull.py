@@ -1,7 +1,16 @@
 import os
-from dotenv import load_dotenv
-from supabase import create_client, Client
+import sys
 import json
+import asyncio
+import argparse
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+import http_client
+from http_client import send_with_retry
+from json_stream import JSONArrayWriter, iter_rows
+from build_cubes import build as build_cubes
+from partitions import write_partitions
+from validate_data import validate
 
 # Load .env variables (works locally; ignored on Netlify if file missing)
 load_dotenv()
@@ -18,30 +27,194 @@ if ENV == "production":
 else:
     OUTPUT_DIR = "data"
 
-print(f"{ENV} environment detected. Saving files to: {OUTPUT_DIR}/")
+# Tables to export and the primary key each one is paged by.
+TABLES = {
+    "citizens": "nid_number",
+    "entitlements": "entitlement_id",
+    "health_institutes": "institute_id",
+    "health_records": "record_id",
+}
+
+# Incremental pulls fetch the rows whose WATERMARK_COLUMN is at or past the
+# newest value seen last time, minus OVERLAP_SECONDS. The column has to be a
+# timestamp the database sets on every insert and update; the migration in
+# supabase/migrations/20261018000000_add_updated_at.sql adds updated_at and
+# its trigger to the four tables. The overlap re-reads rows from
+# transactions that started before the last pull but committed after it;
+# re-read rows replace their earlier copy by primary key. A table whose rows
+# don't carry the column is always exported in full. Deleted rows are only
+# noticed by a full export, so each table is re-exported in full once
+# RECONCILE_HOURS (a week, against a nightly pull) have passed since its
+# last full export.
+#
+# An incremental pull starts from STATE_FILE and the <table>.json files the
+# previous pull left in OUTPUT_DIR; without them every table is exported in
+# full. Netlify builds start from a clean checkout, so there both have to be
+# restored from the build cache before pull.py runs (and saved back after),
+# or PULL_INCREMENTAL gains nothing.
+WATERMARK_COLUMN = os.getenv("PULL_WATERMARK_COLUMN", "updated_at")
+OVERLAP_SECONDS = int(os.getenv("PULL_OVERLAP_SECONDS", "300"))
+RECONCILE_HOURS = float(os.getenv("PULL_RECONCILE_HOURS", "168"))
+
+# Per-table watermarks from the last successful pull, next to the artifacts.
+STATE_FILE = f"{OUTPUT_DIR}/.pull_state.json"
+
+# PostgREST caps rows per response (1000 on Supabase by default), so every
+# table is read in pages of at most this many rows; a lower server cap just
+# means smaller pages.
+PAGE_SIZE = int(os.getenv("PULL_PAGE_SIZE", "1000"))
+MAX_CONNECTIONS = int(os.getenv("PULL_MAX_CONNECTIONS", "8"))
+
+
+def make_client():
+    return http_client.make_client(SUPABASE_URL, SUPABASE_KEY, MAX_CONNECTIONS, 60.0, {"Accept": "application/json"})
+
+
+async def fetch_page(client, table, key, after, filters=None):
+    params = {"select": "*", "order": f"{key}.asc", "limit": str(PAGE_SIZE), **(filters or {})}
+    if after is not None:
+        params[key] = f"gt.{after}"
+    response = await send_with_retry(lambda: client.get(f"/{table}", params=params), table)
+    return response.json()
+
+
+# Keyset pagination: each page asks for rows whose primary key is greater than
+# the last one seen, so pages never overlap or skip rows, and every page is
+# written to disk as soon as it arrives. Only an empty page ends the table:
+# the server may cap responses below PAGE_SIZE, so a short page says nothing
+# about whether more rows follow.
+async def fetch_rows(client, table, key, after=None, filters=None):
+    while True:
+        page = await fetch_page(client, table, key, after, filters)
+        if not page:
+            return
+        for row in page:
+            yield row
+        after = page[-1][key]
+
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {}
+    with open(STATE_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state):
+    tmp_path = STATE_FILE + ".part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_FILE)
+
+
+def newest(value, row):
+    stamp = row.get(WATERMARK_COLUMN)
+    return stamp if stamp is not None and (value is None or stamp > value) else value
+
+
+async def export_table(client, table, key, state):
+    file_path = f"{OUTPUT_DIR}/{table}.json"
+    tmp_path = file_path + ".part"
+    watermark = None
+    with JSONArrayWriter(tmp_path) as writer:
+        async for row in fetch_rows(client, table, key):
+            writer.write(row)
+            watermark = newest(watermark, row)
+    # Only replace the previous export once the table was read completely.
+    os.replace(tmp_path, file_path)
+    state[table] = {
+        "column": WATERMARK_COLUMN, "watermark": watermark, "rows": writer.rows,
+        "full_at": datetime.now(timezone.utc).isoformat(),
+    }
+    save_state(state)
+    print(f"Saved {table}.json ({writer.rows} rows)")
+
+
+# Fetches the rows changed since the stored watermark (less the overlap)
+# into memory, then rewrites the artifact with each changed row in place of
+# its old copy and the new ones at the end. The artifact and the state are
+# only replaced once everything was read, so a failed run leaves both as
+# they were.
+async def sync_table(client, table, key, state):
+    file_path = f"{OUTPUT_DIR}/{table}.json"
+    tmp_path = file_path + ".part"
+    watermark = state[table]["watermark"]
+    since = datetime.fromisoformat(watermark) - timedelta(seconds=OVERLAP_SECONDS)
+    changed = {}
+    async for row in fetch_rows(client, table, key, filters={WATERMARK_COLUMN: f"gte.{since.isoformat()}"}):
+        changed[row[key]] = row
+        watermark = newest(watermark, row)
+
+    fetched = len(changed)
+    with JSONArrayWriter(tmp_path) as writer:
+        for row in iter_rows(file_path):
+            writer.write(changed.pop(row[key], row))
+        added = len(changed)
+        for row in changed.values():
+            writer.write(row)
+    os.replace(tmp_path, file_path)
+    state[table] = {**state[table], "watermark": watermark, "rows": writer.rows}
+    save_state(state)
+    print(f"Updated {table}.json ({fetched} changed rows, {added} new)")
+
+
+def can_sync(table, state):
+    table_state = state.get(table, {})
+    return (
+        table_state.get("column") == WATERMARK_COLUMN
+        and table_state.get("watermark") is not None
+        and datetime.now(timezone.utc) - datetime.fromisoformat(table_state["full_at"]) < timedelta(hours=RECONCILE_HOURS)
+        and os.path.exists(f"{OUTPUT_DIR}/{table}.json")
+    )
+
 
-# Ensure the directory exists
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+async def main():
+    parser = argparse.ArgumentParser(description="Export the Supabase tables to JSON files")
+    parser.add_argument(
+        "--incremental", action="store_true", default=os.getenv("PULL_INCREMENTAL") == "1",
+        help=f"only fetch rows whose {WATERMARK_COLUMN} moved since the last pull (also enabled by PULL_INCREMENTAL=1)"
+    )
+    parser.add_argument(
+        "--partitioned", action="store_true", default=os.getenv("PULL_PARTITIONED") == "1",
+        help="also split health_records into compressed year/province files (also enabled by PULL_PARTITIONED=1)"
+    )
+    parser.add_argument(
+        "--warehouse", metavar="DIR", default=os.getenv("PULL_WAREHOUSE"),
+        help="also write the tables to the Iceberg warehouse in DIR (also set by PULL_WAREHOUSE)"
+    )
+    parser.add_argument(
+        "--validate", action="store_true", default=os.getenv("PULL_VALIDATE") == "1",
+        help="check foreign keys and dates of the export and fail before building on it (also enabled by PULL_VALIDATE=1)"
+    )
+    args = parser.parse_args()
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    print(f"{ENV} environment detected. Saving files to: {OUTPUT_DIR}/")
 
-# Helper function to save data and reduce code repetition
-def save_json(filename, data):
-    file_path = f"{OUTPUT_DIR}/{filename}"
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    print(f"Saved {filename}")
+    # Ensure the directory exists
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-# --- Fetch and Save Operations ---
+    state = load_state() if args.incremental else {}
+    async with make_client() as client:
+        await asyncio.gather(*(
+            sync_table(client, table, key, state) if args.incremental and can_sync(table, state)
+            else export_table(client, table, key, state)
+            for table, key in TABLES.items()
+        ))
 
-response = supabase.table("citizens").select("*").execute()
-save_json("citizens.json", response.data)
+    if args.validate:
+        report = validate(OUTPUT_DIR)
+        report.print()
+        if not report.ok:
+            sys.exit(1)
 
-response = supabase.table("entitlements").select("*").execute()
-save_json("entitlements.json", response.data)
+    # Pre-aggregated rollups for GovDashboard
+    build_cubes(OUTPUT_DIR)
+    if args.partitioned:
+        write_partitions(OUTPUT_DIR)
+    if args.warehouse:
+        from warehouse import export_warehouse
+        export_warehouse(OUTPUT_DIR, args.warehouse)
 
-response = supabase.table("health_institutes").select("*").execute()
-save_json("health_institutes.json", response.data)
 
-response = supabase.table("health_records").select("*").execute()
-save_json("health_records.json", response.data)
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+import random
+import numpy as np
+
+
+# A fixed categorical distribution compiled into a Walker/Vose alias table.
+# random.choices(labels, weights) rebuilds the cumulative weights and
+# bisects them on every call; here each draw is one uniform number: its
+# integer part picks a column, and its fraction picks either that column's
+# own label or its alias.
+class AliasSampler:
+    def __init__(self, labels, weights=None):
+        self.labels = list(labels)
+        n = len(self.labels)
+        if n == 0:
+            raise ValueError("AliasSampler needs at least one label")
+        weights = np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64)
+        if len(weights) != n or (weights < 0).any() or weights.sum() <= 0:
+            raise ValueError("weights must be non-negative, not all zero, and one per label")
+        self.weights = weights / weights.sum()
+
+        scaled = self.weights * n
+        prob = np.ones(n)
+        alias = np.arange(n)
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Whatever is left is 1 up to rounding and keeps its own label.
+
+        self.prob = prob
+        self.alias = alias
+        self._prob = prob.tolist()
+        self._alias = alias.tolist()
+
+    def __len__(self):
+        return len(self.labels)
+
+    # One label, from anything with random() (the random module by default).
+    def draw(self, rng=random):
+        u = rng.random() * len(self._prob)
+        i = int(u)
+        return self.labels[i if u - i < self._prob[i] else self._alias[i]]
+
+    # k label positions at once from a NumPy generator.
+    def draw_codes(self, k, rng=None):
+        rng = rng if rng is not None else np.random.default_rng()
+        u = rng.random(k) * len(self._prob)
+        i = u.astype(np.intp)
+        return np.where(u - i < self.prob[i], i, self.alias[i])
+
+    def sample(self, k, rng=None):
+        labels = self.labels
+        return [labels[i] for i in self.draw_codes(k, rng).tolist()]
+
+    # The distribution the table actually encodes, for checking it.
+    def probabilities(self):
+        n = len(self._prob)
+        p = self.prob / n
+        np.add.at(p, self.alias, (1.0 - self.prob) / n)
+        return p
@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+from dotenv import load_dotenv
+import http_client
+from http_client import send_with_retry
+from json_stream import iter_rows, table_file
+
+# Bulk-loads the generated tables in data/ into Supabase:
+#
+#   python3 scripts/seed_supabase.py --batch-size 1000 --concurrency 4
+#
+# Rows are sent as PostgREST upserts (on_conflict=<primary key> with
+# Prefer: resolution=merge-duplicates), so a batch that failed half way can
+# simply be sent again, and re-running the whole load is harmless. It can be
+# pointed at scripts/postgrest_stub.py to try it locally.
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
+# Inserting usually needs more than the publishable key allows.
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("VITE_SUPABASE_PUBLISHABLE_DEFAULT_KEY")
+
+if not SUPABASE_URL or not SUPABASE_KEY:
+    raise ValueError("Missing Supabase credentials in .env")
+
+# Tables are loaded stage by stage so foreign keys always point at rows that
+# are already there: health_records references citizens and institutes,
+# entitlements references citizens.
+STAGES = [
+    {"citizens": "nid_number", "health_institutes": "institute_id"},
+    {"health_records": "record_id", "entitlements": "entitlement_id"},
+]
+
+BATCH_SIZE = int(os.getenv("SEED_BATCH_SIZE", "1000"))
+CONCURRENCY = int(os.getenv("SEED_CONCURRENCY", "4"))
+
+
+def make_client(concurrency):
+    return http_client.make_client(SUPABASE_URL, SUPABASE_KEY, concurrency, 120.0, {
+        "Content-Type": "application/json",
+        "Prefer": "resolution=merge-duplicates,return=minimal",
+    })
+
+
+# Rows are serialized as they are read, so only the batches in flight are
+# held in memory however large the table is.
+def read_batches(path, batch_size):
+    batch = []
+    for row in iter_rows(path):
+        batch.append(json.dumps(row, separators=(",", ":")))
+        if len(batch) >= batch_size:
+            yield len(batch), ("[" + ",".join(batch) + "]").encode("utf-8")
+            batch = []
+    if batch:
+        yield len(batch), ("[" + ",".join(batch) + "]").encode("utf-8")
+
+
+# Server errors, rate limits and dropped connections are retried with
+# backoff; since every batch is an upsert, sending it twice is safe.
+async def send_batch(client, table, key, rows, body):
+    await send_with_retry(lambda: client.post(f"/{table}", params={"on_conflict": key}, content=body), table)
+    return rows
+
+
+# Keeps up to `concurrency` batches in flight and reads the next batch only
+# when one of them finished.
+async def load_table(client, data_dir, table, key, batch_size, concurrency):
+    loaded = 0
+    pending = set()
+    started = time.perf_counter()
+    try:
+        for rows, body in read_batches(table_file(data_dir, table), batch_size):
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                loaded += sum(task.result() for task in done)
+            pending.add(asyncio.create_task(send_batch(client, table, key, rows, body)))
+        if pending:
+            done, pending = await asyncio.wait(pending)
+            loaded += sum(task.result() for task in done)
+    finally:
+        for task in pending:
+            task.cancel()
+
+    elapsed = time.perf_counter() - started
+    print(f"Loaded {table}: {loaded} rows in {elapsed:.1f}s ({loaded / max(elapsed, 1e-9):,.0f} rows/s)")
+    return loaded
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Upsert the generated tables in data/ into Supabase")
+    parser.add_argument("--data", default="data", help="directory of <table>.json / <table>.ndjson files")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per request (SEED_BATCH_SIZE)")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="requests in flight (SEED_CONCURRENCY)")
+    parser.add_argument("--tables", nargs="+", help="only load these tables (still in dependency order)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    total = 0
+    async with make_client(args.concurrency) as client:
+        for stage in STAGES:
+            tables = {t: k for t, k in stage.items() if not args.tables or t in args.tables}
+            loaded = await asyncio.gather(*(
+                load_table(client, args.data, table, key, args.batch_size, args.concurrency)
+                for table, key in tables.items()
+            ))
+            total += sum(loaded)
+
+    elapsed = time.perf_counter() - started
+    print(f"Loaded {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,22 @@
+import json
+from http.server import BaseHTTPRequestHandler
+
+# What the local stand-ins for external APIs (postgrest_stub.py, mmo_stub.py)
+# share: JSON responses, and request logging only when the server was
+# started with --verbose.
+
+
+class JSONRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
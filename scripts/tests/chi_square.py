@@ -0,0 +1,30 @@
+import math
+import numpy as np
+
+
+# The chi-square quantile by the Wilson-Hilferty approximation (z=3.09 is
+# the 0.1% upper tail).
+def critical_value(df, alpha_z=3.09):
+    return df * (1 - 2 / (9 * df) + alpha_z * math.sqrt(2 / (9 * df))) ** 3
+
+
+# Pearson chi-square goodness of fit: False if the counts reject the
+# probabilities at the 0.1% level, or fall on a zero-probability label.
+def chi_square_ok(counts, probabilities, alpha_z=3.09):
+    counts = np.asarray(counts)
+    expected = np.asarray(probabilities) * counts.sum()
+    keep = expected > 0
+    if (counts[~keep] > 0).any():
+        return False
+    stat = float((((counts - expected) ** 2)[keep] / expected[keep]).sum())
+    return stat <= critical_value(max(int(keep.sum()) - 1, 1), alpha_z)
+
+
+# Chi-square test of homogeneity: False if two count vectors over the same
+# labels reject having been drawn from one distribution at the 0.1% level.
+def same_distribution_ok(a, b, alpha_z=3.09):
+    table = np.array([a, b], dtype=np.float64)
+    table = table[:, table.sum(axis=0) > 0]
+    expected = table.sum(axis=1, keepdims=True) * table.sum(axis=0) / table.sum()
+    stat = float(((table - expected) ** 2 / expected).sum())
+    return stat <= critical_value(max(table.shape[1] - 1, 1), alpha_z)
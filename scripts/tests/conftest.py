@@ -0,0 +1,69 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+import threading
+import pytest
+
+# The scripts import each other as top-level modules.
+SCRIPTS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS)
+
+from postgrest_stub import StubHandler, Table  # noqa: E402
+from http.server import ThreadingHTTPServer  # noqa: E402
+
+
+# A postgrest_stub server on a free port: stub(tables, max_rows=...) serves
+# {name: rows} and returns the server, whose .url is the base URL.
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(tables, max_rows=1000):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        server.tables = {name: Table(list(rows)) for name, rows in tables.items()}
+        server.max_rows = max_rows
+        server.latency = 0.0
+        server.verbose = False
+        server.url = f"http://127.0.0.1:{server.server_address[1]}"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+PROVINCES = ["Koshi", "Madhesh", "Bagmati", "Gandaki", "Lumbini", "Karnali", "Sudurpashchim"]
+
+
+# A directory with small stand-ins for the inputs data_generator.py reads
+# from data/ (names.json, new_location.csv, institute.json);
+# generator(*args) runs the generator there and returns the data path.
+@pytest.fixture
+def generator(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    names = {sex: {"first_names": [f"{sex[0]}{i}" for i in range(50)], "last_names": [f"L{i}" for i in range(50)]}
+             for sex in ["Male", "Female"]}
+    with open(data_dir / "names.json", "w", encoding="utf-8") as f:
+        json.dump(names, f)
+    with open(data_dir / "new_location.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Province", "District", "Name of Municipalities", "Numbers of Wards"])
+        for province in PROVINCES:
+            for d in range(3):
+                for m in range(4):
+                    writer.writerow([province, f"{province}D{d}", f"{province} Muni {d}-{m}", 5 + m])
+    with open(data_dir / "institute.json", "w", encoding="utf-8") as f:
+        json.dump([{"name": f"Hospital {i}", "location": "X", "province": PROVINCES[i % len(PROVINCES)], "description": ""}
+                   for i in range(20)], f)
+
+    def run(*args):
+        subprocess.run([sys.executable, os.path.join(SCRIPTS, "data_generator.py"), *map(str, args)],
+                       cwd=tmp_path, check=True, capture_output=True)
+        return data_dir
+    return run
@@ -0,0 +1,26 @@
+from benchmark import compare
+
+
+def result(case="diagnoses", size=1000, rows_per_sec=1000.0, peak_rss_mb=100.0, output_bytes=0):
+    return {"case": case, "size": size, "rows_per_sec": rows_per_sec, "peak_rss_mb": peak_rss_mb,
+            "output_bytes": output_bytes}
+
+
+def test_regressions_beyond_the_tolerance():
+    baseline = {"results": [result(), result("end_to_end", output_bytes=1000)]}
+    assert compare([result(rows_per_sec=850.0), result("end_to_end", output_bytes=1150)], baseline, 0.2) == []
+    regressions = compare([result(rows_per_sec=700.0, peak_rss_mb=130.0), result("end_to_end", output_bytes=1300)],
+                          baseline, 0.2)
+    assert [line.split(": ")[1].split()[0] for line in regressions] == ["rows_per_sec", "peak_rss_mb", "output_bytes"]
+
+
+# A run too short to time has rows_per_sec None; neither side of the
+# comparison may fail on it.
+def test_missing_metrics_are_skipped():
+    assert compare([result(rows_per_sec=None)], {"results": [result()]}, 0.2) == []
+    assert compare([result(peak_rss_mb=500.0)], {"results": [result(rows_per_sec=None, peak_rss_mb=None)]}, 0.2) == []
+    assert len(compare([result(rows_per_sec=None, peak_rss_mb=500.0)], {"results": [result()]}, 0.2)) == 1
+
+
+def test_zero_tolerance_still_compares_in_the_right_direction():
+    assert compare([result(rows_per_sec=2000.0, peak_rss_mb=50.0)], {"results": [result()]}, 0.0) == []
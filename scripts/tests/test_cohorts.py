@@ -0,0 +1,110 @@
+import json
+import random
+import pytest
+
+pytest.importorskip("pyroaring")
+from cohorts import UNKNOWN, All, CohortIndex, Q, Visits  # noqa: E402
+
+PROVINCES = ["Koshi", "Karnali", "Bagmati"]
+DIAGNOSES = ["Anemia", "Asthma", "Migraine"]
+ENTITLEMENTS = ["Low Income", "Senior"]
+
+
+def write_tables(data_dir, citizens, institutes, records, entitlements):
+    for table, rows in [("citizens", citizens), ("health_institutes", institutes),
+                        ("health_records", records), ("entitlements", entitlements)]:
+        with open(data_dir / f"{table}.json", "w", encoding="utf-8") as f:
+            json.dump(rows, f)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    rng = random.Random(0)
+    citizens = [
+        {"nid_number": f"{100 + i}-000-000-0", "sex": rng.choice(["Male", "Female"]),
+         "date_of_birth": f"{rng.randint(1940, 2010)}-0{rng.randint(1, 9)}-15"}
+        for i in range(300)
+    ]
+    institutes = [{"institute_id": i + 1, "address": f"Ward No.1-Muni D, {p}"} for i, p in enumerate(PROVINCES)]
+    records = [
+        {"record_id": i + 1, "nid_number": rng.choice(citizens)["nid_number"], "institute_id": rng.randint(1, 3),
+         "record_type": rng.choice(["lab_report", "prescription"]), "diagnosis": rng.choice(DIAGNOSES),
+         "issued_date": f"{rng.randint(2015, 2024)}-{rng.randint(1, 12):02d}-10"}
+        for i in range(3000)
+    ]
+    # Two records of a citizen who is not in citizens.
+    records += [{**records[0], "record_id": 3001 + i, "nid_number": "999-999-999-9"} for i in range(2)]
+    entitlements = [
+        {"nid_number": c["nid_number"], "entitlement_type": e}
+        for c in citizens for e in ENTITLEMENTS if rng.random() < 0.3
+    ]
+    write_tables(tmp_path, citizens, institutes, records, entitlements)
+    return tmp_path, citizens, records, entitlements
+
+
+def test_cohorts_match_a_scan(dataset):
+    data_dir, citizens, records, entitlements = dataset
+    index = CohortIndex.build(data_dir)
+    index.save(data_dir / "cohorts.pkl")
+    index = CohortIndex.load(data_dir / "cohorts.pkl")
+
+    sex = {c["nid_number"]: c["sex"] for c in citizens}
+    province = {i + 1: p for i, p in enumerate(PROVINCES)}
+    low_income = {e["nid_number"] for e in entitlements if e["entitlement_type"] == "Low Income"}
+
+    def visit(r):
+        return r["diagnosis"] == "Anemia" and province[r["institute_id"]] == "Karnali" and r["issued_date"] >= "2020"
+
+    expected = {r["nid_number"] for r in records if visit(r) and r["nid_number"] in low_income
+                and sex.get(r["nid_number"]) == "Female"}
+    cohort = Visits(Q("diagnosis", "Anemia") & Q("province", "Karnali") & Q("year", at_least=2020)) \
+        & Q("sex", "Female") & Q("entitlement", "Low Income")
+    assert set(index.nids(index.citizens(cohort))) == expected
+
+    expected = {r["record_id"] for r in records if r["record_type"] == "lab_report"
+                and province[r["institute_id"]] != "Koshi" and r["issued_date"][5:7] in ("01", "02")}
+    assert set(index.records(Q("record_type", "lab_report") & ~Q("province", "Koshi") & Q("month", 1, 2))) == expected
+
+
+# Records of unknown citizens stay countable: every record dimension still
+# adds up to the record total, and the orphans are their own bucket.
+def test_orphan_records_are_kept_in_their_own_bucket(dataset):
+    data_dir, _, records, _ = dataset
+    index = CohortIndex.build(data_dir)
+    assert len(index.universe["records"]) == len(records)
+    for dimension, values in index.bitmaps["records"].items():
+        assert sum(len(b) for b in values.values()) == len(records), dimension
+    assert set(index.orphans) == {3001, 3002}
+    assert set(index.records(Q("sex", UNKNOWN))) == {3001, 3002}
+    assert len(index.citizens(Visits(Q("sex", UNKNOWN)))) == 0
+
+
+def test_build_without_citizens(tmp_path):
+    write_tables(tmp_path, [], [{"institute_id": 1, "address": "Ward No.1-Muni D, Koshi"}],
+                 [{"record_id": 1, "nid_number": "100-000-000-0", "institute_id": 1, "record_type": "lab_report",
+                   "diagnosis": "Anemia", "issued_date": "2021-01-01"}], [])
+    index = CohortIndex.build(tmp_path)
+    assert len(index.universe["citizens"]) == 0
+    assert set(index.orphans) == {1}
+    assert len(index.citizens(Visits(Q("diagnosis", "Anemia")))) == 0
+    assert set(index.records(Q("diagnosis", "Anemia"))) == {1}
+
+
+# Citizen sex and age_band come from the citizen alone: the age bands of
+# their visits don't leak into the age band they are in today.
+def test_each_citizen_is_in_one_age_band(dataset):
+    data_dir, citizens, _, _ = dataset
+    index = CohortIndex.build(data_dir)
+    for dimension in ("sex", "age_band"):
+        bitmaps = index.bitmaps["citizens"][dimension].values()
+        assert sum(len(b) for b in bitmaps) == len(citizens), dimension
+
+
+def test_visits_of_one_term_match_a_scan(dataset):
+    data_dir, _, records, _ = dataset
+    index = CohortIndex.build(data_dir)
+    for term, visit in [(Q("diagnosis", "Asthma"), lambda r: r["diagnosis"] == "Asthma"),
+                        (Q("year", at_most=2016), lambda r: r["issued_date"] < "2017")]:
+        expected = {r["nid_number"] for r in records if visit(r) and r["nid_number"] != "999-999-999-9"}
+        assert set(index.nids(index.citizens(Visits(term)))) == expected
+        assert index.citizens(Visits(term)) == index.citizens(Visits(term & All()))
@@ -0,0 +1,62 @@
+import json
+from cubes import CounterCube
+from json_stream import iter_rows
+
+
+def read(data_dir, table):
+    return list(iter_rows(str(data_dir / f"{table}.json")))
+
+
+# --append continues the ids where the state file left them, keeps the
+# generated identifiers unique across runs, and grows the diagnosis cube by
+# exactly the new records.
+def test_append_continues_the_dataset(generator):
+    data_dir = generator("--citizens", 300, "--shard-size", 100)
+    with open(data_dir / ".generator_state.json", encoding="utf-8") as f:
+        state = json.load(f)
+    first_records = read(data_dir, "health_records")
+    first_entitlements = read(data_dir, "entitlements")
+    assert state["next_record_id"] == len(first_records) + 1
+    assert state["next_entitlement_id"] == len(first_entitlements) + 1
+
+    generator("--citizens", 250, "--shard-size", 100, "--append")
+    citizens = read(data_dir, "citizens")
+    records = read(data_dir, "health_records")
+    entitlements = read(data_dir, "entitlements")
+    assert len(citizens) == 550
+    assert records[:len(first_records)] == first_records
+    assert [r["record_id"] for r in records] == list(range(1, len(records) + 1))
+    assert [e["entitlement_id"] for e in entitlements] == list(range(1, len(entitlements) + 1))
+    for column in ["nid_number", "phone", "citizenship_number"]:
+        assert len({c[column] for c in citizens}) == len(citizens), column
+
+    with open(data_dir / "diagnoses_record.json", encoding="utf-8") as f:
+        assert CounterCube.from_json(json.load(f)).total() == len(records)
+    with open(data_dir / ".generator_state.json", encoding="utf-8") as f:
+        state = json.load(f)
+    assert state["citizens"] == 550
+    assert state["next_record_id"] == len(records) + 1
+
+
+# Institutes edited by hand may lack the ", Province" tail.
+def test_read_institutes_takes_any_address(tmp_path, monkeypatch):
+    from data_generator import read_institutes
+    (tmp_path / "data").mkdir()
+    with open(tmp_path / "data" / "health_institutes.json", "w", encoding="utf-8") as f:
+        json.dump([{"address": "Ward No.1-Muni Kaski, Gandaki", "created_at": "2001-02-03"},
+                   {"address": "Pokhara", "created_at": "2005-06-07"}], f)
+    monkeypatch.chdir(tmp_path)
+    provinces, established = read_institutes("json")
+    assert provinces[0] == "Gandaki"
+    assert len(established) == 2
+
+
+# Shards are seeded by their number, not by the worker that runs them, so
+# the output doesn't depend on --workers.
+def test_output_is_the_same_for_any_worker_count(generator):
+    tables = ["citizens", "health_institutes", "health_records", "entitlements", "diagnoses_record"]
+    data_dir = generator("--citizens", 400, "--shard-size", 70, "--workers", 1)
+    single = {table: (data_dir / f"{table}.json").read_bytes() for table in tables}
+    generator("--citizens", 400, "--shard-size", 70, "--workers", 2)
+    for table in tables:
+        assert (data_dir / f"{table}.json").read_bytes() == single[table], table
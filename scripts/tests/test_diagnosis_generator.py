@@ -0,0 +1,65 @@
+import random
+from datetime import date
+import numpy as np
+import pytest
+from chi_square import same_distribution_ok
+from diagnosis_generator import (
+    AGE_BAND_EDGES, DIAGNOSES, DIAGNOSIS_LIST, PROVINCES, SEXES, WEIGHT_TENSOR, age_multiplier, encode_provinces,
+    encode_sexes, generate_diagnoses, generate_diagnosis, month_multiplier, province_multiplier, sex_multiplier,
+)
+
+SCALAR_DRAWS = 10_000
+BATCH_DRAWS = 50_000
+
+
+# The batch engine's precomputed weights are the scalar function's weights
+# (before trend and noise) for every whole-year age, not just the band
+# representatives.
+@pytest.mark.parametrize("sex", SEXES)
+def test_weight_tensor_matches_the_multipliers_at_every_age(sex):
+    s = SEXES.index(sex)
+    for age in range(0, 101):
+        band = np.searchsorted(AGE_BAND_EDGES, age, side="right")
+        for month in range(1, 13):
+            for p, province in enumerate(PROVINCES):
+                expected = [
+                    base * age_multiplier(d, age) * month_multiplier(d, month)
+                    * province_multiplier(d, province) * sex_multiplier(d, sex)
+                    for d, base in DIAGNOSES.items()
+                ]
+                np.testing.assert_allclose(WEIGHT_TENSOR[band, s, month - 1, p], expected, rtol=1e-6)
+
+
+# Per age band and sex, the diagnoses drawn by generate_diagnoses must be
+# indistinguishable from generate_diagnosis's for the same visit, noise and
+# trend included.
+@pytest.mark.parametrize("sex", ["Male", "Female", "Other"])
+@pytest.mark.parametrize("age", [8, 20, 27, 38, 52, 70])
+def test_batch_and_scalar_draw_the_same_distribution(age, sex):
+    visit, province, start_year = date(2023, 7, 15), "Karnali", 2012
+    random.seed(age * 31 + len(sex))
+    index = {d: i for i, d in enumerate(DIAGNOSIS_LIST)}
+    scalar = np.zeros(len(DIAGNOSIS_LIST), dtype=np.int64)
+    for _ in range(SCALAR_DRAWS):
+        scalar[index[generate_diagnosis(age, sex, visit, province, start_year)]] += 1
+
+    codes = generate_diagnoses(
+        np.full(BATCH_DRAWS, age), np.full(BATCH_DRAWS, sex), np.full(BATCH_DRAWS, visit.month),
+        np.full(BATCH_DRAWS, visit.year), np.full(BATCH_DRAWS, province), start_year,
+        rng=np.random.default_rng(age * 31 + len(sex)),
+    )
+    batch = np.bincount(codes, minlength=len(DIAGNOSIS_LIST))
+    assert same_distribution_ok(scalar, batch), f"scalar {scalar.tolist()} vs batch {batch.tolist()}"
+
+
+# Columns encoded up front draw exactly what the same strings draw.
+def test_encoded_columns_match_strings():
+    rng = np.random.default_rng(3)
+    n = 20_000
+    ages, months, years = rng.integers(0, 95, n), rng.integers(1, 13, n), rng.integers(2010, 2026, n)
+    sexes = np.array(["Male", "Female", "Other"])[rng.integers(0, 3, n)]
+    provinces = np.array(PROVINCES + ["Elsewhere"])[rng.integers(0, len(PROVINCES) + 1, n)]
+    from_strings = generate_diagnoses(ages, sexes, months, years, provinces, rng=np.random.default_rng(4))
+    from_codes = generate_diagnoses(ages, encode_sexes(sexes), months, years, encode_provinces(provinces),
+                                    rng=np.random.default_rng(4))
+    assert (from_strings == from_codes).all()
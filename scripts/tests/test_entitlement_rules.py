@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from entitlement_rules import OPERATORS, EntitlementRules
+from chi_square import chi_square_ok
+
+N = 200_000
+
+
+@pytest.fixture(scope="module")
+def population():
+    rng = np.random.default_rng(0)
+    rules = EntitlementRules(seed=7)
+    ids = np.arange(N)
+    columns = {"age": rng.integers(18, 91, N), "sex": rng.choice(["Male", "Female", "Other"], N)}
+    return rules, ids, columns, rules.evaluate(ids, columns)
+
+
+# Among eligible citizens each rule grants at its probability, and never to
+# anyone else.
+@pytest.mark.parametrize("r", range(len(EntitlementRules(seed=7))))
+def test_rule_grants_at_its_probability(population, r):
+    rules, _, columns, bits = population
+    rule = rules.rules[r]
+    eligible = np.ones(N, dtype=bool)
+    for column, op, value in rule["when"]:
+        eligible &= OPERATORS[op](columns[column], value)
+    granted = ((bits >> r) & 1).astype(bool)
+    assert not (granted & ~eligible).any()
+    p = rule["probability"]
+    counts = np.array([granted[eligible].sum(), (~granted[eligible]).sum()])
+    assert chi_square_ok(counts, [p, 1 - p]), f"{rule['name']}: {counts[0]}/{eligible.sum()} granted, p={p}"
+
+
+def test_reevaluate_matches_a_fresh_evaluation(population):
+    rules, ids, columns, bits = population
+    rng = np.random.default_rng(1)
+    columns = {c: v.copy() for c, v in columns.items()}
+    changed = rng.choice(N, N // 10, replace=False)
+    columns["age"][changed] = rng.integers(18, 91, len(changed))
+    partial = bits.copy()
+    partial[changed] = rules.reevaluate(ids[changed], {c: v[changed] for c, v in columns.items()}, bits[changed], ["age"])
+    assert np.array_equal(partial, rules.evaluate(ids, columns))
+
+
+# A citizen's draw depends only on their id, not on the batch around them.
+def test_draws_do_not_depend_on_the_batch():
+    rules = EntitlementRules(seed=7)
+    ids = np.arange(1000)
+    assert np.array_equal(rules.draws(ids, 0)[500:], rules.draws(ids[500:], 0))
@@ -0,0 +1,47 @@
+import asyncio
+import httpx
+import pytest
+import http_client
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+    monkeypatch.setattr(http_client.asyncio, "sleep", sleep)
+    return delays
+
+
+def run(statuses, retries=5, headers=None):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(statuses[min(len(calls), len(statuses)) - 1], json={}, headers=headers or {})
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test") as client:
+            return await http_client.send_with_retry(lambda: client.get("/t"), "t", retries)
+    return asyncio.run(go()), calls
+
+
+def test_retries_server_errors_and_rate_limits():
+    response, calls = run([503, 429, 200])
+    assert response.status_code == 200 and len(calls) == 3
+
+
+def test_honours_retry_after(no_sleep):
+    run([429, 200], headers={"Retry-After": "7"})
+    assert no_sleep[0] >= 7 * 0.5
+
+
+def test_client_errors_are_not_retried():
+    with pytest.raises(httpx.HTTPStatusError):
+        run([404])
+
+
+def test_gives_up_after_the_last_attempt():
+    with pytest.raises(httpx.HTTPStatusError, match="503 from t"):
+        run([503], retries=3)
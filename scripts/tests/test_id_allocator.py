@@ -0,0 +1,51 @@
+import pytest
+from id_allocator import IdSpace
+
+
+# Over a small space every counter gets a different id and every id is
+# reached, for an even, an odd and a multi-pattern digit split.
+@pytest.mark.parametrize("patterns, expected", [
+    ("##-##", {f"{i // 100:02d}-{i % 100:02d}" for i in range(10_000)}),
+    ("###", {f"{i:03d}" for i in range(1000)}),
+    (["A-##", "B-##"], {f"{p}-{i:02d}" for p in "AB" for i in range(100)}),
+])
+@pytest.mark.parametrize("key", [0, 7, 2 ** 63 + 12345])
+def test_feistel_permutation_is_a_bijection(patterns, expected, key):
+    space = IdSpace(patterns, key)
+    ids = [space.format(counter) for counter in range(space.capacity)]
+    assert set(ids) == expected
+    assert len(ids) == len(expected)
+
+
+def test_keys_give_different_orders():
+    assert [IdSpace("###", 1).format(i) for i in range(20)] != [IdSpace("###", 2).format(i) for i in range(20)]
+
+
+def test_full_space_overflows():
+    space = IdSpace("#", 5)
+    ids = [space.allocate() for _ in range(10)]
+    assert sorted(ids) == [str(i) for i in range(10)]
+    assert space.remaining() == 0
+    with pytest.raises(OverflowError):
+        space.allocate()
+    with pytest.raises(OverflowError):
+        space.format(-1)
+
+
+# A later run resumes from the saved counter and hands out exactly the ids
+# one uninterrupted allocator would have.
+def test_resume_from_a_saved_counter():
+    whole = IdSpace("###-###", 42)
+    expected = [whole.allocate() for _ in range(500)]
+
+    first = IdSpace("###-###", 42)
+    ids = [first.allocate() for _ in range(137)]
+    resumed = IdSpace("###-###", 42, next_counter=first.next_counter)
+    ids += [resumed.allocate() for _ in range(500 - 137)]
+    assert ids == expected
+    assert resumed.remaining() == resumed.capacity - 500
+
+
+def test_patterns_must_have_the_same_digits():
+    with pytest.raises(ValueError):
+        IdSpace(["A-##", "B-###"], 0)
@@ -0,0 +1,28 @@
+import tracemalloc
+from instrumentation import Instruments
+
+
+def test_stage_stops_the_tracing_it_started():
+    assert not tracemalloc.is_tracing()
+    instruments = Instruments(True)
+    with instruments.stage("work") as stage:
+        assert tracemalloc.is_tracing()
+        data = [bytes(1024) for _ in range(1024)]
+        stage.rows = len(data)
+    assert not tracemalloc.is_tracing()
+    assert instruments.stages[0]["tracemalloc_peak_mb"] >= 1.0
+
+
+def test_stage_leaves_tracing_started_elsewhere_on():
+    tracemalloc.start()
+    try:
+        with Instruments(True).stage("work"):
+            pass
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_disabled_stage_does_not_trace():
+    with Instruments(False).stage("work"):
+        assert not tracemalloc.is_tracing()
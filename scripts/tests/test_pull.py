@@ -0,0 +1,108 @@
+import asyncio
+import importlib
+import json
+import pytest
+
+
+@pytest.fixture
+def pull(stub, tmp_path, monkeypatch):
+    def load(tables, max_rows):
+        server = stub(tables, max_rows)
+        monkeypatch.setenv("VITE_SUPABASE_URL", server.url)
+        monkeypatch.setenv("VITE_SUPABASE_PUBLISHABLE_DEFAULT_KEY", "local")
+        import pull
+        pull = importlib.reload(pull)
+        monkeypatch.setattr(pull, "OUTPUT_DIR", str(tmp_path))
+        monkeypatch.setattr(pull, "STATE_FILE", str(tmp_path / ".pull_state.json"))
+        return server, pull
+    return load
+
+
+def export(pull, table, key, state):
+    async def run():
+        async with pull.make_client() as client:
+            await pull.export_table(client, table, key, state)
+    asyncio.run(run())
+
+
+# A server cap below PULL_PAGE_SIZE must only shrink the pages, not cut the
+# table to its first page.
+def test_export_pages_past_a_low_server_cap(pull, tmp_path):
+    records = [{"record_id": i, "nid_number": f"n{i % 7}"} for i in range(1, 1301)]
+    server, pull = pull({"health_records": records}, max_rows=500)
+    assert pull.PAGE_SIZE > server.max_rows
+
+    state = {}
+    export(pull, "health_records", "record_id", state)
+    with open(tmp_path / "health_records.json", encoding="utf-8") as f:
+        exported = json.load(f)
+    assert [r["record_id"] for r in exported] == list(range(1, 1301))
+    assert state["health_records"]["rows"] == 1300
+
+
+def sync(pull, table, key, state):
+    async def run():
+        async with pull.make_client() as client:
+            if pull.can_sync(table, state):
+                await pull.sync_table(client, table, key, state)
+            else:
+                await pull.export_table(client, table, key, state)
+    asyncio.run(run())
+
+
+def stamp(minute, second=0):
+    return f"2025-01-01T10:{minute:02d}:{second:02d}+00:00"
+
+
+# Rows updated in place, rows added, and a row whose transaction committed
+# after the last pull with an earlier updated_at must all land in the
+# incremental result, which must equal a fresh full export.
+def test_incremental_sync_picks_up_changed_and_late_rows(pull, tmp_path):
+    rows = [{"record_id": i, "diagnosis": "Flu", "updated_at": stamp(i % 50)} for i in range(1, 1201)]
+    server, pull = pull({"health_records": rows}, max_rows=500)
+    state = {}
+    sync(pull, "health_records", "record_id", state)
+    assert state["health_records"]["watermark"] == stamp(49)
+
+    table = server.tables["health_records"]
+    table.rows[9].update(diagnosis="Anemia", updated_at=stamp(55))
+    table.rows.append({"record_id": 1201, "diagnosis": "Asthma", "updated_at": stamp(56)})
+    table.rows.append({"record_id": 1202, "diagnosis": "Typhoid", "updated_at": stamp(47, 30)})
+    table.invalidate()
+
+    assert pull.can_sync("health_records", state)
+    sync(pull, "health_records", "record_id", state)
+    with open(tmp_path / "health_records.json", encoding="utf-8") as f:
+        synced = json.load(f)
+    assert synced == sorted(table.rows, key=lambda r: r["record_id"])
+    assert state["health_records"]["rows"] == 1202
+    assert state["health_records"]["watermark"] == stamp(56)
+
+
+def test_tables_without_the_watermark_column_are_exported_in_full(pull):
+    server, pull = pull({"citizens": [{"nid_number": f"{i:03d}"} for i in range(10)]}, max_rows=500)
+    state = {}
+    sync(pull, "citizens", "nid_number", state)
+    assert state["citizens"]["watermark"] is None
+    assert not pull.can_sync("citizens", state)
+
+
+def test_full_reconcile_after_reconcile_hours(pull, monkeypatch):
+    server, pull = pull({"health_records": [{"record_id": 1, "updated_at": stamp(0)}]}, max_rows=500)
+    state = {}
+    sync(pull, "health_records", "record_id", state)
+    assert pull.can_sync("health_records", state)
+    monkeypatch.setattr(pull, "RECONCILE_HOURS", 0)
+    assert not pull.can_sync("health_records", state)
+
+
+# A build that starts without the previous artifacts (e.g. a clean Netlify
+# checkout with the state restored but not the files) exports in full.
+def test_missing_artifact_falls_back_to_a_full_export(pull, tmp_path):
+    server, pull = pull({"health_records": [{"record_id": 1, "updated_at": stamp(0)}]}, max_rows=500)
+    state = {}
+    sync(pull, "health_records", "record_id", state)
+    (tmp_path / "health_records.json").unlink()
+    assert not pull.can_sync("health_records", state)
+    sync(pull, "health_records", "record_id", state)
+    assert (tmp_path / "health_records.json").exists()
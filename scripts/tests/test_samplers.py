@@ -0,0 +1,108 @@
+import os
+import random
+import numpy as np
+import pytest
+import address_generator
+import data_generator
+import prescription_generator
+from chi_square import chi_square_ok, same_distribution_ok
+from samplers import AliasSampler
+
+DRAWS = 200_000
+LOCATIONS = os.path.join(os.path.dirname(__file__), "..", "..", "data", "new_location.csv")
+
+
+# Every AliasSampler the generators define at module level, directly or in
+# a dict.
+def generator_samplers():
+    found = {}
+    for module in (data_generator, prescription_generator):
+        for attr, value in vars(module).items():
+            if isinstance(value, AliasSampler):
+                found[f"{module.__name__}.{attr}"] = value
+            elif isinstance(value, dict):
+                for key, item in value.items():
+                    if isinstance(item, AliasSampler):
+                        found[f"{module.__name__}.{attr}[{key!r}]"] = item
+    return found
+
+
+SAMPLERS = {
+    "skewed": AliasSampler("abcde", [50, 1, 0, 30, 19]),
+    "uniform": AliasSampler(range(7)),
+    **generator_samplers(),
+}
+
+
+def check_sampler(sampler):
+    assert np.allclose(sampler.probabilities(), sampler.weights, rtol=0, atol=1e-12)
+    batch = np.bincount(sampler.draw_codes(DRAWS, np.random.default_rng(0)), minlength=len(sampler))
+    assert chi_square_ok(batch, sampler.weights)
+
+    rng = random.Random(0)
+    index = {label: i for i, label in enumerate(sampler.labels)}
+    scalar = np.zeros(len(sampler), dtype=np.int64)
+    for _ in range(DRAWS // 10):
+        scalar[index[sampler.draw(rng)]] += 1
+    assert chi_square_ok(scalar, sampler.weights)
+
+
+# The table must encode exactly the configured weights, and scalar and batch
+# draws must pass a chi-square test against them.
+@pytest.mark.parametrize("name", SAMPLERS)
+def test_sampler_matches_its_weights(name):
+    check_sampler(SAMPLERS[name])
+
+
+# The random.choice / random.choices calls the module-level samplers
+# replaced, as (labels, weights); None is uniform.
+PRE_ALIAS_TABLES = {
+    "data_generator.SEX_SAMPLER": (["Male", "Female", "Other"], [49, 47, 4]),
+    "data_generator.BLOOD_GROUP_SAMPLER": (["A+", "A-", "B+", "B-", "O+", "O-", "AB+", "AB-"], None),
+    "data_generator.RECORD_TYPE_SAMPLER": (
+        ["clinical_note", "lab_report", "imaging_report", "prescription", "discharge_summary"], [35, 15, 20, 20, 10]),
+    "data_generator.INSTITUTE_TYPE_SAMPLER": (["hospital", "clinic", "health_post"], None),
+    "data_generator.OWNERSHIP_SAMPLER": (["government", "private"], None),
+    **{f"prescription_generator._prescription_samplers[{d!r}]": (options, None)
+       for d, options in prescription_generator._prescriptions.items() if options},
+    **{f"prescription_generator._description_samplers[{d!r}]": (options, None)
+       for d, options in prescription_generator._descriptions.items() if options},
+}
+
+
+def test_every_generator_sampler_has_its_pre_alias_table():
+    assert set(PRE_ALIAS_TABLES) == set(generator_samplers())
+
+
+# Each sampler keeps the labels and weights of the call it replaced, and
+# its draws can't be told apart from random.choices on the old table.
+@pytest.mark.parametrize("name", PRE_ALIAS_TABLES)
+def test_sampler_matches_the_table_it_replaced(name):
+    sampler = generator_samplers()[name]
+    labels, weights = PRE_ALIAS_TABLES[name]
+    weights = np.ones(len(labels)) if weights is None else np.asarray(weights, dtype=np.float64)
+    assert sampler.labels == list(labels)
+    assert np.allclose(sampler.weights, weights / weights.sum(), rtol=0, atol=1e-12)
+
+    index = {label: i for i, label in enumerate(labels)}
+    ours = np.bincount(sampler.draw_codes(DRAWS, np.random.default_rng(2)), minlength=len(labels))
+    theirs = np.zeros(len(labels), dtype=np.int64)
+    for label in random.Random(2).choices(labels, weights=weights, k=DRAWS):
+        theirs[index[label]] += 1
+    assert same_distribution_ok(ours, theirs)
+
+
+@pytest.mark.skipif(not os.path.exists(LOCATIONS), reason="data/new_location.csv is not checked in")
+def test_gazetteer_sampler_matches_its_weights():
+    check_sampler(address_generator.Gazetteer(LOCATIONS).sampler())
+
+
+def test_zero_weight_labels_are_never_drawn():
+    sampler = SAMPLERS["skewed"]
+    assert "c" not in sampler.sample(DRAWS, np.random.default_rng(1))
+
+
+def test_invalid_weights_are_rejected():
+    for labels, weights in [([], None), ("ab", [1]), ("ab", [1, -1]), ("ab", [0, 0])]:
+        with pytest.raises(ValueError):
+            AliasSampler(labels, weights)
@@ -0,0 +1,93 @@
+import json
+import numpy as np
+import pytest
+from validate_data import CHECKS, SeenIds, validate
+
+
+def write_tables(data_dir, **tables):
+    for table, rows in tables.items():
+        with open(data_dir / f"{table}.json", "w", encoding="utf-8") as f:
+            json.dump(rows, f)
+
+
+def citizen(nid, created_at="2020-01-01"):
+    return {"nid_number": nid, "created_at": created_at}
+
+
+def institute(institute_id, created_at="2010-01-01"):
+    return {"institute_id": institute_id, "created_at": created_at}
+
+
+def record(record_id, nid="100-000-000-1", institute_id=1, issued_date="2021-06-01"):
+    return {"record_id": record_id, "nid_number": nid, "institute_id": institute_id, "issued_date": issued_date}
+
+
+def entitlement(entitlement_id, nid="100-000-000-1", valid_from="2021-01-01", valid_until="2022-01-01"):
+    return {"entitlement_id": entitlement_id, "nid_number": nid, "valid_from": valid_from, "valid_until": valid_until}
+
+
+def clean_tables():
+    return {
+        "citizens": [citizen("100-000-000-1"), citizen("100-000-000-2")],
+        "health_institutes": [institute(1), institute(2, "2022-01-01")],
+        "health_records": [record(1), record(2, "100-000-000-2", 2, "2023-01-01")],
+        "entitlements": [entitlement(1), entitlement(2, "100-000-000-2")],
+    }
+
+
+def test_clean_dataset_passes(tmp_path):
+    write_tables(tmp_path, **clean_tables())
+    report = validate(tmp_path)
+    assert report.ok
+    assert report.rows == {"citizens": 2, "health_institutes": 2, "health_records": 2, "entitlements": 2}
+
+
+# One bad row per check, added to an otherwise clean dataset: exactly that
+# check fails, once, with the expected example.
+BROKEN = {
+    "citizens.nid_number unique": (
+        "citizens", citizen("100-000-000-1"), {"row": 2, "nid_number": "100-000-000-1"}),
+    "health_institutes.institute_id unique": (
+        "health_institutes", institute(2), {"row": 2, "institute_id": 2}),
+    "health_records.record_id unique": (
+        "health_records", record(1), {"row": 2, "record_id": 1}),
+    "health_records.nid_number exists": (
+        "health_records", record(3, "999-999-999-9"), {"record_id": 3, "nid_number": "999-999-999-9"}),
+    "health_records.institute_id exists": (
+        "health_records", record(3, institute_id=7), {"record_id": 3, "institute_id": 7}),
+    "health_records.issued_date >= citizen created_at": (
+        "health_records", record(3, issued_date="2019-12-31"), {"record_id": 3, "citizen_created_at": "2020-01-01"}),
+    "health_records.issued_date >= institute created_at": (
+        "health_records", record(3, "100-000-000-2", 2, "2021-12-31"), {"record_id": 3, "institute_created_at": "2022-01-01"}),
+    "entitlements.entitlement_id unique": (
+        "entitlements", entitlement(2), {"row": 2, "entitlement_id": 2}),
+    "entitlements.nid_number exists": (
+        "entitlements", entitlement(3, "999-999-999-9"), {"entitlement_id": 3, "nid_number": "999-999-999-9"}),
+    "entitlements.valid_until > valid_from": (
+        "entitlements", entitlement(3, valid_until="2021-01-01"), {"entitlement_id": 3, "valid_until": "2021-01-01"}),
+}
+
+
+def test_every_check_has_a_failing_case():
+    assert set(BROKEN) == set(CHECKS)
+
+
+@pytest.mark.parametrize("check", list(BROKEN))
+def test_each_check_reports_its_violation(tmp_path, check):
+    table, row, expected = BROKEN[check]
+    tables = clean_tables()
+    tables[table].append(row)
+    write_tables(tmp_path, **tables)
+
+    report = validate(tmp_path)
+    assert not report.ok
+    assert {c: n for c, n in report.violations.items() if n} == {check: 1}
+    [example] = report.examples[check]
+    assert {k: example[k] for k in expected} == expected
+
+
+def test_repeats_are_found_across_chunks():
+    seen = SeenIds()
+    assert not seen.add(np.array([1, 2, 3, -1])).any()
+    assert seen.add(np.array([4, 2, 4, -1, 2 ** 40])).tolist() == [False, True, True, True, False]
+    assert seen.add(np.array([2 ** 40, 5])).tolist() == [True, False]
@@ -0,0 +1,273 @@
+import sys
+import json
+import array
+import hashlib
+import argparse
+from itertools import islice
+import numpy as np
+from pyroaring import BitMap
+from json_stream import iter_rows, table_file
+
+# Referential-integrity and consistency checks for a generated or pulled
+# dataset:
+#
+#   python3 scripts/validate_data.py --data data --output data/validation.json
+#
+# Each table is streamed once, CHUNK_ROWS rows at a time. Citizens and
+# institutes are kept as sorted NumPy arrays of key -> created_at day (a
+# NID is stored as its 64-bit integer, 12 bytes per citizen with the date),
+# and the record and entitlement chunks are checked against them with one
+# searchsorted per chunk. Record and entitlement ids are only checked for
+# repeats, against a roaring bitmap of the ids seen so far (a few hundred
+# bytes for sequential ids, at most about 2 bytes per id when scattered),
+# so memory grows with the number of citizens and institutes but hardly
+# with the records. Every violation is counted, and the first
+# --max-examples of each kind are reported with the row's id. The script
+# exits with status 1 if anything failed, so it can gate pull.py and
+# data_generator.py runs (both take --validate).
+
+CHUNK_ROWS = 100_000
+MAX_EXAMPLES = 20
+
+CHECKS = {
+    "citizens.nid_number unique": "two citizens share a NID",
+    "health_institutes.institute_id unique": "two institutes share an id",
+    "health_records.record_id unique": "two records share a record_id",
+    "health_records.nid_number exists": "record for a citizen who is not in citizens",
+    "health_records.institute_id exists": "record from an institute that is not in health_institutes",
+    "health_records.issued_date >= citizen created_at": "record issued before the citizen was registered",
+    "health_records.issued_date >= institute created_at": "record issued before the institute was established",
+    "entitlements.entitlement_id unique": "two entitlements share an entitlement_id",
+    "entitlements.nid_number exists": "entitlement for a citizen who is not in citizens",
+    "entitlements.valid_until > valid_from": "entitlement ends before it starts",
+}
+
+
+def chunks(rows, size=CHUNK_ROWS):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+# NIDs like "123-456-789-0" are their digits as an integer. Anything else is
+# hashed into the negative range, where it cannot meet a digit key.
+def nid_key(nid):
+    digits = str(nid).replace("-", "")
+    if digits.isdigit() and len(digits) < 19:
+        return int(digits)
+    return -1 - (int.from_bytes(hashlib.blake2b(str(nid).encode(), digest_size=8).digest(), "big") >> 1)
+
+
+def nid_keys(nids):
+    return np.fromiter((nid_key(n) for n in nids), dtype=np.int64, count=len(nids))
+
+
+# Timestamps are cut to their date; missing dates become NaT, which never
+# counts as a violation.
+def days(values):
+    return np.array([v[:10] if v else "NaT" for v in values], dtype="datetime64[D]")
+
+
+class Report:
+    def __init__(self, max_examples=MAX_EXAMPLES):
+        self.max_examples = max_examples
+        self.rows = {}
+        self.violations = {check: 0 for check in CHECKS}
+        self.examples = {check: [] for check in CHECKS}
+
+    # Counts the rows of a chunk where `failed` is set; describe(i) gives
+    # the example for row i of the chunk.
+    def add(self, check, failed, describe):
+        bad = np.flatnonzero(failed)
+        self.violations[check] += len(bad)
+        room = self.max_examples - len(self.examples[check])
+        self.examples[check].extend(describe(i) for i in bad[:max(room, 0)].tolist())
+
+    @property
+    def ok(self):
+        return not any(self.violations.values())
+
+    def to_json(self):
+        return {
+            "ok": self.ok,
+            "rows": self.rows,
+            "checks": {
+                check: {"description": CHECKS[check], "violations": self.violations[check], "examples": self.examples[check]}
+                for check in CHECKS
+            },
+        }
+
+    def print(self, file=sys.stderr):
+        for table, rows in self.rows.items():
+            print(f"  {table}: {rows:,} rows", file=file)
+        for check in CHECKS:
+            count = self.violations[check]
+            print(f"{'ok  ' if not count else 'FAIL'} {check}" + (f": {count:,} ({CHECKS[check]})" if count else ""), file=file)
+            for example in self.examples[check][:3]:
+                print(f"       {json.dumps(example)}", file=file)
+
+
+# A key -> value lookup over sorted keys.
+class SortedIndex:
+    def __init__(self, keys, values):
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.values = values[order]
+        self.positions = order
+
+    def duplicates(self):
+        same = np.flatnonzero(self.keys[1:] == self.keys[:-1])
+        return self.positions[same + 1]
+
+    # (found, value) for each query key; value is only meaningful where found.
+    def lookup(self, queries):
+        if not len(self.keys):
+            return np.zeros(len(queries), bool), np.zeros(len(queries), self.values.dtype)
+        at = np.minimum(np.searchsorted(self.keys, queries), len(self.keys) - 1)
+        return self.keys[at] == queries, self.values[at]
+
+
+def build_index(data_dir, table, key, key_values, report):
+    keys, created = [], []
+    rows = 0
+    for chunk in chunks(iter_rows(table_file(data_dir, table))):
+        keys.append(key_values([row.get(key) for row in chunk]))
+        created.append(days([row.get("created_at") for row in chunk]))
+        rows += len(chunk)
+    report.rows[table] = rows
+    return SortedIndex(
+        np.concatenate(keys) if keys else np.zeros(0, np.int64),
+        np.concatenate(created) if created else np.zeros(0, "datetime64[D]"),
+    )
+
+
+# The key column of the rows at `positions` of a table, read back in one
+# more pass so the index doesn't have to keep every key as text.
+def keys_at(data_dir, table, key, positions):
+    wanted = set(positions)
+    found = {}
+    if wanted:
+        for position, row in enumerate(iter_rows(table_file(data_dir, table))):
+            if position in wanted:
+                found[position] = row.get(key)
+                if len(found) == len(wanted):
+                    break
+    return found
+
+
+# Uniqueness of an index's key. Only the rows reported as examples have
+# their key read back.
+def check_unique_key(report, check, data_dir, table, key, index):
+    failed = np.zeros(len(index.keys), bool)
+    failed[index.duplicates()] = True
+    examples = np.flatnonzero(failed)[:report.max_examples].tolist()
+    values = keys_at(data_dir, table, key, examples)
+    report.add(check, failed, lambda i: {"row": i, key: values[i]})
+
+
+# pyroaring copies an array.array in one call but reads a numpy array one
+# element at a time, about ten times slower.
+def to_bitmap(ids):
+    return BitMap(array.array("I", np.asarray(ids, dtype=np.uint32).tobytes()))
+
+
+# The ids of a table seen so far, fed one chunk at a time. Ids that don't fit
+# the bitmap (missing ones are -1) are rare and kept in a set.
+class SeenIds:
+    def __init__(self):
+        self.bitmap = BitMap()
+        self.others = set()
+
+    # True for each id of the chunk that came up before, in this chunk or an
+    # earlier one.
+    def add(self, ids):
+        order = np.argsort(ids, kind="stable")
+        repeated = np.zeros(len(ids), bool)
+        repeated[order[1:][ids[order][1:] == ids[order][:-1]]] = True
+
+        fits = (ids >= 0) & (ids <= np.iinfo(np.uint32).max)
+        chunk = to_bitmap(ids[fits])
+        earlier = np.frombuffer((self.bitmap & chunk).to_array(), dtype=np.uint32)
+        repeated |= fits & np.isin(ids, earlier)
+        self.bitmap |= chunk
+        for i in np.flatnonzero(~fits).tolist():
+            repeated[i] |= int(ids[i]) in self.others
+            self.others.add(int(ids[i]))
+        return repeated
+
+
+def validate(data_dir="data", max_examples=MAX_EXAMPLES):
+    report = Report(max_examples)
+
+    citizens = build_index(data_dir, "citizens", "nid_number", nid_keys, report)
+    check_unique_key(report, "citizens.nid_number unique", data_dir, "citizens", "nid_number", citizens)
+
+    institutes = build_index(
+        data_dir, "health_institutes", "institute_id",
+        lambda ids: np.array([-1 if i is None else i for i in ids], dtype=np.int64), report
+    )
+    check_unique_key(report, "health_institutes.institute_id unique", data_dir, "health_institutes", "institute_id", institutes)
+
+    record_ids, rows = SeenIds(), 0
+    for chunk in chunks(iter_rows(table_file(data_dir, "health_records"))):
+        ids = np.array([row.get("record_id", -1) for row in chunk], dtype=np.int64)
+        nids = [row.get("nid_number") for row in chunk]
+        issued = days([row.get("issued_date") for row in chunk])
+        institute_ids = np.array([row.get("institute_id") or -1 for row in chunk], dtype=np.int64)
+        report.add("health_records.record_id unique", record_ids.add(ids),
+                   lambda i, start=rows: {"row": start + i, "record_id": int(ids[i])})
+
+        def describe(i, **extra):
+            return {"record_id": int(ids[i]), "nid_number": nids[i], "institute_id": int(institute_ids[i]),
+                    "issued_date": str(issued[i]), **{k: str(v[i]) for k, v in extra.items()}}
+
+        has_citizen, registered = citizens.lookup(nid_keys(nids))
+        has_institute, established = institutes.lookup(institute_ids)
+        report.add("health_records.nid_number exists", ~has_citizen, describe)
+        report.add("health_records.institute_id exists", ~has_institute, describe)
+        report.add("health_records.issued_date >= citizen created_at", has_citizen & (issued < registered),
+                   lambda i: describe(i, citizen_created_at=registered))
+        report.add("health_records.issued_date >= institute created_at", has_institute & (issued < established),
+                   lambda i: describe(i, institute_created_at=established))
+        rows += len(chunk)
+    report.rows["health_records"] = rows
+
+    entitlement_ids, rows = SeenIds(), 0
+    for chunk in chunks(iter_rows(table_file(data_dir, "entitlements"))):
+        ids = np.array([row.get("entitlement_id", -1) for row in chunk], dtype=np.int64)
+        nids = [row.get("nid_number") for row in chunk]
+        valid_from = days([row.get("valid_from") for row in chunk])
+        valid_until = days([row.get("valid_until") for row in chunk])
+        report.add("entitlements.entitlement_id unique", entitlement_ids.add(ids),
+                   lambda i, start=rows: {"row": start + i, "entitlement_id": int(ids[i])})
+
+        def describe(i):
+            return {"entitlement_id": int(ids[i]), "nid_number": nids[i],
+                    "valid_from": str(valid_from[i]), "valid_until": str(valid_until[i])}
+
+        has_citizen, _ = citizens.lookup(nid_keys(nids))
+        report.add("entitlements.nid_number exists", ~has_citizen, describe)
+        report.add("entitlements.valid_until > valid_from", valid_until <= valid_from, describe)
+        rows += len(chunk)
+    report.rows["entitlements"] = rows
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the foreign keys and dates of the tables in data/")
+    parser.add_argument("--data", default="data", help="directory of <table>.json / <table>.ndjson files")
+    parser.add_argument("--max-examples", type=int, default=MAX_EXAMPLES, help="violations reported per check")
+    parser.add_argument("--output", help="write the report as JSON here")
+    args = parser.parse_args()
+
+    report = validate(args.data, args.max_examples)
+    report.print()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report.to_json(), f, indent=2)
+    sys.exit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
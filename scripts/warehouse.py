@@ -0,0 +1,206 @@
+import argparse
+import os
+import time
+from itertools import islice
+from build_cubes import address_parts
+from json_stream import iter_rows, table_file
+
+try:
+    import pyarrow as pa
+    from pyiceberg.catalog.sql import SqlCatalog
+    from pyiceberg.exceptions import NamespaceAlreadyExistsError, NoSuchTableError
+    from pyiceberg.expressions import AlwaysTrue, And, EqualTo, GreaterThanOrEqual, LessThan
+    from pyiceberg.transforms import YearTransform
+except ImportError:
+    pa = None
+
+# Writes the four tables to a local Iceberg warehouse (Parquet data files
+# plus Iceberg metadata, with a SQLite catalog) for analysts:
+#
+#   python3 scripts/warehouse.py --data data --warehouse warehouse
+#   python3 scripts/warehouse.py --warehouse warehouse --scan 2024 Koshi
+#
+# health_records gets a province column (the province of the institute the
+# record was issued at) and is partitioned by year(issued_date) and
+# province, so a province-year scan only opens that partition's files.
+# Every write is an Iceberg snapshot: a full export replaces the tables'
+# contents, and --mode append adds the rows as a new snapshot on top (what
+# data_generator.py --append uses). Columns the JSON has but TABLES doesn't
+# declare are added to the Iceberg schema as strings, so the export keeps up
+# with the Supabase schema instead of failing on it.
+#
+# Parquet dictionary-encodes every column that stays under the dictionary
+# page limit, which covers diagnosis, record_type and the other categorical
+# columns; the limit is raised so long description/prescription
+# vocabularies keep their dictionaries too.
+#
+# Needs pyiceberg with pyarrow and SQLAlchemy (scripts/requirements.txt).
+
+NAMESPACE = "ehealth"
+BATCH_ROWS = 250_000
+
+if pa is not None:
+    STRING, INT, DATE, BOOL = pa.string(), pa.int64(), pa.date32(), pa.bool_()
+    TABLES = {
+        "citizens": [
+            ("nid_number", STRING), ("full_name", STRING), ("citizenship_number", STRING),
+            ("date_of_birth", DATE), ("sex", STRING), ("blood_group", STRING), ("father_name", STRING),
+            ("mother_name", STRING), ("address", STRING), ("phone", STRING), ("email", STRING),
+            ("created_at", DATE),
+        ],
+        "health_institutes": [
+            ("institute_id", INT), ("name", STRING), ("type", STRING), ("ownership", STRING),
+            ("address", STRING), ("phone", STRING), ("is_active", BOOL), ("created_at", DATE),
+            ("license_number", STRING),
+        ],
+        "health_records": [
+            ("record_id", INT), ("nid_number", STRING), ("institute_id", INT), ("record_type", STRING),
+            ("title", STRING), ("description", STRING), ("diagnosis", STRING), ("prescription", STRING),
+            ("issued_date", DATE), ("province", STRING),
+        ],
+        "entitlements": [
+            ("entitlement_id", INT), ("nid_number", STRING), ("entitlement_type", STRING),
+            ("eligibility_reason", STRING), ("valid_from", DATE), ("valid_until", DATE),
+        ],
+    }
+
+TABLE_PROPERTIES = {
+    "write.parquet.compression-codec": "zstd",
+    "write.parquet.dict-size-bytes": str(8 << 20),
+}
+
+
+def require_pyiceberg():
+    if pa is None:
+        raise RuntimeError("The warehouse export needs pyiceberg, pyarrow and SQLAlchemy: pip install -r scripts/requirements.txt")
+
+
+def open_catalog(warehouse_dir):
+    require_pyiceberg()
+    warehouse_dir = os.path.abspath(warehouse_dir)
+    os.makedirs(warehouse_dir, exist_ok=True)
+    catalog = SqlCatalog(
+        "local",
+        uri=f"sqlite:///{os.path.join(warehouse_dir, 'catalog.db')}",
+        warehouse=f"file://{warehouse_dir}",
+    )
+    try:
+        catalog.create_namespace(NAMESPACE)
+    except NamespaceAlreadyExistsError:
+        pass
+    return catalog
+
+
+# Declared columns keep their types; anything else the rows carry becomes a
+# nullable string column.
+def arrow_batch(table, rows):
+    fields = list(TABLES[table])
+    declared = {name for name, _ in fields}
+    for row in rows:
+        for name in row:
+            if name not in declared:
+                declared.add(name)
+                fields.append((name, STRING))
+
+    columns = {}
+    for name, kind in fields:
+        values = [row.get(name) for row in rows]
+        if kind == DATE:
+            values = pa.array([v[:10] if v else None for v in values], STRING).cast(DATE)
+        elif kind == STRING:
+            values = pa.array([v if v is None or isinstance(v, str) else str(v) for v in values], STRING)
+        else:
+            values = pa.array(values, kind)
+        columns[name] = values
+    return pa.table(columns)
+
+
+def create_table(catalog, table, schema):
+    iceberg_table = catalog.create_table(f"{NAMESPACE}.{table}", schema=schema, properties=TABLE_PROPERTIES)
+    if table == "health_records":
+        with iceberg_table.update_spec() as spec:
+            spec.add_field("issued_date", YearTransform(), "issued_year")
+            spec.add_identity("province")
+    return iceberg_table
+
+
+# Writes the rows in batches inside one transaction, so readers see either
+# the previous snapshot or all of the new rows. Each batch first widens the
+# table schema with any new columns it brings.
+def write_table(catalog, table, rows, mode="overwrite"):
+    rows = iter(rows)
+    batch = arrow_batch(table, list(islice(rows, BATCH_ROWS)))
+    try:
+        iceberg_table = catalog.load_table(f"{NAMESPACE}.{table}")
+    except NoSuchTableError:
+        iceberg_table = create_table(catalog, table, batch.schema)
+
+    written = 0
+    with iceberg_table.transaction() as transaction:
+        if mode == "overwrite" and iceberg_table.current_snapshot() is not None:
+            transaction.delete(AlwaysTrue())
+        while len(batch):
+            with transaction.update_schema() as update:
+                update.union_by_name(batch.schema)
+            transaction.append(batch)
+            written += len(batch)
+            batch = arrow_batch(table, list(islice(rows, BATCH_ROWS)))
+    return written
+
+
+def record_rows(rows, institute_provinces):
+    for row in rows:
+        yield {**row, "province": institute_provinces.get(row.get("institute_id"), "Unknown")}
+
+
+# Exports data_dir's tables. sources maps a table to the files to read
+# instead of data_dir/<table>.json; with it, only those tables are written.
+def export_warehouse(data_dir, warehouse_dir, mode="overwrite", sources=None):
+    catalog = open_catalog(warehouse_dir)
+    institute_provinces = {
+        institute["institute_id"]: address_parts(institute["address"])[1] or "Unknown"
+        for institute in iter_rows(table_file(data_dir, "health_institutes"))
+    }
+    sources = sources or {table: [table_file(data_dir, table)] for table in TABLES}
+
+    for table, paths in sources.items():
+        started = time.perf_counter()
+        rows = (row for path in paths for row in iter_rows(path))
+        if table == "health_records":
+            rows = record_rows(rows, institute_provinces)
+        written = write_table(catalog, table, rows, mode)
+        print(f"Warehouse {table}: {mode} {written} rows in {time.perf_counter() - started:.1f}s")
+
+
+# The records of one province and year, read through partition pruning.
+def scan_records(warehouse_dir, year, province):
+    table = open_catalog(warehouse_dir).load_table(f"{NAMESPACE}.health_records")
+    return table.scan(row_filter=And(
+        EqualTo("province", province),
+        GreaterThanOrEqual("issued_date", f"{year}-01-01"),
+        LessThan("issued_date", f"{year + 1}-01-01"),
+    )).to_arrow()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the tables in data/ to a local Iceberg warehouse")
+    parser.add_argument("--data", default="data", help="directory of <table>.json / <table>.ndjson files")
+    parser.add_argument("--warehouse", default="warehouse", help="warehouse directory (catalog.db and table files)")
+    parser.add_argument("--mode", choices=["overwrite", "append"], default="overwrite",
+                        help="replace the tables' contents, or add the rows as a new snapshot")
+    parser.add_argument("--tables", nargs="+", help="only export these tables")
+    parser.add_argument("--scan", nargs=2, metavar=("YEAR", "PROVINCE"), help="time reading one partition instead")
+    args = parser.parse_args()
+
+    if args.scan:
+        started = time.perf_counter()
+        records = scan_records(args.warehouse, int(args.scan[0]), args.scan[1])
+        print(f"{records.num_rows} records for {args.scan[1]} {args.scan[0]} in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return
+
+    sources = {table: [table_file(args.data, table)] for table in args.tables} if args.tables else None
+    export_warehouse(args.data, args.warehouse, args.mode, sources)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ import {
   Filter, AlertTriangle, CheckCircle, Clock, Package
 } from 'lucide-react';
 import { LineChart, Line, BarChart, Bar, PieChart, Pie, Cell, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer, AreaChart, Area, RadarChart, PolarGrid, PolarAngleAxis, PolarRadiusAxis, Radar } from 'recharts';
+import { cubeCells, cubeRollup } from '../utils/cubes';
 
 
 
@@ -15,9 +16,13 @@ function GovDashboard({ user, onLogout }) {
   const [isDarkMode, setIsDarkMode] = useState(false);
   const toggleDarkMode = () => setIsDarkMode(!isDarkMode);
 
-  const [citizens, setCitizens] = useState([]);
+  // Citizens and health records are only read through the rollups pull.py
+  // builds, so the download no longer grows with the number of records.
+  const [summary, setSummary] = useState({});
   const [healthInstitutes, setHealthInstitutes] = useState([]);
-  const [healthRecords, setHealthRecords] = useState([]);
+  const [diagnosisCube, setDiagnosisCube] = useState(null);
+  const [recordTypeCube, setRecordTypeCube] = useState(null);
+  const [instituteVolumes, setInstituteVolumes] = useState([]);
   const [loading, setLoading] = useState(true);
 
   const [searchQuery, setSearchQuery] = useState('');
@@ -36,19 +41,25 @@ function GovDashboard({ user, onLogout }) {
   useEffect(() => {
     const loadData = async () => {
       try {
-        const [citizensRes, institutesRes, recordsRes] = await Promise.all([
-          fetch('/data/citizens.json'),
+        const [summaryRes, institutesRes, diagnosesRes, recordTypesRes, volumesRes] = await Promise.all([
+          fetch('/data/cubes/citizens.json'),
           fetch('/data/health_institutes.json'),
-          fetch('/data/health_records.json')
+          fetch('/data/cubes/diagnoses.json'),
+          fetch('/data/cubes/record_types.json'),
+          fetch('/data/cubes/institutes.json')
         ]);
 
-        const citizensData = await citizensRes.json();
+        const summaryData = await summaryRes.json();
         const institutesData = await institutesRes.json();
-        const recordsData = await recordsRes.json();
+        const diagnosesData = await diagnosesRes.json();
+        const recordTypesData = await recordTypesRes.json();
+        const volumesData = await volumesRes.json();
 
-        setCitizens(citizensData);
+        setSummary(summaryData);
         setHealthInstitutes(institutesData);
-        setHealthRecords(recordsData);
+        setDiagnosisCube(diagnosesData);
+        setRecordTypeCube(recordTypesData);
+        setInstituteVolumes(volumesData);
         setLoading(false);
       } catch (error) {
         console.error('Error loading data:', error);
@@ -63,23 +74,12 @@ function GovDashboard({ user, onLogout }) {
 
 const DashboardView = () => {
     // KPI Stats
-    const totalCitizens = citizens.length;
+    const totalCitizens = summary.citizens || 0;
     const totalInstitutes = healthInstitutes.length;
-    const totalRecords = healthRecords.length;
+    const totalRecords = summary.records || 0;
     const activeInstitutes = healthInstitutes.filter(h => h.is_active).length;
 
     // Age demographics for healthcare planning
-    const calculateAge = (dob) => {
-      const birthDate = new Date(dob);
-      const today = new Date();
-      let age = today.getFullYear() - birthDate.getFullYear();
-      const monthDiff = today.getMonth() - birthDate.getMonth();
-      if (monthDiff < 0 || (monthDiff === 0 && today.getDate() < birthDate.getDate())) {
-        age--;
-      }
-      return age;
-    };
-
     const ageGroups = {
       'Children (0-18)': 0,
       'Young Adults (19-35)': 0,
@@ -88,35 +88,34 @@ const DashboardView = () => {
       'Elderly (71+)': 0
     };
 
-    citizens.forEach(citizen => {
-      const age = calculateAge(citizen.date_of_birth);
-      if (age <= 18) ageGroups['Children (0-18)']++;
-      else if (age <= 35) ageGroups['Young Adults (19-35)']++;
-      else if (age <= 55) ageGroups['Middle Age (36-55)']++;
-      else if (age <= 70) ageGroups['Senior (56-70)']++;
-      else ageGroups['Elderly (71+)']++;
+    Object.entries(summary.age || {}).forEach(([years, count]) => {
+      const age = Number(years);
+      if (age <= 18) ageGroups['Children (0-18)'] += count;
+      else if (age <= 35) ageGroups['Young Adults (19-35)'] += count;
+      else if (age <= 55) ageGroups['Middle Age (36-55)'] += count;
+      else if (age <= 70) ageGroups['Senior (56-70)'] += count;
+      else ageGroups['Elderly (71+)'] += count;
     });
 
     const ageDemographicsData = Object.entries(ageGroups).map(([name, value]) => ({ 
       name, 
       value,
-      percentage: ((value / citizens.length) * 100).toFixed(1)
+      percentage: ((value / totalCitizens) * 100).toFixed(1)
     }));
 
     // Calculate citizens per institute by district
     const districtStats = {};
     healthInstitutes.forEach(institute => {
-      const district = institute.address.split(' ').slice(-2, -1)[0];
+      const district = institute.address.split(' ').slice(-2, -1)[0].replace(/,$/, '');
       if (!districtStats[district]) {
         districtStats[district] = { institutes: 0, district, citizens: 0 };
       }
       districtStats[district].institutes += 1;
     });
 
-    citizens.forEach(citizen => {
-      const district = citizen.address.split(' ').slice(-2, -1)[0];
+    Object.entries(summary.district_citizens || {}).forEach(([district, count]) => {
       if (districtStats[district]) {
-        districtStats[district].citizens = (districtStats[district].citizens || 0) + 1;
+        districtStats[district].citizens = count;
       }
     });
 
@@ -145,36 +144,27 @@ const DashboardView = () => {
       .slice(0, 10);
 
     // Records over time data
-    const recordsByMonth = healthRecords.reduce((acc, record) => {
-      const month = new Date(record.issued_date).toLocaleString('default', { month: 'short', year: '2-digit' });
-      acc[month] = (acc[month] || 0) + 1;
-      return acc;
-    }, {});
+    const recordsByMonth = cubeRollup(diagnosisCube, 'year', 'month');
 
     const recordsTimeData = Object.entries(recordsByMonth)
-      .sort((a, b) => new Date('20' + a[0].split(' ')[1] + '-' + a[0].split(' ')[0]) - new Date('20' + b[0].split(' ')[1] + '-' + b[0].split(' ')[0]))
+      .flatMap(([year, months]) => Object.entries(months).map(([month, records]) => [Number(year), Number(month), records]))
+      .sort((a, b) => a[0] - b[0] || a[1] - b[1])
       .slice(-12)
-      .map(([month, records]) => ({ month, records }));
+      .map(([year, month, records]) => ({
+        month: new Date(year, month - 1).toLocaleString('default', { month: 'short', year: '2-digit' }),
+        records
+      }));
 
     // Top 5 diagnoses for quick overview
-    const diagnosisData = healthRecords.reduce((acc, record) => {
-      acc[record.diagnosis] = (acc[record.diagnosis] || 0) + 1;
-      return acc;
-    }, {});
+    const diagnosisData = cubeRollup(diagnosisCube, 'diagnosis');
     const topDiagnosesPreview = Object.entries(diagnosisData)
       .sort((a, b) => b[1] - a[1])
       .slice(0, 5)
       .map(([name, value]) => ({ name, value }));
 
     // Health coverage - citizens with records in last 6 months
-    const sixMonthsAgo = new Date();
-    sixMonthsAgo.setMonth(sixMonthsAgo.getMonth() - 6);
-    const recentRecordNIDs = new Set(
-      healthRecords
-        .filter(r => new Date(r.issued_date) >= sixMonthsAgo)
-        .map(r => r.nid_number)
-    );
-    const coverageRate = ((recentRecordNIDs.size / totalCitizens) * 100).toFixed(1);
+    const recentlyCovered = summary.citizens_with_recent_records || 0;
+    const coverageRate = ((recentlyCovered / totalCitizens) * 100).toFixed(1);
 
     // Institute type distribution for policy planning
     const instituteTypeData = healthInstitutes.reduce((acc, institute) => {
@@ -238,7 +228,7 @@ const DashboardView = () => {
               <div>
                 <p className="text-sm text-gray-600 dark:text-gray-400">Health Coverage (6mo)</p>
                 <p className="text-3xl font-bold text-gray-900 dark:text-white mt-2">{coverageRate}%</p>
-                <p className="text-xs text-gray-600 dark:text-gray-400 mt-1">{recentRecordNIDs.size.toLocaleString()} citizens</p>
+                <p className="text-xs text-gray-600 dark:text-gray-400 mt-1">{recentlyCovered.toLocaleString()} citizens</p>
               </div>
               <div className="bg-green-100 dark:bg-green-900/30 p-3 rounded-lg">
                 <Activity className="w-8 h-8 text-green-600 dark:text-green-400" />
@@ -439,33 +429,16 @@ const DashboardView = () => {
   };
   const CitizensView = () => {
     // Gender distribution
-    const genderData = citizens.reduce((acc, citizen) => {
-      acc[citizen.sex] = (acc[citizen.sex] || 0) + 1;
-      return acc;
-    }, {});
+    const genderData = summary.sex || {};
     const genderChartData = Object.entries(genderData).map(([name, value]) => ({ name, value }));
 
     // Blood group distribution
-    const bloodGroupData = citizens.reduce((acc, citizen) => {
-      acc[citizen.blood_group] = (acc[citizen.blood_group] || 0) + 1;
-      return acc;
-    }, {});
+    const bloodGroupData = summary.blood_group || {};
     const bloodGroupChartData = Object.entries(bloodGroupData)
       .sort((a, b) => b[1] - a[1])
       .map(([name, value]) => ({ name, value }));
 
-    // Age distribution (calculate from date_of_birth)
-    const calculateAge = (dob) => {
-      const birthDate = new Date(dob);
-      const today = new Date();
-      let age = today.getFullYear() - birthDate.getFullYear();
-      const monthDiff = today.getMonth() - birthDate.getMonth();
-      if (monthDiff < 0 || (monthDiff === 0 && today.getDate() < birthDate.getDate())) {
-        age--;
-      }
-      return age;
-    };
-
+    // Age distribution
     const ageGroups = {
       '0-18': 0,
       '19-30': 0,
@@ -474,37 +447,34 @@ const DashboardView = () => {
       '61+': 0
     };
 
-    citizens.forEach(citizen => {
-      const age = calculateAge(citizen.date_of_birth);
-      if (age <= 18) ageGroups['0-18']++;
-      else if (age <= 30) ageGroups['19-30']++;
-      else if (age <= 45) ageGroups['31-45']++;
-      else if (age <= 60) ageGroups['46-60']++;
-      else ageGroups['61+']++;
+    Object.entries(summary.age || {}).forEach(([years, count]) => {
+      const age = Number(years);
+      if (age <= 18) ageGroups['0-18'] += count;
+      else if (age <= 30) ageGroups['19-30'] += count;
+      else if (age <= 45) ageGroups['31-45'] += count;
+      else if (age <= 60) ageGroups['46-60'] += count;
+      else ageGroups['61+'] += count;
     });
 
     const ageChartData = Object.entries(ageGroups).map(([name, value]) => ({ name, value }));
 
     // District distribution
-    const districtData = citizens.reduce((acc, citizen) => {
-      const district = citizen.address.split(' ').slice(-2, -1)[0];
-      acc[district] = (acc[district] || 0) + 1;
-      return acc;
-    }, {});
+    const districtData = summary.district_citizens || {};
     const topDistricts = Object.entries(districtData)
       .sort((a, b) => b[1] - a[1])
       .slice(0, 10)
       .map(([name, value]) => ({ name, value }));
 
     // Health engagement stats
-    const citizensWithRecords = new Set(healthRecords.map(r => r.nid_number));
-    const engagementRate = ((citizensWithRecords.size / citizens.length) * 100).toFixed(1);
+    const totalCitizens = summary.citizens || 0;
+    const citizensWithRecords = summary.citizens_with_records || 0;
+    const engagementRate = ((citizensWithRecords / totalCitizens) * 100).toFixed(1);
 
     // Blood donor availability
     const bloodDonorStats = Object.entries(bloodGroupData).map(([group, count]) => ({
       bloodGroup: group,
       donors: count,
-      percentage: ((count / citizens.length) * 100).toFixed(1)
+      percentage: ((count / totalCitizens) * 100).toFixed(1)
     })).sort((a, b) => b.donors - a.donors);
 
     return (
@@ -515,7 +485,7 @@ const DashboardView = () => {
             <div className="flex items-center justify-between">
               <div>
                 <p className="text-sm text-gray-600 dark:text-gray-400">Total Registered</p>
-                <p className="text-3xl font-bold text-gray-900 dark:text-white mt-2">{citizens.length.toLocaleString()}</p>
+                <p className="text-3xl font-bold text-gray-900 dark:text-white mt-2">{totalCitizens.toLocaleString()}</p>
               </div>
               <div className="bg-indigo-100 dark:bg-indigo-900/30 p-3 rounded-lg">
                 <Users className="w-8 h-8 text-indigo-600 dark:text-indigo-400" />
@@ -528,7 +498,7 @@ const DashboardView = () => {
               <div>
                 <p className="text-sm text-gray-600 dark:text-gray-400">Health Engagement</p>
                 <p className="text-3xl font-bold text-gray-900 dark:text-white mt-2">{engagementRate}%</p>
-                <p className="text-xs text-gray-600 dark:text-gray-400 mt-1">{citizensWithRecords.size.toLocaleString()} citizens</p>
+                <p className="text-xs text-gray-600 dark:text-gray-400 mt-1">{citizensWithRecords.toLocaleString()} citizens</p>
               </div>
               <div className="bg-green-100 dark:bg-green-900/30 p-3 rounded-lg">
                 <Activity className="w-8 h-8 text-green-600 dark:text-green-400" />
@@ -723,8 +693,8 @@ const DashboardView = () => {
     ];
 
     // Records per institute (capacity indicator)
-    const recordsPerInstitute = healthRecords.reduce((acc, record) => {
-      acc[record.institute_id] = (acc[record.institute_id] || 0) + 1;
+    const recordsPerInstitute = instituteVolumes.reduce((acc, volume) => {
+      acc[volume.institute_id] = volume.records;
       return acc;
     }, {});
 
@@ -1022,42 +992,23 @@ const DashboardView = () => {
 
 
   const HealthInsightsView = () => {
+    const totalRecords = summary.records || 0;
+
     // Top 10 diagnoses
-    const diagnosisData = healthRecords.reduce((acc, record) => {
-      acc[record.diagnosis] = (acc[record.diagnosis] || 0) + 1;
-      return acc;
-    }, {});
+    const diagnosisData = cubeRollup(diagnosisCube, 'diagnosis');
     const topDiagnoses = Object.entries(diagnosisData)
       .sort((a, b) => b[1] - a[1])
       .slice(0, 10)
       .map(([name, value]) => ({ name, value }));
 
     // Record types distribution
-    const recordTypeData = healthRecords.reduce((acc, record) => {
-      acc[record.record_type] = (acc[record.record_type] || 0) + 1;
-      return acc;
-    }, {});
+    const recordTypeData = cubeRollup(recordTypeCube, 'record_type');
     const recordTypeChartData = Object.entries(recordTypeData).map(([name, value]) => ({ name, value }));
 
     // District-wise health burden analysis
     const districtHealthData = {};
-    healthRecords.forEach(record => {
-      const citizen = citizens.find(c => c.nid_number === record.nid_number);
-      if (citizen) {
-        const district = citizen.address.split(' ').slice(-2, -1)[0];
-        if (!districtHealthData[district]) {
-          districtHealthData[district] = { district, cases: 0, citizens: 0 };
-        }
-        districtHealthData[district].cases++;
-      }
-    });
-
-    // Count citizens per district
-    citizens.forEach(citizen => {
-      const district = citizen.address.split(' ').slice(-2, -1)[0];
-      if (districtHealthData[district]) {
-        districtHealthData[district].citizens++;
-      }
+    Object.entries(summary.district_records || {}).forEach(([district, cases]) => {
+      districtHealthData[district] = { district, cases, citizens: (summary.district_citizens || {})[district] || 0 };
     });
 
     const districtHealthBurden = Object.values(districtHealthData)
@@ -1072,12 +1023,8 @@ const DashboardView = () => {
 
     // Seasonal trends - diagnoses by month
     const monthlyDiagnoses = {};
-    healthRecords.forEach(record => {
-      const month = new Date(record.issued_date).toLocaleString('default', { month: 'short' });
-      if (!monthlyDiagnoses[month]) {
-        monthlyDiagnoses[month] = {};
-      }
-      monthlyDiagnoses[month][record.diagnosis] = (monthlyDiagnoses[month][record.diagnosis] || 0) + 1;
+    Object.entries(cubeRollup(diagnosisCube, 'month', 'diagnosis')).forEach(([month, counts]) => {
+      monthlyDiagnoses[new Date(2000, month - 1).toLocaleString('default', { month: 'short' })] = counts;
     });
 
     // Get top 5 diagnoses for trend tracking
@@ -1096,20 +1043,15 @@ const DashboardView = () => {
     }).filter(d => Object.keys(d).length > 1); // Remove months with no data
 
     // Outbreak detection - recent spikes
-    const last30Days = new Date();
-    last30Days.setDate(last30Days.getDate() - 30);
-    const recentRecords = healthRecords.filter(r => new Date(r.issued_date) >= last30Days);
-    const recentDiagnosisData = recentRecords.reduce((acc, record) => {
-      acc[record.diagnosis] = (acc[record.diagnosis] || 0) + 1;
-      return acc;
-    }, {});
+    const recentDiagnosisData = summary.recent_diagnoses || {};
+    const recentRecords = Object.values(recentDiagnosisData).reduce((sum, count) => sum + count, 0);
 
     // Calculate percentage of total for each diagnosis in recent period
     const outbreakAlerts = Object.entries(recentDiagnosisData)
       .map(([diagnosis, count]) => ({
         diagnosis,
         count,
-        percentage: ((count / recentRecords.length) * 100).toFixed(1),
+        percentage: ((count / recentRecords) * 100).toFixed(1),
         totalCases: diagnosisData[diagnosis]
       }))
       .sort((a, b) => b.count - a.count)
@@ -1117,11 +1059,11 @@ const DashboardView = () => {
 
     // Treatment patterns - IPD vs OPD by diagnosis
     const treatmentPatterns = {};
-    healthRecords.forEach(record => {
-      if (!treatmentPatterns[record.diagnosis]) {
-        treatmentPatterns[record.diagnosis] = { IPD: 0, OPD: 0, diagnosis: record.diagnosis };
+    cubeCells(recordTypeCube || { dimensions: [], cells: [] }).forEach(([diagnosis, recordType, count]) => {
+      if (!treatmentPatterns[diagnosis]) {
+        treatmentPatterns[diagnosis] = { IPD: 0, OPD: 0, diagnosis };
       }
-      treatmentPatterns[record.diagnosis][record.record_type]++;
+      treatmentPatterns[diagnosis][recordType] = (treatmentPatterns[diagnosis][recordType] || 0) + count;
     });
 
     const treatmentPatternsData = Object.values(treatmentPatterns)
@@ -1135,14 +1077,17 @@ const DashboardView = () => {
 
     // Institute performance - records by institute type
     const instituteTypePerformance = {};
-    healthRecords.forEach(record => {
-      const institute = healthInstitutes.find(h => h.institute_id === record.institute_id);
-      if (institute) {
-        const type = institute.type;
+    const instituteTypes = {};
+    healthInstitutes.forEach(institute => {
+      instituteTypes[institute.institute_id] = institute.type;
+    });
+    instituteVolumes.forEach(volume => {
+      const type = instituteTypes[volume.institute_id];
+      if (type && volume.records) {
         if (!instituteTypePerformance[type]) {
           instituteTypePerformance[type] = { type, records: 0, institutes: 0 };
         }
-        instituteTypePerformance[type].records++;
+        instituteTypePerformance[type].records += volume.records;
       }
     });
 
@@ -1185,7 +1130,7 @@ const DashboardView = () => {
                   {recordTypeData.IPD?.toLocaleString() || 0}
                 </p>
                 <p className="text-xs text-gray-600 dark:text-gray-400 mt-1">
-                  {((recordTypeData.IPD / healthRecords.length) * 100).toFixed(1)}% of total
+                  {((recordTypeData.IPD / totalRecords) * 100).toFixed(1)}% of total
                 </p>
               </div>
               <div className="bg-orange-100 dark:bg-orange-900/30 p-3 rounded-lg">
@@ -1202,7 +1147,7 @@ const DashboardView = () => {
                   {recordTypeData.OPD?.toLocaleString() || 0}
                 </p>
                 <p className="text-xs text-gray-600 dark:text-gray-400 mt-1">
-                  {((recordTypeData.OPD / healthRecords.length) * 100).toFixed(1)}% of total
+                  {((recordTypeData.OPD / totalRecords) * 100).toFixed(1)}% of total
                 </p>
               </div>
               <div className="bg-green-100 dark:bg-green-900/30 p-3 rounded-lg">
@@ -0,0 +1,44 @@
+// Readers for the rollups scripts/build_cubes.py writes to /data/cubes/.
+
+// Yields [label, label, ..., count] for every non-empty cell of a cube,
+// whether it was written as sparse "cells" or as a flat "counts" list.
+export const cubeCells = (cube) => {
+    const labels = cube.dimensions.map(d => d.labels);
+    if (cube.cells) {
+        return cube.cells.map(cell => [...cell.slice(0, -1).map((code, axis) => labels[axis][code]), cell[cell.length - 1]]);
+    }
+
+    const cells = [];
+    cube.counts.forEach((count, flat) => {
+        if (!count) return;
+        const cell = new Array(labels.length + 1);
+        cell[labels.length] = count;
+        for (let axis = labels.length - 1; axis >= 0; axis--) {
+            cell[axis] = labels[axis][flat % labels[axis].length];
+            flat = Math.floor(flat / labels[axis].length);
+        }
+        cells.push(cell);
+    });
+    return cells;
+};
+
+// Sums out every dimension except the named ones. One name gives
+// { label: count }, two give { label: { label: count } }, and so on.
+export const cubeRollup = (cube, ...names) => {
+    if (!cube) return {};
+    const axes = names.map(name => cube.dimensions.findIndex(d => d.name === name));
+    const result = {};
+    cubeCells(cube).forEach(cell => {
+        const count = cell[cell.length - 1];
+        let node = result;
+        axes.forEach((axis, i) => {
+            const label = cell[axis];
+            if (i === axes.length - 1) {
+                node[label] = (node[label] || 0) + count;
+            } else {
+                node = node[label] = node[label] || {};
+            }
+        });
+    });
+    return result;
+};
@@ -0,0 +1,30 @@
+-- Change timestamps for incremental pulls (python3 scripts/pull.py --incremental).
+-- Every row gets updated_at, set on insert by the default and on every
+-- update by the moddatetime trigger; pull.py fetches the rows whose
+-- updated_at moved since its last run.
+
+create extension if not exists moddatetime schema extensions;
+
+alter table citizens add column if not exists updated_at timestamptz not null default now();
+alter table health_institutes add column if not exists updated_at timestamptz not null default now();
+alter table health_records add column if not exists updated_at timestamptz not null default now();
+alter table entitlements add column if not exists updated_at timestamptz not null default now();
+
+drop trigger if exists set_updated_at on citizens;
+create trigger set_updated_at before update on citizens
+  for each row execute procedure extensions.moddatetime(updated_at);
+drop trigger if exists set_updated_at on health_institutes;
+create trigger set_updated_at before update on health_institutes
+  for each row execute procedure extensions.moddatetime(updated_at);
+drop trigger if exists set_updated_at on health_records;
+create trigger set_updated_at before update on health_records
+  for each row execute procedure extensions.moddatetime(updated_at);
+drop trigger if exists set_updated_at on entitlements;
+create trigger set_updated_at before update on entitlements
+  for each row execute procedure extensions.moddatetime(updated_at);
+
+-- The incremental filter is updated_at >= <last watermark>.
+create index if not exists citizens_updated_at_idx on citizens (updated_at);
+create index if not exists health_institutes_updated_at_idx on health_institutes (updated_at);
+create index if not exists health_records_updated_at_idx on health_records (updated_at);
+create index if not exists entitlements_updated_at_idx on entitlements (updated_at);